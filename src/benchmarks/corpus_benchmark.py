@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""Replay the golden flashcard corpus through each pipeline stage and record throughput.
+
+Run from the repository root:
+
+    python -m src.benchmarks.corpus_benchmark --output benchmark_results.json
+    python -m src.benchmarks.corpus_benchmark --compare benchmark_results.json
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from src.flashcard_formatting.batch_format import warm_dictionaries
+from src.flashcard_formatting.flashcard_xml import process_flashcard_xml
+from src.flashcard_formatting.format_entry import fmt_entry
+from src.flashcard_formatting.grading import (
+    grade_back,
+    normalize_expected_back,
+    normalize_result_back,
+)
+from src.flashcard_formatting.label_segments import label_segments
+from src.utils.file_utils import load_flashcard_entries
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_CORPUS = REPO_ROOT / "flashcard_entries.json"
+DEFAULT_OUTPUT = "benchmark_results.json"
+STAGES = ["ingest", "label_segments", "fmt_entry", "grade"]
+
+
+def card_xml(entry):
+    """Build a single-card Pleco export equivalent to the one the entry came from."""
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><plecoflash formatversion="2">'
+        '<cards><card language="chinese">'
+        f'<entry><headword charset="sc">{escape(entry["simplified"])}</headword>'
+        f'<headword charset="tc">{escape(entry["traditional"])}</headword>'
+        f'<pron type="hypy" tones="marks">{escape(entry["pinyin"])}</pron>'
+        f'<defn>{escape(entry["definition"])}</defn></entry>'
+        f'<dictref dictid="{escape(entry["dictid"])}"/>'
+        "</card></cards></plecoflash>"
+    )
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def peak_rss_kb():
+    """High-water mark of this process's resident set size in KiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports KiB
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def run_stage(items, func):
+    """
+    Time func over every item.
+
+    Returns:
+        tuple: (list of results, stats dict with throughput, latency percentiles
+            and peak RSS)
+    """
+    results = []
+    latencies = []
+    rss_before = peak_rss_kb()
+    start = time.perf_counter()
+    # the formatting code prints alignment failures; keep them out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        for item in items:
+            item_start = time.perf_counter()
+            results.append(func(item))
+            latencies.append(time.perf_counter() - item_start)
+    total = time.perf_counter() - start
+
+    latencies.sort()
+    stats = {
+        "entries": len(items),
+        "total_s": round(total, 4),
+        "entries_per_sec": round(len(items) / total, 2) if total else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 4),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 4),
+        "max_ms": round(latencies[-1] * 1000, 4) if latencies else 0.0,
+        "peak_rss_kb": peak_rss_kb(),
+        "rss_growth_kb": peak_rss_kb() - rss_before,
+    }
+    return results, stats
+
+
+def ingest(entry):
+    """Parse one card through process_flashcard_xml, keeping the corpus Anki back."""
+    entries, problematic = process_flashcard_xml(card_xml(entry))
+    parsed = (entries or problematic)[0]
+    parsed["formatted_back"] = entry["formatted_back"]
+    return parsed
+
+
+def grade(entry_and_result):
+    """Grade one precomputed render result against its Anki back."""
+    entry, result = entry_and_result
+    expected = normalize_expected_back(entry["formatted_back"])
+    return grade_back(expected, normalize_result_back(result))
+
+
+def run_benchmark(corpus_path=DEFAULT_CORPUS, limit=None):
+    """
+    Run every stage over the corpus.
+
+    Args:
+        corpus_path (str): Path to a flashcard_entries.json style corpus
+        limit (int): Only replay the first N entries
+
+    Returns:
+        dict: JSON-serializable benchmark results
+    """
+    corpus = load_flashcard_entries(corpus_path)[:limit]
+    results = {
+        "timestamp": datetime.datetime.now().astimezone().isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "corpus": str(corpus_path),
+        "entries": len(corpus),
+        "stages": {},
+    }
+
+    # dictionary loading is a one-off cost; report it apart from per-entry latency
+    start = time.perf_counter()
+    warm_dictionaries()
+    results["warmup_s"] = round(time.perf_counter() - start, 4)
+
+    entries, results["stages"]["ingest"] = run_stage(corpus, ingest)
+    _, results["stages"]["label_segments"] = run_stage(
+        entries,
+        lambda entry: label_segments(
+            entry["definition"], traditional_word=entry["traditional"]
+        ),
+    )
+    formatted_backs, results["stages"]["fmt_entry"] = run_stage(entries, fmt_entry)
+    grades, results["stages"]["grade"] = run_stage(
+        list(zip(entries, formatted_backs)), grade
+    )
+    results["correct"] = sum(status == "correct" for status, _ in grades)
+    return results
+
+
+def git_commit():
+    """Short hash of the checked out commit, if this is a git checkout."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(baseline, current, max_regression=0.2):
+    """
+    Print per-stage throughput changes against a baseline run.
+
+    Returns:
+        list: Names of stages whose throughput fell by more than max_regression
+    """
+    regressions = []
+    for stage in STAGES:
+        old = baseline["stages"].get(stage, {}).get("entries_per_sec")
+        new = current["stages"].get(stage, {}).get("entries_per_sec")
+        if not old or not new:
+            continue
+        change = new / old - 1
+        print(f"{stage:>15}: {old:10.2f} -> {new:10.2f} entries/sec ({change:+.1%})")
+        if change < -max_regression:
+            regressions.append(stage)
+    return regressions
+
+
+def print_results(results):
+    """Print a one-line summary per stage."""
+    print(f"{results['entries']} entries, warm-up {results['warmup_s']}s")
+    for stage, stats in results["stages"].items():
+        print(
+            f"{stage:>15}: {stats['entries_per_sec']:10.2f} entries/sec"
+            f"  p50 {stats['p50_ms']:8.3f}ms  p99 {stats['p99_ms']:8.3f}ms"
+            f"  peak RSS {stats['peak_rss_kb'] / 1024:7.1f}MiB"
+        )
+
+
+def main(argv=None):
+    """Run the corpus benchmark from the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", default=str(DEFAULT_CORPUS))
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument(
+        "--compare", help="baseline results file to compare this run against"
+    )
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.2,
+        help="fractional throughput drop that fails the comparison",
+    )
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = run_benchmark(args.corpus, limit=args.limit)
+    print_results(results)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=4)
+
+    if baseline is not None and compare_results(baseline, results, args.max_regression):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,9 @@
 """Constants used throughout the Pleco-Anki server application for file paths, URLs, and configurations."""
 
-from src.utils.utils import find_file_with_wildcard
-
 # Define scopes for accessing Google Drive
 SCOPES = ["https://www.googleapis.com/auth/drive"]
 MEMORY_FILE = "processed_files.json"
 CREDENTIALS_FILE_WILDCARDED = "../.credentials/client_secret*.json"
-CREDENTIALS_FILE = find_file_with_wildcard(CREDENTIALS_FILE_WILDCARDED)
 TOKEN_FILE = "../.credentials/token.json"
 SERVER_FOLDER = "server_files"
 
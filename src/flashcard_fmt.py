@@ -1,28 +1,265 @@
 #!/usr/bin/env python3
 """Main module for processing and formatting Pleco flashcards into Anki format."""
 
+import argparse
 import os
-import re
-from src.flashcard_formatting.format_entry import fmt_entry, grade_fmt_entry
-from src.utils.file_utils import save_flashcard_entries
-from src.utils.google_drive_utils import get_latest_flashcard_xml
+from concurrent.futures import ThreadPoolExecutor
+
+from src.flashcard_formatting.batch_format import format_entries, warm_dictionaries
+from src.flashcard_formatting.card_styles import save_card_stylesheet
+from src.flashcard_formatting.pipeline import (
+    STREAM_OUTPUT_FILE,
+    add_anki_fields,
+    run_streaming_pipeline,
+)
+from src.flashcard_formatting.grading import (
+    GradingCache,
+    build_grading_report,
+    print_grading_summary,
+    save_grading_report,
+)
+from src.utils.apkg_export import export_apkg
+from src.utils.entry_store import RENDER_ERROR, RENDER_FORMATTED, EntryStore
+from src.utils.google_drive_utils import get_latest_flashcard_chunks
+from src.utils.metrics import REGISTRY, STAGE_SECONDS
 from src.flashcard_formatting.flashcard_xml import process_flashcard_xml
-from src.utils.anki_connect import get_anki_deck_cards
-from src.utils.file_utils import convert_unicode_segments
+from src.utils.anki_collection import read_deck_cards
+from src.utils.anki_snapshot import AnkiSnapshot, front_key
+from src.utils.anki_writeback import (
+    WRITEBACK_REPORT_FILE,
+    plan_writeback,
+    save_writeback_report,
+    write_back,
+)
+from src.utils.ingest_state import (
+    card_key,
+    diff_ingest_state,
+    legacy_card_key,
+    load_ingest_state,
+    save_ingest_state,
+    update_ingest_state,
+)
+
+# options naming files outside resources/, resolved before main changes into it
+PATH_OPTIONS = ("anki_collection", "apkg", "stylesheet", "metrics_file")
+
+
+def parse_args(argv=None):
+    """Parse command line arguments for the formatting run."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of worker processes used for formatting (0 = one per CPU)",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="render class-based card HTML instead of inline styles",
+    )
+    parser.add_argument(
+        "--stylesheet",
+        metavar="PATH",
+        help="write the CSS for --compact cards to PATH for the Anki note type",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="only process cards that are new or modified since the last run",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help=(
+            "process cards one at a time, writing them to "
+            f"{STREAM_OUTPUT_FILE} as they are formatted"
+        ),
+    )
+    parser.add_argument(
+        "--export-json",
+        default="flashcard_entries.json",
+        metavar="PATH",
+        help="export the entry store to this legacy JSON file (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-export-json",
+        dest="export_json",
+        action="store_const",
+        const=None,
+        help="do not write the legacy JSON file",
+    )
+    parser.add_argument(
+        "--write-back",
+        action="store_true",
+        help="update the backs of the Anki notes whose rendered back changed",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="with --write-back, only report the notes that would be updated",
+    )
+    parser.add_argument(
+        "--apkg",
+        metavar="PATH",
+        help="also export the formatted cards as an Anki package for bulk import",
+    )
+    parser.add_argument(
+        "--anki-collection",
+        metavar="PATH",
+        help="read the Anki deck from a local collection.anki2 file instead of AnkiConnect",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        metavar="PATH",
+        help=(
+            "write the run's metrics to PATH, as JSON for a .json path and in "
+            "the Prometheus text format otherwise"
+        ),
+    )
+    args = parser.parse_args(argv)
+    if args.stream and args.incremental:
+        parser.error("--stream and --incremental cannot be combined")
+    if args.stream and (args.write_back or args.apkg):
+        parser.error("--stream cannot be combined with --write-back or --apkg")
+    if args.dry_run and not args.write_back:
+        parser.error("--dry-run requires --write-back")
+    return args
+
 
+def get_anki_cards_dict(deck_name="Pleco Import", collection_path=None):
+    """Fetch the Anki deck's cards keyed by the Chinese characters of their front.
 
-def main():
+    Cards are read straight from collection_path when given. Otherwise only
+    cards modified since the last run are downloaded through AnkiConnect; the
+    rest come from the local deck snapshot.
+    """
+    if collection_path:
+        anki_cards = read_deck_cards(collection_path, deck_name)
+        print(len(anki_cards), "Anki cards read from", collection_path)
+        return {front_key(card): card for card in anki_cards}
+
+    snapshot = AnkiSnapshot(deck_name)
+    stats = snapshot.refresh()
+    snapshot.save()
+    print(
+        stats["fetched"],
+        "Anki cards fetched|",
+        stats["unchanged"],
+        "unchanged|",
+        stats["deleted"],
+        "deleted",
+    )
+    return snapshot.cards_by_front()
+
+
+def _timed(stage, func, *args, **kwargs):
+    """Call func, recording its duration as the given pipeline stage."""
+    with STAGE_SECONDS.time(stage=stage):
+        return func(*args, **kwargs)
+
+
+def fetch_inputs(args, xml_chunks=None):
+    """
+    Fetch the flashcard export and the Anki deck while loading the dictionaries.
+
+    Unless the export's chunks are given, Drive is first asked for the latest
+    export, a single metadata request, so a run without an export ends right
+    away. The download, the Anki fetch and the dictionary loading are then
+    independent and run side by side; the total wait is that of the slowest.
+    With --stream the download is left to happen as the chunks are consumed.
+
+    Returns:
+        tuple: (export chunks, or None if there is no export; Anki cards dict)
+    """
+    if xml_chunks is None:
+        with STAGE_SECONDS.time(stage="drive_lookup"):
+            xml_chunks = get_latest_flashcard_chunks()
+    if xml_chunks is None:
+        return None, None
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        warm_up = pool.submit(_timed, "warm_dictionaries", warm_dictionaries)
+        anki_cards = pool.submit(
+            _timed,
+            "anki_fetch",
+            get_anki_cards_dict,
+            collection_path=args.anki_collection,
+        )
+        if not args.stream:
+            xml_chunks = [_timed("drive_fetch", b"".join, xml_chunks)]
+        warm_up.result()
+        return xml_chunks, anki_cards.result()
+
+
+def run_stream(xml_chunks, anki_cards_dict, args):
+    """Format the export card by card, writing the results as line-delimited JSON."""
+    grading_cache = GradingCache()
+    with STAGE_SECONDS.time(stage="stream_pipeline"):
+        summary = run_streaming_pipeline(
+            xml_chunks,
+            anki_cards_dict,
+            jobs=args.jobs or None,
+            compact=args.compact,
+            cache=grading_cache,
+        )
+    grading_cache.save()
+    print(
+        summary["written"],
+        "entries written to",
+        STREAM_OUTPUT_FILE + "|",
+        summary["problematic"],
+        "error entries found",
+    )
+    print("\nGrading format results:")
+    print_grading_summary({"summary": summary})
+
+
+def main(argv=None):
     """
     Main function to process and format flashcard entries.
     """
+    args = parse_args(argv)
+
+    # Paths given on the command line are relative to where it was run
+    for option in PATH_OPTIONS:
+        if getattr(args, option):
+            setattr(args, option, os.path.abspath(getattr(args, option)))
+
     # Change to resources directory for file operations
     os.chdir("resources")
 
-    # Get latest flashcard XML from Google Drive
-    xml_text = get_latest_flashcard_xml()
-    if xml_text:
+    if args.stylesheet:
+        save_card_stylesheet(args.stylesheet)
+
+    try:
+        run(args)
+    finally:
+        if args.metrics_file:
+            REGISTRY.save(args.metrics_file)
+            print("Metrics written to", args.metrics_file)
+
+
+def run(args, xml_chunks=None):
+    """
+    Format a flashcard export and store, grade and export the results.
+
+    Args:
+        args (argparse.Namespace): Options, as returned by parse_args
+        xml_chunks (iterable): Byte chunks of the export to process; by default
+            the latest export is fetched from Google Drive
+    """
+    # Get latest flashcard XML from Google Drive (or the local copy, if unchanged)
+    # and the Anki deck, loading the dictionaries in the meantime
+    xml_chunks, anki_cards_dict = fetch_inputs(args, xml_chunks)
+    if xml_chunks is not None and args.stream:
+        run_stream(xml_chunks, anki_cards_dict, args)
+    elif xml_chunks is not None:
+        xml_text = b"".join(xml_chunks).decode("utf-8")
         # Process XML to get flashcard entries
-        flashcard_entries, error_entries = process_flashcard_xml(xml_text)
+        with STAGE_SECONDS.time(stage="parse"):
+            flashcard_entries, error_entries = process_flashcard_xml(xml_text)
         print(
             len(flashcard_entries),
             "flashcard entries found|",
@@ -30,40 +267,103 @@ def main():
             "error entries found",
         )
 
-        # Get Anki card information
-        anki_cards = get_anki_deck_cards("Pleco Import")
-        anki_cards_dict = {
-            re.sub(r"[^\u4e00-\u9fff]", "", card["fields"]["Front"]["value"]): card
-            for card in anki_cards
-        }
+        entry_store = EntryStore()
+        if not len(entry_store) and os.path.exists("flashcard_entries.json"):
+            print("Importing flashcard_entries.json into", entry_store.file_path)
+            entry_store.import_json()
+
+        # Only keep cards that changed since the last processed export
+        if args.incremental:
+            ingest_state = load_ingest_state()
+            flashcard_entries, unchanged_count, deleted_keys = diff_ingest_state(
+                flashcard_entries, ingest_state
+            )
+            print(
+                len(flashcard_entries),
+                "new or modified cards|",
+                unchanged_count,
+                "unchanged cards|",
+                len(deleted_keys),
+                "deleted cards",
+            )
+            for key in deleted_keys:
+                print("Card deleted from Pleco:", key)
+        else:
+            # rows imported from the legacy JSON file are matched without entry ID
+            exported_keys = {card_key(entry) for entry in flashcard_entries}
+            exported_keys.update(map(legacy_card_key, flashcard_entries))
+            deleted_keys = [
+                key for key in entry_store.keys() if key not in exported_keys
+            ]
 
         # Add formatted back and pinyin from Anki
         for entry in flashcard_entries:
-            anki_card = anki_cards_dict.get(entry["traditional"])
-            if anki_card:
-                entry["formatted_back"] = convert_unicode_segments(
-                    anki_card["fields"]["Back"]["value"]
-                )
-                entry["anki_pinyin"] = convert_unicode_segments(
-                    anki_card["fields"]["pinyin"]["value"]
-                )
-
-        # Save the processed entries
-        save_flashcard_entries(flashcard_entries)
+            add_anki_fields(entry, anki_cards_dict)
 
         # Format entries and check for errors
+        with STAGE_SECONDS.time(stage="format"):
+            formatted_backs, format_errors = format_entries(
+                flashcard_entries, jobs=args.jobs or None, compact=args.compact
+            )
+        for error in format_errors:
+            print(f"{error['traditional']}: Error formatting entry: {error['error']}")
+
+        # Grade the rendered backs against the backs currently in Anki
+        print("\nGrading format results:")
+        grading_cache = GradingCache()
+        with STAGE_SECONDS.time(stage="grade"):
+            report = build_grading_report(
+                flashcard_entries,
+                formatted_backs,
+                grading_cache,
+                jobs=args.jobs or None,
+                compact=args.compact,
+            )
+        grading_cache.save()
+        save_grading_report(report)
+        print_grading_summary(report)
+
         formatted_entries = []
-        for entry in flashcard_entries:
-            formatted_back = fmt_entry(entry)
+        for entry, formatted_back in zip(flashcard_entries, formatted_backs):
+            if formatted_back is None:
+                continue
             entry["formatted_back"] = formatted_back
             formatted_entries.append(entry)
 
-        # Save the formatted entries
-        save_flashcard_entries(formatted_entries)
+        # Push the backs that changed to Anki
+        if args.write_back:
+            updates = plan_writeback(
+                formatted_entries, anki_cards_dict, compact=args.compact
+            )
+            with STAGE_SECONDS.time(stage="write_back"):
+                writeback_report = write_back(updates, dry_run=args.dry_run)
+            save_writeback_report(writeback_report)
+            print(
+                len(updates),
+                "Anki notes",
+                "would be updated" if args.dry_run else "updated",
+                f"(see {WRITEBACK_REPORT_FILE})",
+            )
 
-        # Grade the formatting results
-        print("\nGrading format results:")
-        grade_fmt_entry(formatted_entries)
+        if args.apkg:
+            with STAGE_SECONDS.time(stage="apkg_export"):
+                count = export_apkg(formatted_entries, args.apkg)
+            print(count, "cards exported to", args.apkg)
+
+        # Save the entries; failed ones keep their Anki back and are marked as such
+        with entry_store, STAGE_SECONDS.time(stage="store"):
+            failed = [flashcard_entries[error["index"]] for error in format_errors]
+            for entry, error in zip(failed, format_errors):
+                entry["render_error"] = error["error"]
+            entry_store.upsert(failed, render_status=RENDER_ERROR)
+            written = entry_store.upsert(formatted_entries, RENDER_FORMATTED)
+            entry_store.delete(deleted_keys)
+            print(written, "entries updated in", entry_store.file_path)
+            if args.export_json:
+                entry_store.export_json(args.export_json)
+        if args.incremental:
+            update_ingest_state(ingest_state, formatted_entries, deleted_keys)
+            save_ingest_state(ingest_state)
     else:
         print("No flashcard XML found or error retrieving from Google Drive")
 
@@ -0,0 +1,219 @@
+"""Batch formatting of flashcard entries across a pool of worker processes."""
+
+import collections
+import functools
+import gc
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from pypinyin import pinyin
+
+from src.flashcard_formatting.format_entry import fmt_entry
+from src.utils.metrics import CARDS_FORMATTED, REGISTRY, STAGE_SECONDS
+from src.utils.pinyin import (
+    get_fifth_tone_pinyins,
+    load_manual_pinyins,
+    parse_cedict_toneless_pinyins,
+)
+from src.utils.variants_cached import (
+    get_c_variants,
+    load_cc_cedict,
+    load_manual_variants,
+    load_moedict,
+    load_unihan_variants,
+)
+
+
+def warm_dictionaries():
+    """
+    Load every dictionary fmt_entry depends on so later calls hit the caches.
+
+    The loaders are all cached, so this is a no-op in a process that has already
+    loaded them (e.g. a forked worker inheriting the parent's tables).
+    """
+    load_cc_cedict()
+    load_moedict()
+    get_c_variants()
+    load_unihan_variants()
+    load_manual_variants()
+    parse_cedict_toneless_pinyins()
+    load_manual_pinyins()
+    get_fifth_tone_pinyins()
+    pinyin("中")  # pypinyin loads its phrase tables on first use
+
+
+def format_worker_pool(jobs):
+    """
+    Process pool whose workers are forked from this process and share its memory.
+
+    Forked workers share the parent's memory pages until either side writes to
+    them, so dictionaries the parent has already loaded cost no extra memory
+    per worker. A garbage collection in a worker would update the header of
+    every object it scans, copying the pages holding those dictionaries; so
+    everything alive is moved out of the collector's reach with gc.freeze()
+    while the workers are forked, and handed back to it in the parent once
+    they have started.
+
+    The workers are forked before this returns, so threads started later (e.g.
+    a producer feeding the pool) never run during a fork. Fork is only used on
+    Linux; elsewhere the platform's default start method is kept and each
+    worker loads its own dictionaries.
+
+    Args:
+        jobs (int): Number of worker processes
+
+    Returns:
+        ProcessPoolExecutor: Pool whose workers start with the dictionaries loaded
+    """
+    if not sys.platform.startswith("linux"):
+        return ProcessPoolExecutor(max_workers=jobs, initializer=warm_dictionaries)
+
+    pool = ProcessPoolExecutor(
+        max_workers=jobs,
+        mp_context=multiprocessing.get_context("fork"),
+        initializer=warm_dictionaries,
+    )
+    gc.collect()
+    gc.freeze()
+    try:
+        # with fork, the first task starts every worker
+        pool.submit(int).result()
+    finally:
+        gc.unfreeze()
+    return pool
+
+
+def _format_one(indexed_entry, compact=False):
+    """Format a single (index, entry) pair, capturing any error instead of raising."""
+    i, entry = indexed_entry
+    try:
+        with STAGE_SECONDS.time(stage="format_entry"):
+            formatted_back = fmt_entry(entry, compact=compact)
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        CARDS_FORMATTED.inc(status="error")
+        return i, None, f"{type(e).__name__}: {e}"
+    CARDS_FORMATTED.inc(status="formatted")
+    return i, formatted_back, None
+
+
+def format_one_in_worker(indexed_entry, compact=False):
+    """
+    Format one entry in a format_worker_pool worker.
+
+    Args:
+        indexed_entry (tuple): (index, entry) pair
+        compact (bool): Render class-based HTML instead of inline styles
+
+    Returns:
+        tuple: The (index, formatted_back, error) result followed by the
+            metrics the worker recorded; pass it to merge_worker_result
+    """
+    return _format_one(indexed_entry, compact) + (REGISTRY.drain(),)
+
+
+def merge_worker_result(result):
+    """Add a worker's metrics to this process's registry, returning _format_one's result."""
+    REGISTRY.merge(result[3])
+    return result[:3]
+
+
+def format_entries(entries, jobs=1, compact=False):
+    """
+    Format many flashcard entries, optionally in parallel.
+
+    Args:
+        entries (list): Flashcard entry dicts as accepted by fmt_entry
+        jobs (int): Number of worker processes; 1 formats in-process and
+            None uses one worker per CPU
+        compact (bool): Render class-based HTML instead of inline styles
+
+    Returns:
+        tuple: (list of formatted backs, list of errors)
+        formatted backs are in input order, with None for entries that failed.
+        errors is a list of dictionaries with keys:
+            - index: Position of the entry in the input list
+            - traditional: Traditional headword of the entry
+            - error: Error message raised while formatting
+    """
+    entries = list(entries)
+    format_one = functools.partial(_format_one, compact=compact)
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = max(1, min(jobs, len(entries)))
+
+    if jobs == 1:
+        results = map(format_one, enumerate(entries))
+        return _collect_results(entries, results)
+
+    # a few chunks per worker keeps IPC overhead low while still balancing load
+    chunksize = max(1, len(entries) // (jobs * 4))
+    format_one = functools.partial(format_one_in_worker, compact=compact)
+    with format_worker_pool(jobs) as pool:
+        results = pool.map(format_one, enumerate(entries), chunksize=chunksize)
+        return _collect_results(entries, map(merge_worker_result, results))
+
+
+def iter_format_entries(entries, jobs=1, compact=False, max_pending=None):
+    """
+    Format a stream of flashcard entries, yielding results as they complete.
+
+    Unlike format_entries the input is consumed lazily: at most max_pending
+    entries are in flight at once, so a slow consumer throttles the producer
+    instead of results piling up in memory. The worker pool is started before
+    entries is first read, so a thread producing them is not running when the
+    workers are forked.
+
+    Args:
+        entries (iterable): Flashcard entry dicts as accepted by fmt_entry
+        jobs (int): Number of worker processes; 1 formats in-process and
+            None uses one worker per CPU
+        compact (bool): Render class-based HTML instead of inline styles
+        max_pending (int): Entries submitted ahead of the one being yielded;
+            defaults to four per worker
+
+    Yields:
+        tuple: (entry, formatted back or None, error message or None) in input order
+    """
+    format_one = functools.partial(_format_one, compact=compact)
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+
+    if jobs == 1:
+        for i, entry in enumerate(entries):
+            _, formatted_back, error = format_one((i, entry))
+            yield entry, formatted_back, error
+        return
+
+    max_pending = max(1, max_pending or jobs * 4)
+    pending = collections.deque()
+    format_one = functools.partial(format_one_in_worker, compact=compact)
+    with format_worker_pool(jobs) as pool:
+        for i, entry in enumerate(entries):
+            pending.append((entry, pool.submit(format_one, (i, entry))))
+            if len(pending) >= max_pending:
+                entry, future = pending.popleft()
+                _, formatted_back, error = merge_worker_result(future.result())
+                yield entry, formatted_back, error
+        while pending:
+            entry, future = pending.popleft()
+            _, formatted_back, error = merge_worker_result(future.result())
+            yield entry, formatted_back, error
+
+
+def _collect_results(entries, results):
+    """Split (index, formatted_back, error) results into backs and error records."""
+    formatted_backs = [None] * len(entries)
+    errors = []
+    for i, formatted_back, error in results:
+        formatted_backs[i] = formatted_back
+        if error is not None:
+            errors.append(
+                {
+                    "index": i,
+                    "traditional": entries[i].get("traditional", ""),
+                    "error": error,
+                }
+            )
+    return formatted_backs, errors
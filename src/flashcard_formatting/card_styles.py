@@ -0,0 +1,108 @@
+"""Compact class-based card HTML and the matching stylesheet for the Anki note type."""
+
+import regex as re
+
+from src.flashcard_formatting.color_utils import ToneColor
+
+HEADWORD_FONT_SIZE = "32px"
+LABEL_COLOR = "#B4B4B4"
+LABEL_FONT_SIZE = "0.80em"
+EXAMPLE_COLOR = "#0078C3"
+EXAMPLE_BLOCKQUOTE_STYLE = (
+    "border-left: 2px solid #0078c3; margin-left: 3px; padding-left: 1em;"
+    " margin-top: 0px; margin-bottom: 0px;"
+)
+TONE_CLASSES = {
+    ToneColor.RED.value: "t1",
+    ToneColor.GREEN.value: "t2",
+    ToneColor.BLUE.value: "t3",
+    ToneColor.PURPLE.value: "t4",
+    ToneColor.GREY.value: "t5",
+}
+
+# Ordered (pattern, replacement) pairs turning fmt_entry's inline styles into
+# classes. Nested style spans that only wrap text collapse into one element.
+COMPACT_REWRITES = [
+    (
+        re.compile(
+            rf'<span style="color:{LABEL_COLOR};"><b><span style="font-size:{LABEL_FONT_SIZE};">'
+            r"([^<]*)</span></b></span>"
+        ),
+        r'<b class="lbl">\1</b>',
+    ),
+    (
+        re.compile(
+            rf'<b><span style="font-size:{LABEL_FONT_SIZE};"><span style="color:{LABEL_COLOR};">'
+            r"([^<]*)</span></span></b>"
+        ),
+        r'<b class="lbl">\1</b>',
+    ),
+    (
+        re.compile(
+            r'<span style="color:(#[0-9A-F]{6});"><span style="font-weight:600;">'
+            r"([^<]*)</span></span>"
+        ),
+        lambda m: (
+            f'<span class="{TONE_CLASSES[m.group(1)]}">{m.group(2)}</span>'
+            if m.group(1) in TONE_CLASSES
+            else m.group(0)
+        ),
+    ),
+    (re.compile(r'<span style="font-weight:600;">'), '<span class="w">'),
+    (
+        re.compile(rf'<span style="font-size:{HEADWORD_FONT_SIZE}">'),
+        '<span class="hw">',
+    ),
+    (re.compile(rf'<span style="color:{EXAMPLE_COLOR};">'), '<span class="zh">'),
+    (
+        re.compile(rf'<blockquote style="{re.escape(EXAMPLE_BLOCKQUOTE_STYLE)}">'),
+        '<blockquote class="ex">',
+    ),
+]
+
+
+def compact_card_html(formatted_back):
+    """
+    Replace the inline styles of an fmt_entry back with short class names.
+
+    Markup that is already compact, or was not produced by fmt_entry, is left
+    unchanged, so this is safe to apply to backs fetched from Anki.
+
+    Args:
+        formatted_back (str): Card HTML using inline styles
+
+    Returns:
+        str: The same card using the classes defined by get_card_stylesheet
+    """
+    for pattern, replacement in COMPACT_REWRITES:
+        formatted_back = pattern.sub(replacement, formatted_back)
+    return formatted_back
+
+
+def get_card_stylesheet():
+    """
+    Build the CSS to paste into the Anki note type's Styling section.
+
+    Returns:
+        str: Stylesheet defining every class compact_card_html emits
+    """
+    rules = [
+        f".hw {{ font-size: {HEADWORD_FONT_SIZE}; }}",
+        f".lbl {{ color: {LABEL_COLOR}; font-size: {LABEL_FONT_SIZE}; }}",
+        ".w { font-weight: 600; }",
+    ]
+    rules += [
+        f".{tone_class} {{ color: {color}; font-weight: 600; }}"
+        for color, tone_class in TONE_CLASSES.items()
+    ]
+    rules += [
+        f".zh {{ color: {EXAMPLE_COLOR}; }}",
+        f"blockquote.ex {{ {EXAMPLE_BLOCKQUOTE_STYLE} }}",
+    ]
+    return "\n".join(rules) + "\n"
+
+
+def save_card_stylesheet(file_path="card_styles.css"):
+    """Write the card stylesheet to a file."""
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write(get_card_stylesheet())
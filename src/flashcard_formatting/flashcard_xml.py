@@ -1,6 +1,7 @@
 """Module for parsing and processing Pleco flashcard XML files."""
 
 import xml.etree.ElementTree as ET
+from src.utils.metrics import CARDS_INGESTED
 from src.utils.pinyin import convert_pinyin
 
 
@@ -8,7 +9,7 @@ def process_flashcard_xml(xml_text):
     """Process Pleco flashcard XML into dictionary entries.
 
     Args:
-        xml_text: XML string containing Pleco flashcard data
+        xml_text: XML string (or bytes) containing Pleco flashcard data
 
     Returns:
         tuple: (list of processed entries, list of problematic entries)
@@ -18,48 +19,105 @@ def process_flashcard_xml(xml_text):
             - pinyin: Pinyin representation
             - definition: English definition
             - dictid: Dictionary ID from the card
+            - entryid: Dictionary entry ID from the card (None if absent)
+            - created: Card creation time as a Unix timestamp (None if absent)
+            - modified: Card modification time as a Unix timestamp (None if absent)
     """
     # example xml text: <?xml version="1.0" encoding="UTF-8"?><plecoflash formatversion="2" creator="Pleco User 19097293" generator="Pleco 2.0 Flashcard Exporter" platform="iPhone OS" created="1735693200"><categories></categories><cards><card language="chinese" created="1735513394" modified="1735513394"><entry><headword charset="sc">游戏</headword><headword charset="tc">遊戲</headword><pron type="hypy" tones="numbers">you2xi4</pron><defn>noun recreation; game 做遊戲 Zuò yóuxì play games verb play 孩子們在公園裡遊戲。 Háizi men zài gōngyuán lǐ yóuxì. The children are playing in the park.</defn></entry><dictref dictid="PACE" entryid="35050240"/></card><card language="chinese" created="1735514285" modified="1735514285"><entry><headword charset="sc">革新</headword><headword charset="tc">革新</headword><pron type="hypy" tones="numbers">ge2xin1</pron><defn>noun innovation; renovation 技術革新 jìshù géxīn technological innovation verb innovate; improve 傳統的手工藝技術不斷革新。 Chuántǒng de shǒu gōngyì jìshù bùduàn géxīn. Traditional handicraft techniques are being steadily improved.</defn></entry><dictref dictid="PACE" entryid="21578752"/></card>
 
-    # Parse the XML content
-    root = ET.fromstring(xml_text)
-
-    # Find all <card> tags
-    cards = root.findall(".//card")
-
-    # Extract and print each entry
     entries_data = []
     problematic_cards = []
-    for card in cards:
-        try:
-            entries = card.findall("entry")
-            if len(entries) != 1:
-                print(ET.tostring(card, encoding="unicode"))
-                raise ValueError("Card does not contain exactly one entry.")
-
-            entry = entries[0]
-            simplified = entry.find('headword[@charset="sc"]').text
-            traditional = entry.find('headword[@charset="tc"]').text
-            pinyin = convert_pinyin(entry.find("pron").text)
-            if entry.find("defn") is None:
-                definition = ""
-            else:
-                definition = entry.find("defn").text
-            dictid = card.find("dictref").attrib["dictid"]
-
-            entry_data = {
-                "simplified": simplified,
-                "traditional": traditional,
-                "pinyin": pinyin,
-                "definition": definition,
-                "dictid": dictid,
-            }
-            if definition:
-                entries_data.append(entry_data)
-            else:
-                problematic_cards.append(entry_data)
-        except Exception as e:
-            print(ET.tostring(card, encoding="unicode"))
-            raise e
+    for entry_data in iter_flashcard_xml([xml_text]):
+        if entry_data["definition"]:
+            entries_data.append(entry_data)
+        else:
+            problematic_cards.append(entry_data)
 
     return entries_data, problematic_cards
+
+
+def iter_flashcard_xml(chunks):
+    """Incrementally parse a Pleco flashcard export, yielding entries card by card.
+
+    Each <card> element is discarded once its entry has been yielded, so memory
+    use stays flat regardless of the size of the export.
+
+    Args:
+        chunks: Iterable of bytes (or str) pieces of the XML document, e.g. a
+            download being streamed in
+
+    Yields:
+        dict: One entry per card, with the same keys as process_flashcard_xml.
+        Cards without a definition are yielded too, with an empty definition.
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    open_elements = []
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from _drain_cards(parser, open_elements)
+    parser.close()
+    yield from _drain_cards(parser, open_elements)
+
+
+def _drain_cards(parser, open_elements):
+    """Yield entries for every card the pull parser has finished, then free them."""
+    for event, element in parser.read_events():
+        if event == "start":
+            open_elements.append(element)
+            continue
+        open_elements.pop()
+        if element.tag != "card":
+            continue
+        entry = parse_card(element)
+        CARDS_INGESTED.inc()
+        yield entry
+        element.clear()
+        if open_elements:
+            open_elements[-1].remove(element)
+
+
+def parse_card(card):
+    """Convert a single Pleco <card> element into an entry dictionary.
+
+    Args:
+        card: xml.etree.ElementTree.Element for the <card>
+
+    Returns:
+        dict: Entry with simplified, traditional, pinyin, definition, dictid,
+            entryid, created and modified
+    """
+    try:
+        entries = card.findall("entry")
+        if len(entries) != 1:
+            print(ET.tostring(card, encoding="unicode"))
+            raise ValueError("Card does not contain exactly one entry.")
+
+        entry = entries[0]
+        simplified = entry.find('headword[@charset="sc"]').text
+        traditional = entry.find('headword[@charset="tc"]').text
+        pinyin = convert_pinyin(entry.find("pron").text)
+        if entry.find("defn") is None:
+            definition = ""
+        else:
+            definition = entry.find("defn").text
+        dictref = card.find("dictref")
+        dictid = dictref.attrib["dictid"]
+
+        return {
+            "simplified": simplified,
+            "traditional": traditional,
+            "pinyin": pinyin,
+            "definition": definition,
+            "dictid": dictid,
+            "entryid": dictref.get("entryid"),
+            "created": _timestamp(card.get("created")),
+            "modified": _timestamp(card.get("modified")),
+        }
+    except Exception as e:
+        print(ET.tostring(card, encoding="unicode"))
+        raise e
+
+
+def _timestamp(value):
+    """Convert a Pleco timestamp attribute to an int, keeping None for missing ones."""
+    return int(value) if value else None
@@ -1,16 +1,18 @@
 """Module for formatting dictionary entries into HTML-formatted Anki flashcards."""
 
-import re
+import regex as re
 
+from src.flashcard_formatting.card_styles import compact_card_html
 from src.flashcard_formatting.color_utils import get_pinyin_color
-from src.flashcard_formatting.html_utils import (
-    fix_separated_pos_tags,
-    reorder_bold_and_color_spans,
+from src.flashcard_formatting.grading import (
+    grade_back,
+    normalize_expected_back,
+    normalize_result_back,
 )
 from src.flashcard_formatting.label_segments import label_segments
 
 
-def fmt_entry(entry):
+def fmt_entry(entry, compact=False):
     """
     Format a dictionary entry into HTML for Anki flashcard display.
 
@@ -20,6 +22,8 @@ def fmt_entry(entry):
             - simplified: Simplified Chinese characters
             - pinyin: List of pinyin strings
             - definition: English definition
+        compact (bool): Emit class names backed by the card stylesheet instead
+            of inline styles
 
     Returns:
         str: Formatted HTML for the flashcard back
@@ -122,6 +126,8 @@ def fmt_entry(entry):
     )
     formatted_back = formatted_back.replace(") a surname", ")<br/>\na surname")
 
+    if compact:
+        formatted_back = compact_card_html(formatted_back)
     return formatted_back
 
 
@@ -148,6 +154,8 @@ def grade_fmt_entry(
     to_drop=None,
     stop_at_fail=False,
     print_at_fail=False,
+    results=None,
+    cache=None,
 ):
     """
     Compare formatted entries with expected output and report differences.
@@ -158,55 +166,49 @@ def grade_fmt_entry(
         to_drop (list): List of indices to skip
         stop_at_fail (bool): Whether to stop at first failure
         print_at_fail (bool): Whether to print details at failure
+        results (list): Precomputed fmt_entry output for each entry; entries are
+            rendered on the fly when omitted
+        cache (GradingCache): Optional cache of normalized expected backs
     """
     if to_drop is None:
         to_drop = []
 
     flashcard_entries = drop(flashcard_entries, to_drop)
+    if results is not None:
+        results = drop(results, to_drop)
     correct_count = 0
     length_diff_count = 0
     wrong_count = 0
 
     for i, entry in enumerate(flashcard_entries):
-        expected = entry["formatted_back"]
-        expected = expected.replace(' ;=""', ";")
-        expected = reorder_bold_and_color_spans(expected)
-        expected = re.sub(r"<plecoentry.*?</plecoentry>$", "", expected)
-        expected = expected.replace("\xa0", " ")
-        expected = fix_separated_pos_tags(expected)
-        result = fmt_entry(entry)
-        result = re.sub(
-            r" See \uead1\ueada\d+\uead8\p{Han}+\uead9[\w\d]+\uead0\p{Han}+\uead2",
-            "",
-            result,
-        )
-
-        if expected != result and re.sub(r"[()]", "", expected) != re.sub(
-            r"[()]", "", result
-        ):
-            for j in range(min(len(expected), len(result))):
-                if expected[j] != result[j]:
-                    wrong_count += 1
-                    if stop_at_fail or print_at_fail:
-                        print("{i} wrd:", repr(entry["traditional"]))
-                        print(f"Exp: {repr(expected[j:j + n_error_char_show])}...")
-                        print(f"Got: {repr(result[j:j + n_error_char_show])}...")
-                        print(f"Def: {entry['definition']}...")
-                        if stop_at_fail:
-                            return
-                    break
-            else:
-                length_diff_count += 1
+        expected = cache.get(entry) if cache else None
+        if expected is None:
+            expected = normalize_expected_back(entry["formatted_back"])
+            if cache:
+                cache.put(entry, expected)
+        result = results[i] if results is not None else fmt_entry(entry)
+        result = normalize_result_back(result)
+
+        status, j = grade_back(expected, result)
+        if status == "wrong":
+            wrong_count += 1
+            if stop_at_fail or print_at_fail:
+                print(f"{i} wrd:", repr(entry["traditional"]))
+                print(f"Exp: {repr(expected[j:j + n_error_char_show])}...")
+                print(f"Got: {repr(result[j:j + n_error_char_show])}...")
+                print(f"Def: {entry['definition']}...")
                 if stop_at_fail:
-                    print(f"Total correct entries: {correct_count}")
-                    print(f"Total wrong entries: {wrong_count}")
-                    print(
-                        f"Total entries differing only in length: {length_diff_count}"
-                    )
-                    print(f"{i}: {repr(expected[j:j + n_error_char_show])}...")
-                    print("wrd:", repr(entry["traditional"]))
-                    print("def:", repr(entry["definition"]))
                     return
+        elif status == "length_diff":
+            length_diff_count += 1
+            if stop_at_fail:
+                print(f"Total correct entries: {correct_count}")
+                print(f"Total wrong entries: {wrong_count}")
+                print(f"Total entries differing only in length: {length_diff_count}")
+                print(f"{i}: {repr(expected[j:j + n_error_char_show])}...")
+                print("wrd:", repr(entry["traditional"]))
+                print("def:", repr(entry["definition"]))
+                return
         else:
             correct_count += 1
 
@@ -0,0 +1,283 @@
+"""Grading engine comparing rendered flashcard backs against the backs stored in Anki."""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import regex as re
+
+from src.flashcard_formatting.card_styles import compact_card_html
+from src.flashcard_formatting.html_utils import (
+    fix_separated_pos_tags,
+    reorder_bold_and_color_spans,
+)
+from src.utils.metrics import GRADING_CACHE_LOOKUPS
+
+# Bump whenever normalize_expected_back changes so stale cache entries are dropped
+NORMALIZER_VERSION = 1
+GRADING_CACHE_FILE = "grading_cache.json"
+GRADING_REPORT_FILE = "grading_report.json"
+
+SEE_REFERENCE_PATTERN = re.compile(
+    r" See \uead1\ueada\d+\uead8\p{Han}+\uead9[\w\d]+\uead0\p{Han}+\uead2"
+)
+PLECO_ENTRY_PATTERN = re.compile(r"<plecoentry.*?</plecoentry>$")
+PARENS_PATTERN = re.compile(r"[()]")
+
+
+def normalize_expected_back(formatted_back):
+    """
+    Normalize an Anki back so it can be compared with fmt_entry output.
+
+    Args:
+        formatted_back (str): The back field as stored in Anki
+
+    Returns:
+        str: The normalized HTML
+    """
+    expected = formatted_back.replace(' ;=""', ";")
+    expected = reorder_bold_and_color_spans(expected)
+    expected = PLECO_ENTRY_PATTERN.sub("", expected)
+    expected = expected.replace("\xa0", " ")
+    return fix_separated_pos_tags(expected)
+
+
+def normalize_result_back(result):
+    """Strip the cross references fmt_entry keeps but Anki backs never contain."""
+    return SEE_REFERENCE_PATTERN.sub("", result)
+
+
+def first_diff_offset(expected, result):
+    """
+    Find the first index at which two strings differ.
+
+    Bisects on slice equality so the character comparisons run in C rather
+    than in a Python loop.
+
+    Args:
+        expected (str): The expected string
+        result (str): The string to compare against it
+
+    Returns:
+        int: Offset of the first differing character (the length of the shorter
+            string if one is a prefix of the other), or None if they are equal
+    """
+    if expected == result:
+        return None
+    lo, hi = 0, min(len(expected), len(result))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if expected[lo:mid] == result[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def grade_back(expected, result):
+    """
+    Grade a normalized rendered back against a normalized expected back.
+
+    Returns:
+        tuple: (status, first differing offset) where status is one of
+            "correct", "wrong" or "length_diff"
+    """
+    offset = first_diff_offset(expected, result)
+    if offset is None or PARENS_PATTERN.sub("", expected) == PARENS_PATTERN.sub(
+        "", result
+    ):
+        return "correct", None
+    if offset < min(len(expected), len(result)):
+        return "wrong", offset
+    return "length_diff", offset
+
+
+class GradingCache:
+    """Persistent cache of normalized expected backs keyed on a hash of the Anki back.
+
+    Only the content of the back matters, so reviewing a card (which changes
+    its modification time) does not invalidate its entry. Entries not looked
+    up during a run are dropped when the cache is saved, so backs that were
+    edited or deleted in Anki do not pile up.
+    """
+
+    def __init__(self, file_path=GRADING_CACHE_FILE):
+        self.file_path = file_path
+        self.backs = {}
+        self.used = set()
+        self.dirty = False
+        if file_path and os.path.exists(file_path):
+            with open(file_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            if data.get("version") == NORMALIZER_VERSION:
+                self.backs = data["backs"]
+
+    @staticmethod
+    def key(entry):
+        """Cache key for an entry: a content hash of its Anki back."""
+        return hashlib.sha1(entry["formatted_back"].encode("utf-8")).hexdigest()
+
+    def get(self, entry):
+        """Return the cached normalized back for an entry, or None."""
+        key = self.key(entry)
+        self.used.add(key)
+        normalized = self.backs.get(key)
+        GRADING_CACHE_LOOKUPS.inc(result="miss" if normalized is None else "hit")
+        return normalized
+
+    def put(self, entry, normalized):
+        """Store the normalized back for an entry."""
+        key = self.key(entry)
+        self.used.add(key)
+        self.backs[key] = normalized
+        self.dirty = True
+
+    def save(self):
+        """Write the cache back to disk, without the entries this run did not use."""
+        if not self.file_path:
+            return
+        backs = {key: back for key, back in self.backs.items() if key in self.used}
+        if not self.dirty and len(backs) == len(self.backs):
+            return
+        self.backs = backs
+        tmp_path = self.file_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(
+                {"version": NORMALIZER_VERSION, "backs": self.backs},
+                file,
+                ensure_ascii=False,
+            )
+        os.replace(tmp_path, self.file_path)
+        self.dirty = False
+
+
+def normalize_expected_backs(entries, cache=None, jobs=1):
+    """
+    Normalize the expected back of every entry, reusing cached results.
+
+    Args:
+        entries (list): Flashcard entries carrying an Anki "formatted_back"
+        cache (GradingCache): Optional cache of previously normalized backs
+        jobs (int): Number of worker processes for the uncached backs
+
+    Returns:
+        list: Normalized expected backs in input order
+    """
+    normalized = [cache.get(entry) if cache else None for entry in entries]
+    missing = [i for i, back in enumerate(normalized) if back is None]
+    raw_backs = [entries[i]["formatted_back"] for i in missing]
+
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if jobs > 1 and len(raw_backs) > 1:
+        chunksize = max(1, len(raw_backs) // (jobs * 4))
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            fresh = list(
+                pool.map(normalize_expected_back, raw_backs, chunksize=chunksize)
+            )
+    else:
+        fresh = [normalize_expected_back(back) for back in raw_backs]
+
+    for i, back in zip(missing, fresh):
+        normalized[i] = back
+        if cache:
+            cache.put(entries[i], back)
+    return normalized
+
+
+def grade_result(expected, result, n_error_char_show=10, compact=False):
+    """
+    Grade one rendered back against its normalized expected back.
+
+    Args:
+        expected (str): Anki back as returned by normalize_expected_back
+        result (str): Back rendered by fmt_entry
+        n_error_char_show (int): Number of characters of context kept for mismatches
+        compact (bool): The result is class-based; compact the expected back too
+
+    Returns:
+        dict: status and first_diff, plus expected/got excerpts for mismatches
+    """
+    result = normalize_result_back(result)
+    if compact:
+        expected = compact_card_html(expected)
+    status, offset = grade_back(expected, result)
+    record = {"status": status, "first_diff": offset}
+    if offset is not None:
+        record["expected"] = expected[offset : offset + n_error_char_show]
+        record["got"] = result[offset : offset + n_error_char_show]
+    return record
+
+
+def build_grading_report(
+    entries, results, cache=None, jobs=1, n_error_char_show=10, compact=False
+):
+    """
+    Grade precomputed fmt_entry results against the backs stored in Anki.
+
+    Args:
+        entries (list): Flashcard entries; the Anki back is read from "formatted_back"
+        results (list): Rendered backs in the same order, None where rendering failed
+        cache (GradingCache): Optional cache of normalized expected backs
+        jobs (int): Number of worker processes used to normalize uncached backs
+        n_error_char_show (int): Number of characters of context kept for mismatches
+        compact (bool): Results are class-based; compact the expected backs too
+
+    Returns:
+        dict: JSON-serializable report with keys:
+            - summary: Count of entries per status plus the total
+            - entries: One record per entry with index, traditional, status and
+              first_diff, plus expected/got excerpts for mismatches
+    """
+    gradable = [
+        i
+        for i, (entry, result) in enumerate(zip(entries, results))
+        if entry.get("formatted_back") and result is not None
+    ]
+    expected_backs = dict(
+        zip(
+            gradable,
+            normalize_expected_backs([entries[i] for i in gradable], cache, jobs),
+        )
+    )
+
+    summary = {"total": len(entries), "correct": 0, "wrong": 0, "length_diff": 0}
+    summary.update({"error": 0, "missing": 0})
+    records = []
+    for i, (entry, result) in enumerate(zip(entries, results)):
+        record = {"index": i, "traditional": entry.get("traditional", "")}
+        if result is None:
+            status, offset = "error", None
+        elif i not in expected_backs:
+            status, offset = "missing", None
+        else:
+            graded = grade_result(expected_backs[i], result, n_error_char_show, compact)
+            status, offset = graded.pop("status"), graded.pop("first_diff")
+            record.update(graded)
+        record["status"] = status
+        record["first_diff"] = offset
+        summary[status] += 1
+        records.append(record)
+
+    return {"summary": summary, "entries": records}
+
+
+def save_grading_report(report, file_path=GRADING_REPORT_FILE):
+    """Save a grading report to a JSON file."""
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=4)
+
+
+def print_grading_summary(report):
+    """Print the totals of a grading report."""
+    summary = report["summary"]
+    graded = summary["correct"] + summary["wrong"]
+    print(f"Total correct entries: {summary['correct']}/{graded}")
+    print(f"Total wrong entries: {summary['wrong']}/{graded}")
+    print(f"Total entries differing only in length: {summary['length_diff']}")
+    if summary["error"] or summary["missing"]:
+        print(
+            f"Entries not graded: {summary['error']} failed to render,",
+            f"{summary['missing']} have no Anki back",
+        )
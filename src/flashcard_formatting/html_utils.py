@@ -1,7 +1,8 @@
 """Utilities for manipulating HTML in flashcard content, focusing on span and style management."""
 
 import re
-from bs4 import BeautifulSoup
+
+from src.utils.html_normalizer import normalize_html
 
 
 def reorder_bold_and_color_spans(html_text):
@@ -14,34 +15,7 @@ def reorder_bold_and_color_spans(html_text):
     Returns:
         str: The processed HTML text with reordered tags
     """
-    # Parse the HTML text
-    soup = BeautifulSoup(f"<root>{html_text}</root>", "html.parser")
-
-    # Find all bold tags
-    bold_tags = soup.find_all("b")
-
-    for bold_tag in bold_tags:
-        # Check if the bold tag contains a span with the specific color #0078C3
-        color_span = bold_tag.find("span", style=lambda s: s and "color:#0078C3" in s)
-
-        if color_span:
-            # Get the content of the span
-            content = color_span.contents
-
-            # Create new structure: span outside, b inside
-            new_span = soup.new_tag("span")
-            new_span["style"] = color_span["style"]
-
-            new_bold = soup.new_tag("b")
-            new_bold.extend(content)
-
-            new_span.append(new_bold)
-
-            # Replace the old structure with the new one
-            bold_tag.replace_with(new_span)
-
-    # Convert the soup back to a string
-    return str(soup).replace("<root>", "").replace("</root>", "")
+    return normalize_html(html_text, reorder_bold=True)
 
 
 def fix_separated_pos_tags(html_text):
@@ -4,10 +4,10 @@ import regex as re
 import json
 from src.utils.utils import overlap_length
 from src.flashcard_formatting.example_sentences import add_bold_segments
+from src.utils.metrics import EXAMPLE_ALIGNMENT_FAILURES
 from src.utils.pinyin import get_fifth_tone_pinyins
 from src.utils.resource_utils import get_resource_path
 
-
 # Load the part of speech keywords from the JSON file
 with open(
     get_resource_path("part_of_speech_keywords.json"), "r", encoding="utf-8"
@@ -228,6 +228,7 @@ def bold_example_sentences(segments, traditional_word):
             try:
                 add_bold_segments(seg, traditional_word=traditional_word)
             except ValueError as e:
+                EXAMPLE_ALIGNMENT_FAILURES.inc()
                 print(
                     f"{traditional_word}: Error processing example sentence: {seg}, converting to english: {e}"
                 )
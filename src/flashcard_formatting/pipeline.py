@@ -0,0 +1,184 @@
+"""Streaming pipeline chaining XML parsing, Anki field merging, formatting and output."""
+
+import queue
+import threading
+
+from src.flashcard_formatting.batch_format import iter_format_entries
+from src.flashcard_formatting.flashcard_xml import iter_flashcard_xml
+from src.flashcard_formatting.grading import (
+    grade_result,
+    normalize_expected_back,
+)
+from src.utils.file_utils import (
+    convert_unicode_segments,
+    write_flashcard_entries_ndjson,
+)
+
+STREAM_OUTPUT_FILE = "flashcard_entries.ndjson"
+DEFAULT_BUFFER_SIZE = 64
+
+_DONE = object()
+
+
+def add_anki_fields(entry, anki_cards_dict):
+    """
+    Copy the back and pinyin of the matching Anki card into an entry.
+
+    Args:
+        entry (dict): Flashcard entry from the Pleco export
+        anki_cards_dict (dict): Anki cardsInfo records keyed by traditional headword
+
+    Returns:
+        dict: The same entry, updated in place
+    """
+    anki_card = anki_cards_dict.get(entry["traditional"])
+    if anki_card:
+        entry["formatted_back"] = convert_unicode_segments(
+            anki_card["fields"]["Back"]["value"]
+        )
+        entry["anki_pinyin"] = convert_unicode_segments(
+            anki_card["fields"]["pinyin"]["value"]
+        )
+    return entry
+
+
+def buffered(iterable, maxsize=DEFAULT_BUFFER_SIZE):
+    """
+    Run an iterable in a background thread, handing items over through a bounded queue.
+
+    The producer blocks once maxsize items are waiting, so a stage can run ahead
+    of its consumer without its output accumulating in memory. Exceptions raised
+    by the producer are re-raised in the consumer.
+
+    Args:
+        iterable: Upstream stage
+        maxsize (int): Maximum number of items buffered between the two stages
+
+    Yields:
+        The items of iterable, in order
+    """
+    buffer = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+    errors = []
+
+    def produce():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                buffer.put(item)
+        except BaseException as e:  # pylint: disable=broad-exception-caught
+            errors.append(e)
+        buffer.put(_DONE)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                if errors:
+                    raise errors[0]
+                return
+            yield item
+    finally:
+        # unblock a producer stuck on a full queue if the consumer stopped early
+        stop.set()
+        while thread.is_alive():
+            try:
+                buffer.get_nowait()
+            except queue.Empty:
+                thread.join(0.01)
+
+
+def iter_graded_entries(results, summary, cache=None, compact=False):
+    """
+    Grade formatted entries as they stream past and replace their Anki back.
+
+    Entries that failed to format are reported and passed on with their Anki
+    back, the error message in "render_error", like the batch run stores them.
+
+    Args:
+        results: (entry, formatted back, error) tuples from iter_format_entries
+        summary (dict): Grading counts, updated in place (see build_grading_report)
+        cache (GradingCache): Optional cache of normalized expected backs
+        compact (bool): Results are class-based; compact the expected backs too
+
+    Yields:
+        dict: Entries with "formatted_back" set to the rendered back, or with
+            "render_error" set if rendering failed
+    """
+    for entry, formatted_back, error in results:
+        summary["total"] += 1
+        if formatted_back is None:
+            print(f"{entry['traditional']}: Error formatting entry: {error}")
+            summary["error"] += 1
+            entry["render_error"] = error
+            yield entry
+            continue
+
+        if entry.get("formatted_back"):
+            expected = cache.get(entry) if cache else None
+            if expected is None:
+                expected = normalize_expected_back(entry["formatted_back"])
+                if cache:
+                    cache.put(entry, expected)
+            status = grade_result(expected, formatted_back, compact=compact)["status"]
+            summary[status] += 1
+        else:
+            summary["missing"] += 1
+
+        entry["formatted_back"] = formatted_back
+        yield entry
+
+
+def run_streaming_pipeline(
+    xml_chunks,
+    anki_cards_dict,
+    output_path=STREAM_OUTPUT_FILE,
+    jobs=1,
+    compact=False,
+    cache=None,
+    buffer_size=DEFAULT_BUFFER_SIZE,
+):
+    """
+    Parse, merge, format, grade and write flashcard entries one card at a time.
+
+    Parsing runs in its own thread and formatting in a worker pool, each with a
+    bounded buffer in front of the next stage, so memory stays flat regardless of
+    the size of the export and the first entries reach the output immediately.
+
+    Args:
+        xml_chunks: Iterable of pieces of the Pleco export
+        anki_cards_dict (dict): Anki cardsInfo records keyed by traditional headword
+        output_path (str): Line-delimited JSON file receiving the formatted entries
+        jobs (int): Number of formatting worker processes (None = one per CPU)
+        compact (bool): Render class-based HTML instead of inline styles
+        cache (GradingCache): Optional cache of normalized expected backs
+        buffer_size (int): Maximum number of entries held between two stages
+
+    Returns:
+        dict: Grading summary with the same keys as build_grading_report's,
+            plus "problematic" (cards without a definition) and "written"
+    """
+    summary = {"total": 0, "correct": 0, "wrong": 0, "length_diff": 0}
+    summary.update({"error": 0, "missing": 0, "problematic": 0})
+
+    def parsed_entries():
+        for entry in iter_flashcard_xml(xml_chunks):
+            if not entry["definition"]:
+                summary["problematic"] += 1
+                continue
+            yield add_anki_fields(entry, anki_cards_dict)
+
+    # buffered() starts its thread on the first read, after the pool has forked
+    formatted = iter_format_entries(
+        buffered(parsed_entries(), buffer_size),
+        jobs=jobs,
+        compact=compact,
+        max_pending=buffer_size,
+    )
+    summary["written"] = write_flashcard_entries_ndjson(
+        iter_graded_entries(formatted, summary, cache, compact), output_path
+    )
+    return summary
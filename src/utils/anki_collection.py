@@ -0,0 +1,170 @@
+"""Read-only access to a local Anki collection file, bypassing AnkiConnect."""
+
+import contextlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+
+# Modern collections (schema 15+) store decks, note types and fields in tables and
+# separate deck levels with \x1f; older ones keep JSON in the col row and use "::".
+DECK_SEPARATORS = {"table": "\x1f", "json": "::"}
+
+CARDS_QUERY = """
+SELECT c.id, c.nid, c.did, c.ord, c.mod, c.type, c.queue, c.due, c.ivl,
+       c.factor, c.reps, c.lapses, c.left, n.mid, n.flds
+FROM cards c JOIN notes n ON n.id = c.nid
+WHERE c.did IN ({placeholders})
+ORDER BY c.id
+"""
+
+
+def _unicase(a, b):
+    """Anki's case-insensitive collation, needed to query its schema 15+ tables."""
+    a, b = a.casefold(), b.casefold()
+    return (a > b) - (a < b)
+
+
+@contextlib.contextmanager
+def open_collection(collection_path, copy=True):
+    """
+    Open an Anki collection read-only.
+
+    Args:
+        collection_path (str): Path of a collection.anki2 file
+        copy (bool): Read from a temporary copy, so a running Anki keeps its
+            lock on the original and a half-written transaction is never seen
+
+    Yields:
+        sqlite3.Connection: Read-only connection to the collection
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if copy:
+            copied_path = os.path.join(tmp_dir, "collection.anki2")
+            shutil.copyfile(collection_path, copied_path)
+            wal_path = collection_path + "-wal"
+            if os.path.exists(wal_path):
+                shutil.copyfile(wal_path, copied_path + "-wal")
+            collection_path = copied_path
+        connection = sqlite3.connect(
+            f"file:{collection_path}?mode=ro", uri=True, check_same_thread=False
+        )
+        connection.create_collation("unicase", _unicase)
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+
+def _layout(connection):
+    """Whether decks and note types live in their own tables or in the col row."""
+    has_decks_table = connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'decks'"
+    ).fetchone()
+    return "table" if has_decks_table else "json"
+
+
+def _deck_names(connection, layout):
+    """Map deck IDs to names, with levels joined by "::" as AnkiConnect shows them."""
+    if layout == "table":
+        return {
+            did: name.replace(DECK_SEPARATORS["table"], "::")
+            for did, name in connection.execute("SELECT id, name FROM decks")
+        }
+    decks = json.loads(connection.execute("SELECT decks FROM col").fetchone()[0])
+    return {int(did): deck["name"] for did, deck in decks.items()}
+
+
+def _note_types(connection, layout):
+    """Map note type IDs to (name, field names in order)."""
+    if layout == "table":
+        names = dict(connection.execute("SELECT id, name FROM notetypes"))
+        fields = {}
+        for ntid, name in connection.execute(
+            "SELECT ntid, name FROM fields ORDER BY ntid, ord"
+        ):
+            fields.setdefault(ntid, []).append(name)
+        return {ntid: (names[ntid], fields.get(ntid, [])) for ntid in names}
+    models = json.loads(connection.execute("SELECT models FROM col").fetchone()[0])
+    return {
+        int(mid): (
+            model["name"],
+            [field["name"] for field in sorted(model["flds"], key=lambda f: f["ord"])],
+        )
+        for mid, model in models.items()
+    }
+
+
+def read_deck_cards(collection_path, deck_name, copy=True):
+    """
+    Read the cards of a deck and its subdecks from a local collection file.
+
+    Args:
+        collection_path (str): Path of a collection.anki2 file
+        deck_name (str): Deck to read, e.g. "Pleco Import"
+        copy (bool): Read from a temporary copy of the collection
+
+    Returns:
+        list: Cards in the shape of AnkiConnect's cardsInfo records (without the
+            rendered question and answer), as consumed by get_anki_deck_cards callers
+    """
+    with open_collection(collection_path, copy=copy) as connection:
+        layout = _layout(connection)
+        deck_names = _deck_names(connection, layout)
+        deck_ids = [
+            did
+            for did, name in deck_names.items()
+            if name == deck_name or name.startswith(deck_name + "::")
+        ]
+        if not deck_ids:
+            raise ValueError(f"No deck named {deck_name} in {collection_path}.")
+        note_types = _note_types(connection, layout)
+
+        cards = []
+        rows = connection.execute(
+            CARDS_QUERY.format(placeholders=", ".join("?" * len(deck_ids))),
+            deck_ids,
+        )
+        for (
+            card_id,
+            note_id,
+            deck_id,
+            ordinal,
+            mod,
+            card_type,
+            queue,
+            due,
+            interval,
+            factor,
+            reps,
+            lapses,
+            left,
+            model_id,
+            flds,
+        ) in rows:
+            model_name, field_names = note_types.get(model_id, ("", []))
+            values = flds.split("\x1f")
+            cards.append(
+                {
+                    "cardId": card_id,
+                    "note": note_id,
+                    "deckName": deck_names[deck_id],
+                    "modelName": model_name,
+                    "ord": ordinal,
+                    "fields": {
+                        name: {"value": value, "order": order}
+                        for order, (name, value) in enumerate(zip(field_names, values))
+                    },
+                    "mod": mod,
+                    "type": card_type,
+                    "queue": queue,
+                    "due": due,
+                    "interval": interval,
+                    "factor": factor,
+                    "reps": reps,
+                    "lapses": lapses,
+                    "left": left,
+                }
+            )
+    return cards
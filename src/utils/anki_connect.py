@@ -1,79 +1,232 @@
 """Interface to AnkiConnect API for managing Anki flashcard operations."""
 
+import functools
 import re
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
+
 from src.constants import ANKI_CONNECT_URL
+from src.utils.metrics import ANKI_CONNECT_REQUEST_SECONDS
 
+ANKI_CONNECT_VERSION = 6
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_TIMEOUT = 60
 
-def get_anki_deck_cards(deck_name):
-    """Retrieve detailed card information from a specified deck."""
-    find_payload = {
-        "action": "findCards",
-        "version": 6,
-        "params": {
-            "query": f'deck:"{deck_name}"'  # Query for cards only in the specified deck
-        },
-    }
 
-    response = requests.post(ANKI_CONNECT_URL, json=find_payload, timeout=60)
+def build_payload(action, params):
+    """Request body for an AnkiConnect action."""
+    payload = {"action": action, "version": ANKI_CONNECT_VERSION}
+    if params:
+        payload["params"] = params
+    return payload
 
-    if response.status_code == 200:
-        find_result = response.json()
-        if "result" in find_result and find_result["result"]:
-            card_ids = find_result["result"]
-            info_payload = {
-                "action": "cardsInfo",
-                "version": 6,
-                "params": {"cards": card_ids},  # Pass the list of card IDs
-            }
 
-            info_response = requests.post(
-                ANKI_CONNECT_URL, json=info_payload, timeout=60
-            )
+def unwrap_result(action, response):
+    """Return the result of an AnkiConnect response, raising ConnectionError on errors."""
+    if response.get("error"):
+        raise ConnectionError(f"Error in AnkiConnect {action}: {response['error']}")
+    return response.get("result")
+
+
+def join_batches(action, results):
+    """
+    Concatenate the results of a batched action.
 
-            if info_response.status_code == 200:
-                info_result = info_response.json()
-                if "result" in info_result and info_result["result"]:
-                    return info_result["result"]
-                else:
-                    raise ConnectionError(
-                        f"Error retrieving card information: {info_result.get('error')}"
-                    )
-            else:
-                raise ConnectionError(
-                    "Failed to connect to AnkiConnect for card information."
+    Raises:
+        ConnectionError: If AnkiConnect returned no result for a batch
+    """
+    if any(result is None for result in results):
+        raise ConnectionError(f"AnkiConnect returned no result for {action}.")
+    return [item for result in results for item in result]
+
+
+def build_multi(actions):
+    """Parameters of a multi action running (action, params) pairs."""
+    return {
+        "actions": [
+            {"action": action, "version": ANKI_CONNECT_VERSION, "params": params}
+            for action, params in actions
+        ]
+    }
+
+
+def unwrap_multi(actions, results):
+    """Return the results of a multi action, raising ConnectionError if any failed."""
+    errors = [
+        f"{action}: {result['error']}"
+        for (action, _), result in zip(actions, results)
+        if isinstance(result, dict) and result.get("error")
+    ]
+    if errors:
+        raise ConnectionError("Error in AnkiConnect multi: " + "; ".join(errors))
+    return [
+        result["result"] if isinstance(result, dict) else result for result in results
+    ]
+
+
+class AnkiConnectClient:
+    """AnkiConnect client reusing keep-alive connections and batching large requests.
+
+    cardsInfo/notesInfo requests are split into batches of batch_size IDs fetched
+    over a small thread pool, so no single response is large enough to time out.
+    """
+
+    def __init__(
+        self,
+        url=ANKI_CONNECT_URL,
+        batch_size=DEFAULT_BATCH_SIZE,
+        max_workers=DEFAULT_MAX_WORKERS,
+        timeout=DEFAULT_TIMEOUT,
+    ):
+        self.url = url
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Close the pooled connections."""
+        self.session.close()
+
+    def invoke(self, action, **params):
+        """
+        Call a single AnkiConnect action.
+
+        Returns:
+            The action's result
+
+        Raises:
+            ConnectionError: If AnkiConnect is unreachable or reports an error
+        """
+        payload = build_payload(action, params)
+        try:
+            with ANKI_CONNECT_REQUEST_SECONDS.time(action=action):
+                response = self.session.post(
+                    self.url, json=payload, timeout=self.timeout
                 )
+        except requests.RequestException as e:
+            raise ConnectionError(
+                f"Failed to connect to AnkiConnect for {action}."
+            ) from e
+        if response.status_code != 200:
+            raise ConnectionError(
+                f"Failed to connect to AnkiConnect for {action}: "
+                f"HTTP {response.status_code}"
+            )
+        return unwrap_result(action, response.json())
+
+    def multi(self, actions):
+        """
+        Run several actions in one request through AnkiConnect's multi action.
+
+        Args:
+            actions (list): (action, params dict) pairs
+
+        Returns:
+            list: The result of each action, in order
+
+        Raises:
+            ConnectionError: If any of the actions failed
+        """
+        return unwrap_multi(actions, self.invoke("multi", **build_multi(actions)))
+
+    def batched(self, action, key, ids):
+        """
+        Call an action taking a list of IDs in batches, in parallel.
+
+        Args:
+            action (str): Action name, e.g. "cardsInfo"
+            key (str): Name of the parameter holding the IDs, e.g. "cards"
+            ids (list): IDs to pass
+
+        Returns:
+            list: The concatenated results, in the order of ids
+
+        Raises:
+            ConnectionError: If AnkiConnect fails or returns no result for a batch
+        """
+        ids = list(ids)
+        batches = [
+            ids[i : i + self.batch_size] for i in range(0, len(ids), self.batch_size)
+        ]
+        if len(batches) <= 1 or self.max_workers <= 1:
+            results = [self.invoke(action, **{key: batch}) for batch in batches]
         else:
-            raise ValueError(f"No cards found or error: {find_result.get('error')}")
-    else:
-        raise ConnectionError("Failed to connect to AnkiConnect for finding cards.")
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                results = list(
+                    pool.map(lambda batch: self.invoke(action, **{key: batch}), batches)
+                )
+        return join_batches(action, results)
 
+    def find_cards(self, query):
+        """Return the IDs of the cards matching a search query."""
+        return self.invoke("findCards", query=query)
 
-def sync_anki():
-    """Sync Anki with the cloud to ensure the latest data is available."""
-    sync_payload = {"action": "sync", "version": 6}
+    def find_notes(self, query):
+        """Return the IDs of the notes matching a search query."""
+        return self.invoke("findNotes", query=query)
 
-    sync_response = requests.post(ANKI_CONNECT_URL, json=sync_payload, timeout=60)
+    def cards_info(self, card_ids):
+        """Return cardsInfo records for the given card IDs."""
+        return self.batched("cardsInfo", "cards", card_ids)
 
-    if sync_response.status_code == 200:
-        sync_result = sync_response.json()
-        if sync_result.get("error"):
-            raise ConnectionError(f"Error syncing Anki: {sync_result['error']}")
-        else:
-            print("Anki sync successful.")
-    else:
-        raise ConnectionError("Failed to connect to AnkiConnect for syncing.")
+    def notes_info(self, note_ids):
+        """Return notesInfo records for the given note IDs."""
+        return self.batched("notesInfo", "notes", note_ids)
+
+    def sync(self):
+        """Sync Anki with AnkiWeb."""
+        return self.invoke("sync")
+
+
+@functools.lru_cache(maxsize=None)
+def get_client():
+    """Shared AnkiConnect client, created on first use."""
+    return AnkiConnectClient()
+
+
+def get_anki_deck_cards(deck_name, client=None):
+    """Retrieve detailed card information from a specified deck."""
+    client = client or get_client()
+    # Query for cards only in the specified deck
+    card_ids = client.find_cards(f'deck:"{deck_name}"')
+    if not card_ids:
+        raise ValueError(f"No cards found in deck {deck_name}.")
+    return client.cards_info(card_ids)
+
+
+def sync_anki(client=None):
+    """Sync Anki with the cloud to ensure the latest data is available."""
+    (client or get_client()).sync()
+    print("Anki sync successful.")
 
 
 def get_latest_anki_flaschard_words():
     """Retrieve the latest flashcard words from the 'Pleco Import' deck in Anki."""
     flashcard_set = set()
+    client = get_client()
 
-    # Step 0: Sync Anki with the cloud
-    sync_anki()
+    # Step 0: Sync Anki with the cloud, then find the cards of the "Pleco Import"
+    # deck in the same request
+    _, card_ids = client.multi(
+        [("sync", {}), ("findCards", {"query": 'deck:"Pleco Import"'})]
+    )
+    print("Anki sync successful.")
 
-    # Step 1: Find all card information in the "Pleco Import" deck
-    card_info = get_anki_deck_cards("Pleco Import")
+    # Step 1: Fetch the card information in batches
+    card_info = client.cards_info(card_ids)
     print(f"Total cards found in 'Pleco Import': {len(card_info)}")
 
     # Step 2: Extract the "Front" field for each card and add to the set
@@ -0,0 +1,311 @@
+"""Asyncio AnkiConnect client, so Anki I/O can overlap with other pipeline stages."""
+
+import asyncio
+import json
+from urllib.parse import urlsplit
+
+from src.constants import ANKI_CONNECT_URL
+from src.utils.anki_connect import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_TIMEOUT,
+    build_multi,
+    build_payload,
+    join_batches,
+    unwrap_multi,
+    unwrap_result,
+)
+from src.utils.metrics import ANKI_CONNECT_REQUEST_SECONDS
+
+DEFAULT_MAX_CONCURRENCY = 4
+
+
+class StaleConnectionError(ConnectionError):
+    """The server closed the connection without answering the request."""
+
+
+RETRYABLE_ERRORS = (
+    StaleConnectionError,
+    ConnectionResetError,
+    ConnectionRefusedError,
+    BrokenPipeError,
+)
+
+
+async def read_response_head(reader):
+    """
+    Read an HTTP response's status line and headers.
+
+    Returns:
+        tuple: (HTTP version, status code, headers dict with lowercase names)
+
+    Raises:
+        StaleConnectionError: If the connection was closed before the response
+        ConnectionError: If the response is not valid HTTP
+    """
+    status_line = await reader.readline()
+    if not status_line:
+        raise StaleConnectionError("Connection closed before the response")
+    try:
+        version, status = status_line.decode("latin-1").split(None, 2)[:2]
+        status = int(status)
+    except ValueError as e:
+        raise ConnectionError(f"Malformed HTTP status line: {status_line!r}") from e
+    if not version.startswith("HTTP/"):
+        raise ConnectionError(f"Malformed HTTP status line: {status_line!r}")
+
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b"\n"):
+        if not line:
+            raise ConnectionError("Connection closed in the response headers")
+        name, separator, value = line.decode("latin-1").partition(":")
+        if not separator:
+            raise ConnectionError(f"Malformed HTTP header: {line!r}")
+        headers[name.strip().lower()] = value.strip()
+    return version, status, headers
+
+
+async def read_response_body(reader, headers):
+    """
+    Read an HTTP response body, delimited by Content-Length, chunked or by EOF.
+
+    Returns:
+        tuple: (body bytes, whether the connection can carry another request)
+
+    Raises:
+        ConnectionError: If the framing of the body is invalid
+    """
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        chunks = []
+        while True:
+            size_line = await reader.readline()
+            try:
+                size = int(size_line.split(b";")[0], 16)
+            except ValueError as e:
+                raise ConnectionError(f"Malformed chunk size: {size_line!r}") from e
+            if not size:
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+        # skip trailers up to the blank line ending the body
+        while await reader.readline() not in (b"\r\n", b"\n", b""):
+            pass
+        return b"".join(chunks), True
+    if "content-length" in headers:
+        try:
+            length = int(headers["content-length"])
+        except ValueError as e:
+            raise ConnectionError(
+                f"Malformed Content-Length: {headers['content-length']!r}"
+            ) from e
+        return await reader.readexactly(length), True
+    return await reader.read(), False
+
+
+class AsyncAnkiConnectClient:
+    """AnkiConnect client on asyncio streams with a pool of keep-alive connections.
+
+    Responses may be framed by Content-Length, chunked or by closing the
+    connection. At most max_concurrency requests are in flight at once, each over its own
+    connection, and every request is bounded by timeout seconds.
+    """
+
+    def __init__(
+        self,
+        url=ANKI_CONNECT_URL,
+        batch_size=DEFAULT_BATCH_SIZE,
+        max_concurrency=DEFAULT_MAX_CONCURRENCY,
+        timeout=DEFAULT_TIMEOUT,
+    ):
+        parts = urlsplit(url)
+        if parts.scheme != "http":
+            raise ValueError(f"Only http AnkiConnect URLs are supported: {url}")
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.path = parts.path or "/"
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._idle = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Close the pooled connections."""
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+        for _, writer in idle:
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def invoke(self, action, **params):
+        """
+        Call a single AnkiConnect action.
+
+        Returns:
+            The action's result
+
+        Raises:
+            ConnectionError: If AnkiConnect is unreachable, too slow or reports an error
+        """
+        body = json.dumps(build_payload(action, params)).encode("utf-8")
+        async with self._semaphore:
+            try:
+                with ANKI_CONNECT_REQUEST_SECONDS.time(action=action):
+                    status, response = await asyncio.wait_for(
+                        self._post(body), self.timeout
+                    )
+            except (
+                OSError,
+                ValueError,
+                asyncio.TimeoutError,
+                asyncio.IncompleteReadError,
+            ) as e:
+                raise ConnectionError(
+                    f"Failed to connect to AnkiConnect for {action}."
+                ) from e
+        if status != 200:
+            raise ConnectionError(
+                f"Failed to connect to AnkiConnect for {action}: HTTP {status}"
+            )
+        try:
+            data = json.loads(response)
+        except ValueError as e:
+            raise ConnectionError(
+                f"Invalid response from AnkiConnect for {action}."
+            ) from e
+        return unwrap_result(action, data)
+
+    async def _post(self, body):
+        """
+        Send one POST request, returning (status, body).
+
+        A pooled connection may have been closed by AnkiConnect since it was
+        last used (it closes connections without announcing it); the request
+        is then retried once on a fresh connection.
+        """
+        try:
+            return await self._exchange(*await self._connect(), body)
+        except RETRYABLE_ERRORS:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+            return await self._exchange(reader, writer, body)
+
+    async def _connect(self):
+        while self._idle:
+            reader, writer = self._idle.pop()
+            if not reader.at_eof():
+                return reader, writer
+            writer.close()
+        return await asyncio.open_connection(self.host, self.port)
+
+    async def _exchange(self, reader, writer, body):
+        try:
+            writer.write(
+                (
+                    f"POST {self.path} HTTP/1.1\r\n"
+                    f"Host: {self.host}:{self.port}\r\n"
+                    "Content-Type: application/json\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    "Connection: keep-alive\r\n\r\n"
+                ).encode("ascii")
+                + body
+            )
+            await writer.drain()
+            version, status, headers = await read_response_head(reader)
+            response, reusable = await read_response_body(reader, headers)
+        except BaseException:
+            writer.close()
+            raise
+        if (
+            not reusable
+            or version == "HTTP/1.0"
+            or headers.get("connection", "").lower() == "close"
+        ):
+            writer.close()
+        else:
+            self._idle.append((reader, writer))
+        return status, response
+
+    async def multi(self, actions):
+        """
+        Run several actions in one request through AnkiConnect's multi action.
+
+        Args:
+            actions (list): (action, params dict) pairs
+
+        Returns:
+            list: The result of each action, in order
+        """
+        return unwrap_multi(actions, await self.invoke("multi", **build_multi(actions)))
+
+    async def batched(self, action, key, ids):
+        """
+        Call an action taking a list of IDs in batches, concurrently.
+
+        Returns:
+            list: The concatenated results, in the order of ids
+        """
+        ids = list(ids)
+        results = await asyncio.gather(
+            *(
+                self.invoke(action, **{key: ids[i : i + self.batch_size]})
+                for i in range(0, len(ids), self.batch_size)
+            )
+        )
+        return join_batches(action, results)
+
+    async def find_cards(self, query):
+        """Return the IDs of the cards matching a search query."""
+        return await self.invoke("findCards", query=query)
+
+    async def find_notes(self, query):
+        """Return the IDs of the notes matching a search query."""
+        return await self.invoke("findNotes", query=query)
+
+    async def cards_info(self, card_ids):
+        """Return cardsInfo records for the given card IDs."""
+        return await self.batched("cardsInfo", "cards", card_ids)
+
+    async def notes_info(self, note_ids):
+        """Return notesInfo records for the given note IDs."""
+        return await self.batched("notesInfo", "notes", note_ids)
+
+    async def sync(self):
+        """Sync Anki with AnkiWeb."""
+        return await self.invoke("sync")
+
+    async def update_note_fields(self, updates):
+        """
+        Update the fields of many notes, batch_size notes per multi request.
+
+        Args:
+            updates (list): (note ID, {field name: value}) pairs
+        """
+        await asyncio.gather(
+            *(
+                self.multi(
+                    [
+                        (
+                            "updateNoteFields",
+                            {"note": {"id": note_id, "fields": fields}},
+                        )
+                        for note_id, fields in updates[i : i + self.batch_size]
+                    ]
+                )
+                for i in range(0, len(updates), self.batch_size)
+            )
+        )
+
+
+async def get_anki_deck_cards_async(deck_name, client):
+    """Retrieve detailed card information from a specified deck."""
+    card_ids = await client.find_cards(f'deck:"{deck_name}"')
+    if not card_ids:
+        raise ValueError(f"No cards found in deck {deck_name}.")
+    return await client.cards_info(card_ids)
@@ -0,0 +1,164 @@
+"""Local snapshot of an Anki deck, refreshed by fetching only the cards that changed."""
+
+import json
+import os
+import re
+import time
+
+from src.utils.anki_connect import get_client
+
+ANKI_SNAPSHOT_FILE = "anki_snapshot.json"
+SNAPSHOT_VERSION = 1
+
+
+def front_key(card):
+    """Chinese characters of a card's front, used to match it to Pleco entries."""
+    return re.sub(r"[^\u4e00-\u9fff]", "", card["fields"]["Front"]["value"])
+
+
+class AnkiSnapshot:
+    """Cached cardsInfo records of one deck, with the modification times they were fetched at.
+
+    Each refresh asks AnkiConnect for the card IDs of the deck and the card and
+    note modification times, then only fetches cardsInfo for cards that are new
+    or whose card or note changed since the snapshot was taken.
+
+    A note modified while its cards are being fetched may or may not be
+    reflected in them, so its modification time is only recorded if it
+    predates the fetch; otherwise the card is fetched again on the next refresh.
+    """
+
+    def __init__(self, deck_name="Pleco Import", file_path=ANKI_SNAPSHOT_FILE):
+        self.deck_name = deck_name
+        self.file_path = file_path
+        # card ID (as a string, like JSON keys) -> {"card", "key", "note_mod"}
+        self.cards = {}
+        if file_path and os.path.exists(file_path):
+            with open(file_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            if (
+                data.get("version") == SNAPSHOT_VERSION
+                and data.get("deck") == deck_name
+            ):
+                self.cards = data["cards"]
+
+    def refresh(self, client=None):
+        """
+        Bring the snapshot up to date with the deck in Anki.
+
+        Args:
+            client (AnkiConnectClient): Client to use instead of the shared one
+
+        Returns:
+            dict: Number of cards fetched, unchanged and deleted
+        """
+        client = client or get_client()
+        card_ids = client.find_cards(f'deck:"{self.deck_name}"')
+        current = {str(card_id) for card_id in card_ids}
+        deleted = [card_id for card_id in self.cards if card_id not in current]
+        for card_id in deleted:
+            del self.cards[card_id]
+
+        stale = self._stale_card_ids(client, card_ids)
+        # Anki modification times are in whole seconds
+        fetch_started = int(time.time())
+        for card in client.cards_info(stale):
+            self.cards[str(card["cardId"])] = {
+                "card": card,
+                "key": front_key(card),
+                "note_mod": None,
+            }
+        self._record_note_mods(client, stale, fetch_started)
+
+        # keep the deck's card order so lookups resolve duplicates like a full fetch
+        self.cards = {
+            str(card_id): self.cards[str(card_id)]
+            for card_id in card_ids
+            if str(card_id) in self.cards
+        }
+        return {
+            "fetched": len(stale),
+            "unchanged": len(card_ids) - len(stale),
+            "deleted": len(deleted),
+        }
+
+    def _stale_card_ids(self, client, card_ids):
+        """IDs of the cards that are new or modified since they were cached."""
+        cached = [card_id for card_id in card_ids if str(card_id) in self.cards]
+        if not cached:
+            return list(card_ids)
+        note_ids = sorted(
+            {self.cards[str(card_id)]["card"]["note"] for card_id in cached}
+        )
+        try:
+            card_mods, note_mods = client.multi(
+                [
+                    ("cardsModTime", {"cards": cached}),
+                    ("notesModTime", {"notes": note_ids}),
+                ]
+            )
+        except ConnectionError as e:
+            # older AnkiConnect versions lack the ModTime actions
+            print(f"Falling back to a full Anki fetch: {e}")
+            return list(card_ids)
+        card_mods = {item["cardId"]: item["mod"] for item in card_mods}
+        note_mods = {item["noteId"]: item["mod"] for item in note_mods}
+
+        stale = []
+        for card_id in card_ids:
+            cached_card = self.cards.get(str(card_id))
+            if (
+                cached_card is None
+                or card_mods.get(card_id) != cached_card["card"].get("mod")
+                or note_mods.get(cached_card["card"]["note"]) != cached_card["note_mod"]
+            ):
+                stale.append(card_id)
+        return stale
+
+    def _record_note_mods(self, client, card_ids, fetch_started):
+        """Store the note modification time of freshly fetched cards, if before fetch_started."""
+        fetched = [
+            self.cards[str(card_id)]
+            for card_id in card_ids
+            if str(card_id) in self.cards
+        ]
+        if not fetched:
+            return
+        note_ids = sorted({cached_card["card"]["note"] for cached_card in fetched})
+        try:
+            note_mods = client.invoke("notesModTime", notes=note_ids)
+        except ConnectionError:
+            return
+        note_mods = {item["noteId"]: item["mod"] for item in note_mods}
+        for cached_card in fetched:
+            note_mod = note_mods.get(cached_card["card"]["note"])
+            if note_mod is not None and note_mod < fetch_started:
+                cached_card["note_mod"] = note_mod
+
+    def cards_info(self):
+        """Return the cached cardsInfo records in deck order."""
+        return [cached_card["card"] for cached_card in self.cards.values()]
+
+    def cards_by_front(self):
+        """Return the cached cardsInfo records keyed by the Chinese characters of their front."""
+        return {
+            cached_card["key"]: cached_card["card"]
+            for cached_card in self.cards.values()
+        }
+
+    def save(self):
+        """Write the snapshot to disk, replacing the previous one atomically."""
+        if not self.file_path:
+            return
+        tmp_path = self.file_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "version": SNAPSHOT_VERSION,
+                    "deck": self.deck_name,
+                    "cards": self.cards,
+                },
+                file,
+                ensure_ascii=False,
+            )
+        os.replace(tmp_path, self.file_path)
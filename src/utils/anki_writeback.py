@@ -0,0 +1,191 @@
+"""Push rendered card backs to Anki, updating only the notes whose back changed."""
+
+import hashlib
+import html
+import json
+import os
+import time
+
+import regex as re
+
+from src.flashcard_formatting.card_styles import compact_card_html
+from src.flashcard_formatting.grading import (
+    normalize_expected_back,
+    normalize_result_back,
+)
+from src.utils.anki_connect import get_client
+
+WRITEBACK_REPORT_FILE = "writeback_report.json"
+DEFAULT_BATCH_SIZE = 50
+# Pause between batches so Anki's UI thread, which runs every action, stays responsive
+DEFAULT_MIN_INTERVAL = 0.5
+
+# The element Pleco appends to every back it exports, linking the card to its entry
+TRAILING_PLECO_ENTRY_PATTERN = re.compile(
+    r"<plecoentry\b[^>]*?(?:/>|>\s*</plecoentry>)\s*$"
+)
+# Cross-references added by hand; the renderer never produces them for Anki
+USER_REFERENCE_PATTERN = re.compile(r"\bSee\s+(?:<[^>]*>\s*)*\p{Han}")
+
+
+def back_hash(back):
+    """Content hash of a card back, ignoring how characters are entity-encoded."""
+    return hashlib.sha1(html.unescape(back).encode("utf-8")).hexdigest()
+
+
+def has_user_markup(back):
+    """
+    Whether an Anki back holds markup written by hand, which a rewrite would lose.
+
+    That is a "See ..." cross-reference, or a <plecoentry> element other than
+    the empty one Pleco appends at the end.
+    """
+    back = TRAILING_PLECO_ENTRY_PATTERN.sub("", back)
+    return "<plecoentry" in back or bool(USER_REFERENCE_PATTERN.search(back))
+
+
+def plan_writeback(entries, anki_cards_dict, field="Back", compact=False):
+    """
+    Work out which Anki notes need their back replaced by the rendered one.
+
+    Backs are compared the way they are graded: the Anki back through
+    normalize_expected_back and the rendered one through normalize_result_back,
+    so notes differing only in markup details are left alone. So are notes
+    carrying hand-written markup (see has_user_markup). The element Pleco
+    appends to its backs is kept on the new back.
+
+    Args:
+        entries (list): Formatted entries, "formatted_back" holding the rendered back
+        anki_cards_dict (dict): Anki cardsInfo records keyed by traditional headword
+        field (str): Name of the note field holding the back
+        compact (bool): The rendered backs are class-based
+
+    Returns:
+        list: One update per changed note, with keys:
+            - note: Anki note ID
+            - traditional: Traditional headword of the entry
+            - old_hash, new_hash: back_hash of the normalized current and
+              rendered backs
+            - back: The back to write
+    """
+    updates = []
+    seen_notes = set()
+    for entry in entries:
+        anki_card = anki_cards_dict.get(entry["traditional"])
+        if not anki_card or not entry.get("formatted_back"):
+            continue
+        note_id = anki_card["note"]
+        if note_id in seen_notes:
+            continue
+        seen_notes.add(note_id)
+        old_back = anki_card["fields"][field]["value"]
+        expected = normalize_expected_back(old_back)
+        if compact:
+            expected = compact_card_html(expected)
+        old_hash = back_hash(expected)
+        new_hash = back_hash(normalize_result_back(entry["formatted_back"]))
+        if old_hash == new_hash:
+            continue
+        if has_user_markup(old_back):
+            print(f"{entry['traditional']}: back has hand-written markup, kept as is")
+            continue
+        pleco_entry = TRAILING_PLECO_ENTRY_PATTERN.search(old_back)
+        updates.append(
+            {
+                "note": note_id,
+                "traditional": entry["traditional"],
+                "old_hash": old_hash,
+                "new_hash": new_hash,
+                "back": entry["formatted_back"]
+                + (pleco_entry.group().strip() if pleco_entry else ""),
+            }
+        )
+    return updates
+
+
+def write_back(
+    updates,
+    client=None,
+    field="Back",
+    batch_size=DEFAULT_BATCH_SIZE,
+    min_interval=DEFAULT_MIN_INTERVAL,
+    dry_run=False,
+    report_path=WRITEBACK_REPORT_FILE,
+):
+    """
+    Send planned updates to Anki as batched updateNoteFields calls.
+
+    If a batch fails, the report so far (with the notes already written) is
+    saved to report_path before the error is raised.
+
+    Args:
+        updates (list): Updates from plan_writeback
+        client (AnkiConnectClient): Client to use instead of the shared one
+        field (str): Name of the note field holding the back
+        batch_size (int): Number of notes updated per multi request
+        min_interval (float): Minimum number of seconds between two requests
+        dry_run (bool): Only report what would be updated
+        report_path (str): Where the report is saved when a batch fails
+
+    Returns:
+        dict: JSON-serializable report with the number of notes updated, the
+            number of requests sent, whether it was a dry run, the planned
+            updates without their backs and the IDs of the notes written
+
+    Raises:
+        ConnectionError: If a batch could not be written
+    """
+    report = {
+        "dry_run": dry_run,
+        "updated": 0,
+        "requests": 0,
+        "notes": [
+            {key: value for key, value in update.items() if key != "back"}
+            for update in updates
+        ],
+        "written_notes": [],
+    }
+    if dry_run or not updates:
+        return report
+
+    client = client or get_client()
+    last_request = None
+    for i in range(0, len(updates), batch_size):
+        if last_request is not None:
+            time.sleep(max(0.0, min_interval - (time.monotonic() - last_request)))
+        batch = updates[i : i + batch_size]
+        last_request = time.monotonic()
+        report["requests"] += 1
+        try:
+            client.multi(
+                [
+                    (
+                        "updateNoteFields",
+                        {
+                            "note": {
+                                "id": update["note"],
+                                "fields": {field: update["back"]},
+                            }
+                        },
+                    )
+                    for update in batch
+                ]
+            )
+        except ConnectionError as e:
+            # notes of the failed batch may or may not have been written
+            report["error"] = str(e)
+            report["failed_notes"] = [update["note"] for update in batch]
+            if report_path:
+                save_writeback_report(report, report_path)
+            raise
+        report["updated"] += len(batch)
+        report["written_notes"].extend(update["note"] for update in batch)
+    return report
+
+
+def save_writeback_report(report, file_path=WRITEBACK_REPORT_FILE):
+    """Atomically save a write-back report to a JSON file."""
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, file_path)
@@ -0,0 +1,305 @@
+"""Export formatted flashcard entries straight to an Anki package (.apkg).
+
+An .apkg is a zip holding a SQLite Anki collection (collection.anki2) and a
+media manifest. Writing it directly lets thousands of cards be imported in one
+go, without Anki running and without going through AnkiConnect note by note.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import string
+import tempfile
+import time
+import zipfile
+
+from src.flashcard_formatting.card_styles import get_card_stylesheet
+from src.utils.ingest_state import card_key
+
+DEFAULT_DECK_NAME = "Pleco Import"
+MODEL_NAME = "Pleco Import"
+MODEL_FIELDS = ["Front", "Back", "pinyin"]
+FRONT_TEMPLATE = "{{Front}}"
+BACK_TEMPLATE = '{{FrontSide}}\n\n<hr id="answer">\n\n{{Back}}'
+
+COLLECTION_SCHEMA = """
+CREATE TABLE col (
+    id integer PRIMARY KEY, crt integer NOT NULL, mod integer NOT NULL,
+    scm integer NOT NULL, ver integer NOT NULL, dty integer NOT NULL,
+    usn integer NOT NULL, ls integer NOT NULL, conf text NOT NULL,
+    models text NOT NULL, decks text NOT NULL, dconf text NOT NULL,
+    tags text NOT NULL
+);
+CREATE TABLE notes (
+    id integer PRIMARY KEY, guid text NOT NULL, mid integer NOT NULL,
+    mod integer NOT NULL, usn integer NOT NULL, tags text NOT NULL,
+    flds text NOT NULL, sfld integer NOT NULL, csum integer NOT NULL,
+    flags integer NOT NULL, data text NOT NULL
+);
+CREATE TABLE cards (
+    id integer PRIMARY KEY, nid integer NOT NULL, did integer NOT NULL,
+    ord integer NOT NULL, mod integer NOT NULL, usn integer NOT NULL,
+    type integer NOT NULL, queue integer NOT NULL, due integer NOT NULL,
+    ivl integer NOT NULL, factor integer NOT NULL, reps integer NOT NULL,
+    lapses integer NOT NULL, left integer NOT NULL, odue integer NOT NULL,
+    odid integer NOT NULL, flags integer NOT NULL, data text NOT NULL
+);
+CREATE TABLE revlog (
+    id integer PRIMARY KEY, cid integer NOT NULL, usn integer NOT NULL,
+    ease integer NOT NULL, ivl integer NOT NULL, lastIvl integer NOT NULL,
+    factor integer NOT NULL, time integer NOT NULL, type integer NOT NULL
+);
+CREATE TABLE graves (usn integer NOT NULL, oid integer NOT NULL, type integer NOT NULL);
+CREATE INDEX ix_notes_usn ON notes (usn);
+CREATE INDEX ix_cards_usn ON cards (usn);
+CREATE INDEX ix_revlog_usn ON revlog (usn);
+CREATE INDEX ix_cards_nid ON cards (nid);
+CREATE INDEX ix_cards_sched ON cards (did, queue, due);
+CREATE INDEX ix_revlog_cid ON revlog (cid);
+CREATE INDEX ix_notes_csum ON notes (csum);
+"""
+
+# Characters Anki uses for the base 91 note GUIDs it generates itself
+GUID_ALPHABET = string.ascii_letters + string.digits + "!#$%&()*+,-./:;<=>?@[]^_`{|}~"
+
+
+def stable_id(name):
+    """Positive 63-bit ID derived from a name, so re-exports reuse the same IDs."""
+    return int(hashlib.sha1(name.encode("utf-8")).hexdigest()[:15], 16)
+
+
+def note_guid(entry):
+    """
+    Anki note GUID derived from the Pleco card, in Anki's own base 91 format.
+
+    Importing a package with notes Anki already has (same GUID) updates them
+    instead of adding duplicates.
+    """
+    value = int(hashlib.sha1(card_key(entry).encode("utf-8")).hexdigest()[:16], 16)
+    guid = ""
+    while value:
+        value, digit = divmod(value, len(GUID_ALPHABET))
+        guid = GUID_ALPHABET[digit] + guid
+    return guid or GUID_ALPHABET[0]
+
+
+def field_checksum(value):
+    """Checksum Anki stores to detect duplicate notes from their first field."""
+    return int(hashlib.sha1(value.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def entry_fields(entry):
+    """Front, back and pinyin of a formatted entry, in MODEL_FIELDS order."""
+    pinyin = entry.get("anki_pinyin") or entry["pinyin"]
+    if isinstance(pinyin, list):
+        pinyin = " ".join(pinyin)
+    return [entry["traditional"], entry["formatted_back"], pinyin]
+
+
+def _collection_metadata(deck_name, model_id, deck_id, now):
+    """JSON blobs of the col table: configuration, note types, decks and deck options."""
+    model = {
+        "id": model_id,
+        "name": MODEL_NAME,
+        "type": 0,
+        "mod": now,
+        "usn": -1,
+        "sortf": 0,
+        "did": deck_id,
+        "tmpls": [
+            {
+                "name": "Card 1",
+                "ord": 0,
+                "qfmt": FRONT_TEMPLATE,
+                "afmt": BACK_TEMPLATE,
+                "did": None,
+                "bqfmt": "",
+                "bafmt": "",
+            }
+        ],
+        "flds": [
+            {
+                "name": name,
+                "ord": i,
+                "sticky": False,
+                "rtl": False,
+                "font": "Arial",
+                "size": 20,
+                "media": [],
+            }
+            for i, name in enumerate(MODEL_FIELDS)
+        ],
+        "css": get_card_stylesheet(),
+        "latexPre": "\\documentclass[12pt]{article}\n\\begin{document}\n",
+        "latexPost": "\\end{document}",
+        "latexsvg": False,
+        "req": [[0, "any", [0]]],
+        "tags": [],
+        "vers": [],
+    }
+
+    def deck(did, name):
+        return {
+            "id": did,
+            "name": name,
+            "mod": now,
+            "usn": -1,
+            "lrnToday": [0, 0],
+            "revToday": [0, 0],
+            "newToday": [0, 0],
+            "timeToday": [0, 0],
+            "collapsed": False,
+            "browserCollapsed": False,
+            "desc": "",
+            "dyn": 0,
+            "conf": 1,
+            "extendNew": 0,
+            "extendRev": 0,
+        }
+
+    deck_options = {
+        "id": 1,
+        "name": "Default",
+        "mod": 0,
+        "usn": 0,
+        "maxTaken": 60,
+        "autoplay": True,
+        "timer": 0,
+        "replayq": True,
+        "dyn": False,
+        "new": {
+            "bury": True,
+            "delays": [1, 10],
+            "initialFactor": 2500,
+            "ints": [1, 4, 7],
+            "order": 1,
+            "perDay": 20,
+            "separate": True,
+        },
+        "lapse": {
+            "delays": [10],
+            "leechAction": 0,
+            "leechFails": 8,
+            "minInt": 1,
+            "mult": 0,
+        },
+        "rev": {
+            "bury": True,
+            "ease4": 1.3,
+            "fuzz": 0.05,
+            "ivlFct": 1,
+            "maxIvl": 36500,
+            "minSpace": 1,
+            "perDay": 100,
+        },
+    }
+    conf = {
+        "nextPos": 1,
+        "estTimes": True,
+        "activeDecks": [1],
+        "sortType": "noteFld",
+        "timeLim": 0,
+        "sortBackwards": False,
+        "addToCur": True,
+        "curDeck": 1,
+        "newSpread": 0,
+        "dueCounts": True,
+        "curModel": model_id,
+        "collapseTime": 1200,
+    }
+    return (
+        json.dumps(conf),
+        json.dumps({str(model_id): model}),
+        json.dumps({"1": deck(1, "Default"), str(deck_id): deck(deck_id, deck_name)}),
+        json.dumps({"1": deck_options}),
+    )
+
+
+def write_collection(entries, collection_path, deck_name=DEFAULT_DECK_NAME):
+    """
+    Write formatted entries into a new Anki collection file in one transaction.
+
+    Entries for the same Pleco card as an earlier one are skipped.
+
+    Returns:
+        int: Number of notes written
+    """
+    now = int(time.time())
+    model_id = stable_id(f"model:{MODEL_NAME}")
+    deck_id = stable_id(f"deck:{deck_name}")
+    # note and card IDs only need to be unique; Anki matches notes on their GUID
+    first_id = now * 1000
+
+    note_rows = []
+    card_rows = []
+    guids = set()
+    for entry in entries:
+        guid = note_guid(entry)
+        if guid in guids:
+            continue
+        guids.add(guid)
+        position = len(note_rows)
+        fields = entry_fields(entry)
+        note_id = first_id + 2 * position
+        note_rows.append(
+            (
+                note_id,
+                guid,
+                model_id,
+                now,
+                -1,
+                "",
+                "\x1f".join(fields),
+                fields[0],
+                field_checksum(fields[0]),
+                0,
+                "",
+            )
+        )
+        card_rows.append(
+            (note_id + 1, note_id, deck_id, 0, now, -1, 0, 0, position + 1)
+            + (0, 0, 0, 0, 0, 0, 0, 0, "")
+        )
+
+    connection = sqlite3.connect(collection_path)
+    try:
+        with connection:
+            connection.executescript(COLLECTION_SCHEMA)
+            connection.execute(
+                "INSERT INTO col VALUES (1, ?, ?, ?, 11, 0, 0, 0, ?, ?, ?, ?, '{}')",
+                (now, now * 1000, now * 1000)
+                + _collection_metadata(deck_name, model_id, deck_id, now),
+            )
+            connection.executemany(
+                "INSERT INTO notes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", note_rows
+            )
+            connection.executemany(
+                "INSERT INTO cards VALUES "
+                "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                card_rows,
+            )
+    finally:
+        connection.close()
+    return len(note_rows)
+
+
+def export_apkg(entries, file_path, deck_name=DEFAULT_DECK_NAME):
+    """
+    Export formatted entries as an Anki package.
+
+    Args:
+        entries (iterable): Entries with "formatted_back" holding the rendered back
+        file_path (str): Path of the .apkg file to write
+        deck_name (str): Deck receiving the cards on import
+
+    Returns:
+        int: Number of notes exported
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        collection_path = os.path.join(tmp_dir, "collection.anki2")
+        count = write_collection(entries, collection_path, deck_name)
+        with zipfile.ZipFile(file_path, "w", zipfile.ZIP_DEFLATED) as package:
+            package.write(collection_path, "collection.anki2")
+            package.writestr("media", "{}")
+    return count
@@ -0,0 +1,162 @@
+"""Watch Google Drive for new flashcard exports through the Drive Changes API."""
+
+import json
+import os
+import time
+
+from src.constants import FLASHCARD_FILE_NAME
+from src.utils.metrics import DRIVE_REQUEST_SECONDS
+
+DRIVE_CHANGES_STATE_FILE = "drive_changes_state.json"
+CHANGE_FIELDS = (
+    "nextPageToken, newStartPageToken, changes(fileId, removed, "
+    "file(id, name, mimeType, modifiedTime, md5Checksum, parents, trashed))"
+)
+
+
+class DriveChangesWatcher:
+    """Poll the Drive changes feed, calling on_file for each new or updated export.
+
+    Only changes since the persisted page token are fetched, so an idle poll is
+    a single cheap request. The polling interval starts at min_interval, grows by
+    backoff after every idle poll up to max_interval, and drops back to
+    min_interval as soon as a change arrives. A failed poll (e.g. Drive
+    answering 429 or 5xx) is logged and counts as an idle one.
+
+    Files already handed to on_file are remembered with their checksum, and
+    changes that leave the content untouched (such as on_file moving the file
+    to an archive folder) are not reported again.
+
+    Args:
+        service: Drive v3 service (or a FakeDriveService)
+        on_file (callable): Called with the metadata of every matching file
+        file_name (str): Name of the files to watch for
+        state_file (str): Where the page token is kept between runs
+        min_interval (float): Seconds between polls while files are arriving
+        max_interval (float): Upper bound of the idle polling interval
+        backoff (float): Factor the interval grows by after an idle poll
+        sleep (callable): Function used to wait between polls
+    """
+
+    def __init__(
+        self,
+        service,
+        on_file,
+        file_name=FLASHCARD_FILE_NAME,
+        state_file=DRIVE_CHANGES_STATE_FILE,
+        min_interval=5.0,
+        max_interval=300.0,
+        backoff=2.0,
+        sleep=time.sleep,
+    ):
+        self.service = service
+        self.on_file = on_file
+        self.file_name = file_name
+        self.state_file = state_file
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.sleep = sleep
+        self.interval = min_interval
+        self.page_token = self._load_page_token()
+        self.seen = {}
+
+    def _load_page_token(self):
+        if self.state_file and os.path.exists(self.state_file):
+            with open(self.state_file, "r", encoding="utf-8") as file:
+                return json.load(file)["page_token"]
+        return None
+
+    def _save_page_token(self):
+        if not self.state_file:
+            return
+        tmp_path = self.state_file + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump({"page_token": self.page_token}, file)
+        os.replace(tmp_path, self.state_file)
+
+    def poll(self):
+        """
+        Fetch the changes since the last poll.
+
+        On the very first poll the watcher only records where the feed currently
+        ends, so exports that already existed are not reported.
+
+        Returns:
+            list: Metadata of the new or modified files named file_name
+        """
+        if self.page_token is None:
+            with DRIVE_REQUEST_SECONDS.time(method="changes.getStartPageToken"):
+                response = self.service.changes().getStartPageToken().execute()
+            self.page_token = response["startPageToken"]
+            self._save_page_token()
+            return []
+
+        files = {}
+        token = self.page_token
+        while token is not None:
+            with DRIVE_REQUEST_SECONDS.time(method="changes.list"):
+                response = (
+                    self.service.changes()
+                    .list(pageToken=token, spaces="drive", fields=CHANGE_FIELDS)
+                    .execute()
+                )
+            for change in response.get("changes", []):
+                file = change.get("file")
+                if (
+                    change.get("removed")
+                    or not file
+                    or file.get("trashed")
+                    or file.get("name") != self.file_name
+                    or self._already_seen(file)
+                ):
+                    continue
+                # a file changed several times in one batch is reported once
+                files[file["id"]] = file
+            token = response.get("nextPageToken")
+            if "newStartPageToken" in response:
+                self.page_token = response["newStartPageToken"]
+
+        self._save_page_token()
+        return sorted(files.values(), key=lambda f: f.get("modifiedTime", ""))
+
+    def _already_seen(self, file):
+        return file["id"] in self.seen and self.seen[file["id"]] == file.get(
+            "md5Checksum"
+        )
+
+    def dispatch(self, files):
+        """Hand files to on_file, remembering them so later moves are not reported."""
+        for file in files:
+            self.seen[file["id"]] = file.get("md5Checksum")
+            self.on_file(file)
+
+    def run(self, max_polls=None):
+        """
+        Poll forever (or max_polls times), handing matching files to on_file.
+
+        Returns:
+            int: Number of files handed to on_file
+        """
+        # pylint: disable-next=import-outside-toplevel
+        from googleapiclient.errors import HttpError
+        from httplib2 import HttpLib2Error  # pylint: disable=import-outside-toplevel
+
+        handled = 0
+        polls = 0
+        while max_polls is None or polls < max_polls:
+            try:
+                files = self.poll()
+            except (HttpError, HttpLib2Error, OSError) as error:
+                print(f"An error occurred while polling Drive changes: {error}")
+                files = []
+            polls += 1
+            self.dispatch(files)
+            handled += len(files)
+            if files:
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.max_interval, self.interval * self.backoff)
+            if max_polls is None or polls < max_polls:
+                self.sleep(self.interval)
+        return handled
@@ -0,0 +1,178 @@
+"""SQLite-backed store of flashcard entries, one row per Pleco card."""
+
+import hashlib
+import json
+import sqlite3
+
+from src.utils.file_utils import load_flashcard_entries, save_flashcard_entries
+from src.utils.ingest_state import card_key, legacy_card_key
+
+ENTRY_STORE_FILE = "flashcard_entries.sqlite3"
+
+RENDER_PENDING = "pending"
+RENDER_FORMATTED = "formatted"
+RENDER_ERROR = "error"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    traditional TEXT NOT NULL,
+    entryid TEXT,
+    definition_hash TEXT NOT NULL,
+    render_status TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_traditional ON entries (traditional);
+CREATE INDEX IF NOT EXISTS entries_definition_hash ON entries (definition_hash);
+CREATE INDEX IF NOT EXISTS entries_render_status ON entries (render_status);
+"""
+
+# Rows whose serialized entry and status are unchanged are left untouched, so
+# re-saving a mostly unchanged deck writes almost nothing.
+UPSERT = """
+INSERT INTO entries (key, traditional, entryid, definition_hash, render_status, data)
+VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET
+    traditional = excluded.traditional,
+    entryid = excluded.entryid,
+    definition_hash = excluded.definition_hash,
+    render_status = excluded.render_status,
+    data = excluded.data
+WHERE entries.data != excluded.data
+    OR entries.render_status != excluded.render_status
+"""
+
+# A row imported from flashcard_entries.json has no entry ID in its key; the
+# first export entry with the same headword and dictionary takes it over.
+ADOPT_LEGACY_ROW = """
+UPDATE entries SET key = ?
+WHERE key = ? AND NOT EXISTS (SELECT 1 FROM entries WHERE key = ?)
+"""
+
+
+def definition_hash(definition):
+    """Short content hash of a Pleco definition."""
+    return hashlib.sha1((definition or "").encode("utf-8")).hexdigest()
+
+
+class EntryStore:
+    """Flashcard entries keyed on headword and Pleco entry ID, stored in SQLite.
+
+    Entries keep the order in which they were first inserted, so exporting the
+    store reproduces the legacy flashcard_entries.json layout.
+    """
+
+    def __init__(self, file_path=ENTRY_STORE_FILE):
+        self.file_path = file_path
+        self.connection = sqlite3.connect(file_path)
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Close the database connection."""
+        self.connection.close()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def upsert(self, entries, render_status=RENDER_PENDING):
+        """
+        Insert new entries and update the ones that changed.
+
+        An entry with a Pleco entry ID replaces the row imported from the legacy
+        JSON file for the same headword and dictionary, keeping its position.
+
+        Args:
+            entries (iterable): Flashcard entry dicts
+            render_status (str): Status recorded for every entry
+
+        Returns:
+            int: Number of rows inserted or updated
+        """
+        entries = list(entries)
+        rows = (
+            (
+                card_key(entry),
+                entry["traditional"],
+                entry.get("entryid"),
+                definition_hash(entry.get("definition")),
+                render_status,
+                json.dumps(entry, ensure_ascii=False),
+            )
+            for entry in entries
+        )
+        adopted = (
+            (card_key(entry), legacy_card_key(entry), card_key(entry))
+            for entry in entries
+            if entry.get("entryid") is not None
+        )
+        with self.connection:
+            self.connection.executemany(ADOPT_LEGACY_ROW, adopted)
+            before = self.connection.total_changes
+            self.connection.executemany(UPSERT, rows)
+            return self.connection.total_changes - before
+
+    def delete(self, keys):
+        """Remove the entries with the given card keys."""
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM entries WHERE key = ?", ((key,) for key in keys)
+            )
+
+    def keys(self):
+        """Return the card keys of every stored entry, in insertion order."""
+        return [
+            key
+            for (key,) in self.connection.execute(
+                "SELECT key FROM entries ORDER BY rowid"
+            )
+        ]
+
+    def get(self, key):
+        """Return the entry stored under a card key, or None."""
+        row = self.connection.execute(
+            "SELECT data FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def find_by_traditional(self, traditional):
+        """Return every entry for a traditional headword."""
+        return self._select("WHERE traditional = ?", (traditional,))
+
+    def find_by_definition_hash(self, digest):
+        """Return every entry whose definition hashes to digest."""
+        return self._select("WHERE definition_hash = ?", (digest,))
+
+    def find_by_render_status(self, render_status):
+        """Return every entry with the given render status."""
+        return self._select("WHERE render_status = ?", (render_status,))
+
+    def entries(self, include_errors=True):
+        """Return every entry in insertion order."""
+        if include_errors:
+            return self._select()
+        return self._select("WHERE render_status != ?", (RENDER_ERROR,))
+
+    def _select(self, where="", params=()):
+        cursor = self.connection.execute(
+            f"SELECT data FROM entries {where} ORDER BY rowid", params
+        )
+        return [json.loads(data) for (data,) in cursor]
+
+    def import_json(self, file_path="flashcard_entries.json"):
+        """Load a legacy flashcard_entries.json file into the store."""
+        return self.upsert(load_flashcard_entries(file_path))
+
+    def export_json(self, file_path="flashcard_entries.json"):
+        """
+        Write the store out in the legacy flashcard_entries.json format.
+
+        Entries that failed to render are included with the back they had
+        before, marked by the error message in "render_error".
+        """
+        save_flashcard_entries(self.entries(), file_path)
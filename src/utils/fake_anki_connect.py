@@ -0,0 +1,247 @@
+"""In-process stand-in for AnkiConnect, serving an in-memory deck over HTTP.
+
+Lets the AnkiConnect clients be exercised and benchmarked without Anki:
+
+    async with FakeAnkiConnect(latency=0.01) as server:
+        server.add_note("遊戲", "<div>game</div>", "yóuxì")
+        async with AsyncAnkiConnectClient(server.url) as client:
+            cards = await get_anki_deck_cards_async("Pleco Import", client)
+
+For the blocking client, run it on a background thread with start_in_thread().
+"""
+
+import asyncio
+import itertools
+import json
+import re
+import threading
+import time
+
+from src.utils.anki_connect import ANKI_CONNECT_VERSION
+
+DECK_QUERY_PATTERN = re.compile(r'^deck:"?([^"]*)"?$')
+
+
+class FakeAnkiConnect:
+    """AnkiConnect-compatible HTTP server backed by an in-memory collection.
+
+    Supports the actions the pipeline uses: version, sync, findCards, findNotes,
+    cardsInfo, notesInfo, cardsModTime, notesModTime, updateNoteFields and
+    multi. Searches only understand deck:"name" and the empty query.
+
+    Args:
+        latency (float): Seconds every request waits before being answered,
+            to mimic Anki handling actions on its UI thread
+        max_concurrency (int): Requests handled at once; Anki itself handles
+            one at a time
+        keep_alive (bool): Keep connections open between requests; if False,
+            every connection is closed after its response without a
+            Connection: close header, as AnkiConnect does
+        chunked (bool): Send responses with Transfer-Encoding: chunked
+    """
+
+    def __init__(self, latency=0.0, max_concurrency=1, keep_alive=True, chunked=False):
+        self.latency = latency
+        self.keep_alive = keep_alive
+        self.chunked = chunked
+        self.notes = {}
+        self.cards = {}
+        self.requests = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._max_concurrency = max_concurrency
+        self._ids = itertools.count(int(time.time() * 1000))
+        self._server = None
+        self._writers = set()
+        self._limit = None
+        self._loop = None
+        self._thread = None
+        self.url = None
+
+    # collection
+
+    def add_note(self, front, back, pinyin="", deck_name="Pleco Import"):
+        """Add a note with a single card, returning the note ID."""
+        note_id, card_id = next(self._ids), next(self._ids)
+        mod = int(time.time())
+        self.notes[note_id] = {
+            "noteId": note_id,
+            "modelName": "Pleco Import",
+            "tags": [],
+            "fields": {
+                name: {"value": value, "order": order}
+                for order, (name, value) in enumerate(
+                    [("Front", front), ("Back", back), ("pinyin", pinyin)]
+                )
+            },
+            "mod": mod,
+            "cards": [card_id],
+        }
+        self.cards[card_id] = {
+            "cardId": card_id,
+            "note": note_id,
+            "deckName": deck_name,
+            "modelName": "Pleco Import",
+            "mod": mod,
+        }
+        return note_id
+
+    def _card_info(self, card_id):
+        card = dict(self.cards[card_id])
+        card["fields"] = self.notes[card["note"]]["fields"]
+        card["question"] = card["fields"]["Front"]["value"]
+        card["answer"] = card["fields"]["Back"]["value"]
+        return card
+
+    def _find_cards(self, query):
+        if not query.strip():
+            return list(self.cards)
+        match = DECK_QUERY_PATTERN.match(query.strip())
+        if not match:
+            raise ValueError(f"unsupported query: {query}")
+        return [
+            card_id
+            for card_id, card in self.cards.items()
+            if card["deckName"] == match.group(1)
+        ]
+
+    def _update_note_fields(self, note):
+        stored = self.notes[note["id"]]
+        for name, value in note["fields"].items():
+            stored["fields"][name]["value"] = value
+        stored["mod"] = int(time.time())
+
+    def handle(self, action, params):
+        """Run one AnkiConnect action against the in-memory collection."""
+        handlers = {
+            "version": lambda: ANKI_CONNECT_VERSION,
+            "sync": lambda: None,
+            "findCards": lambda: self._find_cards(params["query"]),
+            "findNotes": lambda: sorted(
+                {self.cards[c]["note"] for c in self._find_cards(params["query"])}
+            ),
+            "cardsInfo": lambda: [self._card_info(c) for c in params["cards"]],
+            "notesInfo": lambda: [self.notes[n] for n in params["notes"]],
+            "cardsModTime": lambda: [
+                {"cardId": c, "mod": self.cards[c]["mod"]} for c in params["cards"]
+            ],
+            "notesModTime": lambda: [
+                {"noteId": n, "mod": self.notes[n]["mod"]} for n in params["notes"]
+            ],
+            "updateNoteFields": lambda: self._update_note_fields(params["note"]),
+            "multi": lambda: [
+                self._respond(sub.get("action"), sub.get("params", {}))
+                for sub in params["actions"]
+            ],
+        }
+        if action not in handlers:
+            raise ValueError("unsupported action")
+        return handlers[action]()
+
+    def _respond(self, action, params):
+        try:
+            return {"result": self.handle(action, params), "error": None}
+        except (KeyError, ValueError) as e:
+            return {"result": None, "error": str(e)}
+
+    # HTTP
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Start listening; the server's address is then available as self.url."""
+        self._limit = asyncio.Semaphore(self._max_concurrency)
+        self._server = await asyncio.start_server(self._serve_connection, host, port)
+        bound_host, bound_port = self._server.sockets[0].getsockname()[:2]
+        self.url = f"http://{bound_host}:{bound_port}"
+        return self
+
+    async def close(self):
+        """Stop the server, dropping any keep-alive connections clients left open."""
+        self._server.close()
+        for writer in list(self._writers):
+            writer.close()
+        await self._server.wait_closed()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _serve_connection(self, reader, writer):
+        self._writers.add(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                response = json.dumps(await self._dispatch(body)).encode("utf-8")
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + self._frame(response)
+                )
+                await writer.drain()
+                if not self.keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    def _frame(self, response):
+        if not self.chunked:
+            return f"Content-Length: {len(response)}\r\n\r\n".encode("ascii") + response
+        # split in two chunks, so clients have to reassemble the body
+        half = len(response) // 2
+        chunks = b"".join(
+            f"{len(chunk):x}\r\n".encode("ascii") + chunk + b"\r\n"
+            for chunk in (response[:half], response[half:])
+            if chunk
+        )
+        return b"Transfer-Encoding: chunked\r\n\r\n" + chunks + b"0\r\n\r\n"
+
+    async def _dispatch(self, body):
+        async with self._limit:
+            self.requests += 1
+            self._in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self._in_flight)
+            try:
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                try:
+                    payload = json.loads(body)
+                except ValueError as e:
+                    return {"result": None, "error": str(e)}
+                return self._respond(payload.get("action"), payload.get("params", {}))
+            finally:
+                self._in_flight -= 1
+
+    # background thread, for blocking clients
+
+    def start_in_thread(self, host="127.0.0.1", port=0):
+        """Run the server on its own event loop in a daemon thread."""
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.start(host, port))
+            started.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        started.wait()
+        return self
+
+    def stop_thread(self):
+        """Stop a server started with start_in_thread."""
+        asyncio.run_coroutine_threadsafe(self.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
@@ -0,0 +1,278 @@
+"""In-memory stand-in for the parts of the Google Drive v3 service the pipeline uses.
+
+Mirrors the googleapiclient call style (service.files().list(...).execute()),
+so Drive code can be exercised without credentials or network access:
+
+    service = FakeDriveService()
+    archive = service.create_folder("_Pleco")
+    service.create_file("pleco_flashcards.xml", b"<plecoflash>...</plecoflash>")
+    watcher = DriveChangesWatcher(service, on_file=print)
+"""
+
+import datetime
+import hashlib
+import itertools
+import re
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+NAME_CLAUSE_PATTERN = re.compile(r"name\s*=\s*'((?:[^'\\]|\\.)*)'")
+PARENT_CLAUSE_PATTERN = re.compile(r"'([^']*)' in parents")
+
+
+class FakeRequest:
+    """Deferred call, executed like a googleapiclient HttpRequest."""
+
+    def __init__(self, func, *args, **kwargs):
+        self._call = lambda: func(*args, **kwargs)
+
+    def execute(self, num_retries=0):  # pylint: disable=unused-argument
+        """Run the call."""
+        return self._call()
+
+
+class FakeBatchRequest:
+    """Batch of requests executed in one go, like a googleapiclient BatchHttpRequest."""
+
+    def __init__(self, service, callback=None):
+        self.service = service
+        self.callback = callback
+        self._requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        """Queue a request; its callback gets (request_id, response, exception)."""
+        if request_id is None:
+            request_id = str(len(self._requests) + 1)
+        self._requests.append((request_id, request, callback or self.callback))
+
+    def execute(self):
+        """Run every queued request, reporting each result to its callback."""
+        self.service.calls.append("batch")
+        for request_id, request, callback in self._requests:
+            response, exception = None, None
+            try:
+                response = request.execute()
+            except KeyError as e:
+                exception = e
+            if callback is not None:
+                callback(request_id, response, exception)
+
+
+class _FakeResponse(dict):
+    """httplib2-style response: a header dict with a status attribute."""
+
+    def __init__(self, status, headers):
+        super().__init__(headers)
+        self.status = status
+
+
+class _FakeMediaHttp:
+    """Serves byte ranges of one file, as Drive does for alt=media downloads."""
+
+    def __init__(self, service, file_id):
+        self.service = service
+        self.file_id = file_id
+
+    # pylint: disable-next=unused-argument
+    def request(self, uri, method="GET", headers=None, **_):
+        """Answer a (possibly ranged) GET of the file's content."""
+        self.service.calls.append("files.get_media")
+        content = self.service.contents[self.file_id]
+        range_header = (headers or {}).get("range")
+        if not range_header:
+            return _FakeResponse(200, {"content-length": str(len(content))}), content
+        start, end = (int(x) for x in range_header.split("=")[1].split("-"))
+        chunk = content[start : end + 1]
+        content_range = f"bytes {start}-{start + len(chunk) - 1}/{len(content)}"
+        return _FakeResponse(206, {"content-range": content_range}), chunk
+
+
+class FakeMediaRequest(FakeRequest):
+    """Media download request, also usable with googleapiclient's MediaIoBaseDownload."""
+
+    def __init__(self, service, file_id):
+        super().__init__(lambda: self.http.request(self.uri)[1])
+        self.uri = f"fake://drive/files/{file_id}?alt=media"
+        self.headers = {}
+        self.http = _FakeMediaHttp(service, file_id)
+
+
+class FakeDriveService:
+    """Drive service backed by an in-memory file tree and change log.
+
+    Supports files().list/get/get_media/update, changes().getStartPageToken/list
+    and new_batch_http_request. Searches understand the name,
+    mimeType, 'root' in parents and trashed clauses this project builds.
+
+    Attributes:
+        calls (list): Name of every API method executed, for quota accounting
+    """
+
+    def __init__(self):
+        self.files_by_id = {}
+        self.contents = {}
+        self.change_log = []
+        self.calls = []
+        self._ids = itertools.count(1)
+        self._clock = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+
+    # test fixtures
+
+    def _now(self):
+        self._clock += datetime.timedelta(seconds=1)
+        return self._clock.isoformat().replace("+00:00", "Z")
+
+    def _record_change(self, file_id, removed=False):
+        self.change_log.append((file_id, removed))
+
+    def create_folder(self, name, parent="root"):
+        """Add a folder, returning its ID."""
+        return self._add(name, FOLDER_MIME_TYPE, parent, None)
+
+    def create_file(self, name, content, parent="root", mime_type="text/xml"):
+        """Add a file with the given bytes content, returning its ID."""
+        return self._add(name, mime_type, parent, content)
+
+    def _add(self, name, mime_type, parent, content):
+        file_id = f"file{next(self._ids)}"
+        self.files_by_id[file_id] = {
+            "id": file_id,
+            "name": name,
+            "mimeType": mime_type,
+            "parents": [parent],
+            "trashed": False,
+        }
+        self.set_content(file_id, content)
+        return file_id
+
+    def set_content(self, file_id, content):
+        """Replace a file's content, updating its checksum and modified time."""
+        metadata = self.files_by_id[file_id]
+        metadata["modifiedTime"] = self._now()
+        if content is not None:
+            self.contents[file_id] = content
+            metadata["md5Checksum"] = hashlib.md5(content).hexdigest()
+            metadata["size"] = str(len(content))
+        self._record_change(file_id)
+
+    def delete_file(self, file_id):
+        """Remove a file."""
+        del self.files_by_id[file_id]
+        self.contents.pop(file_id, None)
+        self._record_change(file_id, removed=True)
+
+    # googleapiclient-style resources
+
+    def files(self):
+        """The files resource."""
+        return _FilesResource(self)
+
+    def changes(self):
+        """The changes resource."""
+        return _ChangesResource(self)
+
+    def new_batch_http_request(self, callback=None):
+        """A batch request; calls added to it run when it is executed."""
+        return FakeBatchRequest(self, callback)
+
+    def _matches(self, metadata, q):
+        if not q:
+            return True
+        name = NAME_CLAUSE_PATTERN.search(q)
+        if name and metadata["name"] != name.group(1).replace("\\'", "'"):
+            return False
+        is_folder = metadata["mimeType"] == FOLDER_MIME_TYPE
+        if f"mimeType = '{FOLDER_MIME_TYPE}'" in q and not is_folder:
+            return False
+        if f"mimeType != '{FOLDER_MIME_TYPE}'" in q and is_folder:
+            return False
+        parent = PARENT_CLAUSE_PATTERN.search(q)
+        if parent and parent.group(1) not in metadata["parents"]:
+            return False
+        if "trashed = false" in q and metadata["trashed"]:
+            return False
+        return True
+
+
+class _FilesResource:
+    def __init__(self, service):
+        self.service = service
+
+    def list(self, q=None, orderBy=None, pageToken=None, pageSize=100, **_):
+        def run():
+            self.service.calls.append("files.list")
+            found = [
+                dict(metadata)
+                for metadata in self.service.files_by_id.values()
+                if self.service._matches(metadata, q)
+            ]
+            if orderBy and orderBy.startswith("modifiedTime"):
+                found.sort(
+                    key=lambda f: f["modifiedTime"], reverse=orderBy.endswith("desc")
+                )
+            start = int(pageToken or 0)
+            result = {"files": found[start : start + pageSize]}
+            if start + pageSize < len(found):
+                result["nextPageToken"] = str(start + pageSize)
+            return result
+
+        return FakeRequest(run)
+
+    def get(self, fileId, **_):
+        def run():
+            self.service.calls.append("files.get")
+            return dict(self.service.files_by_id[fileId])
+
+        return FakeRequest(run)
+
+    def get_media(self, fileId, **_):
+        return FakeMediaRequest(self.service, fileId)
+
+    def update(self, fileId, addParents=None, removeParents=None, **_):
+        def run():
+            self.service.calls.append("files.update")
+            metadata = self.service.files_by_id[fileId]
+            parents = [
+                parent
+                for parent in metadata["parents"]
+                if parent not in (removeParents or "").split(",")
+            ]
+            if addParents:
+                parents += addParents.split(",")
+            metadata["parents"] = parents
+            metadata["modifiedTime"] = self.service._now()
+            self.service._record_change(fileId)
+            return {"id": fileId, "parents": parents}
+
+        return FakeRequest(run)
+
+
+class _ChangesResource:
+    def __init__(self, service):
+        self.service = service
+
+    def getStartPageToken(self, **_):
+        def run():
+            self.service.calls.append("changes.getStartPageToken")
+            return {"startPageToken": str(len(self.service.change_log))}
+
+        return FakeRequest(run)
+
+    def list(self, pageToken, pageSize=100, **_):
+        def run():
+            self.service.calls.append("changes.list")
+            start = int(pageToken)
+            end = min(start + pageSize, len(self.service.change_log))
+            changes = []
+            for file_id, removed in self.service.change_log[start:end]:
+                change = {"fileId": file_id, "removed": removed}
+                if not removed and file_id in self.service.files_by_id:
+                    change["file"] = dict(self.service.files_by_id[file_id])
+                changes.append(change)
+            result = {"changes": changes}
+            if end < len(self.service.change_log):
+                result["nextPageToken"] = str(end)
+            else:
+                result["newStartPageToken"] = str(end)
+            return result
+
+        return FakeRequest(run)
@@ -15,6 +15,33 @@ def load_flashcard_entries(file_path="flashcard_entries.json"):
         return json.load(file)
 
 
+def iter_flashcard_entries_ndjson(file_path="flashcard_entries.ndjson"):
+    """Lazily load flashcard entries from a line-delimited JSON file."""
+    with open(file_path, "r", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def write_flashcard_entries_ndjson(entries, file_path="flashcard_entries.ndjson"):
+    """
+    Write flashcard entries to a line-delimited JSON file as they are produced.
+
+    Each line is flushed as soon as it is written so partial results can be read
+    while the run is still going.
+
+    Returns:
+        int: Number of entries written
+    """
+    count = 0
+    with open(file_path, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            count += 1
+    return count
+
+
 def save_flashcard_entries(entries, file_path="flashcard_entries.json"):
     """Save flashcard entries to a JSON file."""
     with open(file_path, "w", encoding="utf-8") as f:
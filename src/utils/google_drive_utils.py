@@ -1,27 +1,47 @@
 """Google Drive integration utilities for file synchronization and authentication."""
 
+# The Google client libraries are slow to import and only needed once Drive is
+# actually used, so they are imported inside the functions that call them.
+# pylint: disable=import-outside-toplevel
+
 import datetime
+import functools
+import io
 import json
 import os
-import time
-
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
 
 from src.constants import (
-    CREDENTIALS_FILE,
+    CREDENTIALS_FILE_WILDCARDED,
     FLASHCARD_FILE_NAME,
-    MEMORY_FILE,
     SCOPES,
     TOKEN_FILE,
 )
+from src.utils.drive_watcher import DriveChangesWatcher
+from src.utils.metrics import DRIVE_REQUEST_SECONDS
+from src.utils.processed_journal import ProcessedFileJournal
+from src.utils.utils import find_file_with_wildcard
+
+FLASCHARD_FILE_ARCHIVE_FOLDER = "_Pleco"
+DRIVE_FOLDER_CACHE_FILE = "drive_folders.json"
+DRIVE_DOWNLOAD_CACHE_FILE = "drive_download_cache.json"
+LOCAL_FLASHCARD_FILE = "pleco_flashcards.xml"
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+LIST_PAGE_SIZE = 1000
+# Drive accepts at most 100 calls in one batch request
+BATCH_SIZE = 100
+FILE_LIST_FIELDS = (
+    "nextPageToken, "
+    "files(id, name, mimeType, modifiedTime, md5Checksum, size, parents)"
+)
 
 
 def authenticate_google_drive():
     """Authenticate with Google Drive and return the service object."""
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from googleapiclient.discovery import build
+
     creds = None
     # Check if token.json exists (token storage for authenticated user)
     if os.path.exists(TOKEN_FILE):
@@ -39,7 +59,9 @@ def authenticate_google_drive():
                 creds = None
         if not creds or not creds.valid:
             print("Authenticating with Google Drive")
-            flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_FILE, SCOPES)
+            flow = InstalledAppFlow.from_client_secrets_file(
+                find_file_with_wildcard(CREDENTIALS_FILE_WILDCARDED), SCOPES
+            )
             creds = flow.run_local_server(port=0)
         # Save credentials for the next run
         with open(TOKEN_FILE, "w", encoding="utf-8") as token:
@@ -49,8 +71,83 @@ def authenticate_google_drive():
     return build("drive", "v3", credentials=creds)
 
 
+class DriveClient:
+    """Google Drive service and folder IDs, resolved on first use.
+
+    Nothing is authenticated or looked up until a Drive call needs it, and
+    folder IDs are remembered in a local cache file so later runs skip the
+    lookup entirely.
+    """
+
+    def __init__(self, folder_cache_file=DRIVE_FOLDER_CACHE_FILE):
+        self.folder_cache_file = folder_cache_file
+        self._service = None
+        self._folder_ids = None
+
+    @property
+    def service(self):
+        """The authenticated Drive v3 service."""
+        if self._service is None:
+            self._service = authenticate_google_drive()
+        return self._service
+
+    def folder_id(self, name):
+        """ID of a folder in the Drive root, from the cache file if known."""
+        if self._folder_ids is None:
+            self._folder_ids = {}
+            if os.path.exists(self.folder_cache_file):
+                with open(self.folder_cache_file, "r", encoding="utf-8") as file:
+                    self._folder_ids = json.load(file)
+        if name not in self._folder_ids:
+            folders = get_items_by_name(
+                self.service, name, is_folder=True, is_root=True
+            )
+            if not folders:
+                raise FileNotFoundError(f"No Drive folder named {name}")
+            self._folder_ids[name] = folders[0]["id"]
+            with open(self.folder_cache_file, "w", encoding="utf-8") as file:
+                json.dump(self._folder_ids, file)
+        return self._folder_ids[name]
+
+    @property
+    def archive_folder_id(self):
+        """ID of the folder old flashcard exports are archived to."""
+        return self.folder_id(FLASCHARD_FILE_ARCHIVE_FOLDER)
+
+
+@functools.lru_cache(maxsize=None)
+def get_drive_client():
+    """Shared Drive client, created on first use."""
+    return DriveClient()
+
+
+def list_all_files(service, q, order_by="modifiedTime desc"):
+    """List every file matching a Drive search, following nextPageToken."""
+    files = []
+    page_token = None
+    while True:
+        with DRIVE_REQUEST_SECONDS.time(method="files.list"):
+            results = (
+                service.files()
+                .list(
+                    q=q,
+                    fields=FILE_LIST_FIELDS,
+                    orderBy=order_by,
+                    pageSize=LIST_PAGE_SIZE,
+                    pageToken=page_token,
+                )
+                .execute()
+            )
+        files.extend(results.get("files", []))
+        page_token = results.get("nextPageToken")
+        if not page_token:
+            return files
+
+
 def get_items_by_name(service, name, is_folder=False, is_root=False):
     """Get a list of items by name, including their modified time, sorted by modified time."""
+    from googleapiclient.errors import HttpError
+
     try:
         q = f"name = '{name}'"
         if is_folder:
@@ -60,145 +157,338 @@ def get_items_by_name(service, name, is_folder=False, is_root=False):
         if is_root:
             q += " and 'root' in parents"
 
-        results = (
-            service.files()
-            .list(
-                q=q,
-                fields="nextPageToken, files(id, name, mimeType, modifiedTime, parents)",
-                orderBy="modifiedTime desc",
-            )
-            .execute()
-        )
-        return results.get("files", [])
+        return list_all_files(service, q)
     except HttpError as error:
         print(f"An error occurred: {error}")
         return []
 
 
-def move_file_to_folder(service, file_id, folder_id):
-    """Move a file to a specific folder in Google Drive."""
+def move_file_to_folder(service, file_id, folder_id, parents=None):
+    """Move a file to a specific folder in Google Drive.
+
+    Args:
+        parents (list): The file's current parents, if already known from a
+            listing; otherwise they are fetched first
+    """
+    from googleapiclient.errors import HttpError
+
     try:
         # Retrieve the current parents
-        file = service.files().get(fileId=file_id, fields="parents").execute()
-        previous_parents = ",".join(file.get("parents", []))
+        if parents is None:
+            with DRIVE_REQUEST_SECONDS.time(method="files.get"):
+                file = service.files().get(fileId=file_id, fields="parents").execute()
+            parents = file.get("parents", [])
 
         # Move the file to the new folder
-        service.files().update(
-            fileId=file_id,
-            addParents=folder_id,
-            removeParents=previous_parents,
-            fields="id, parents",
-        ).execute()
+        with DRIVE_REQUEST_SECONDS.time(method="files.update"):
+            service.files().update(
+                fileId=file_id,
+                addParents=folder_id,
+                removeParents=",".join(parents),
+                fields="id, parents",
+            ).execute()
         print(f"File {file_id} has been moved to folder {folder_id}.")
     except HttpError as error:
         print(f"An error occurred while moving the file: {error}")
 
 
-SERVICE = authenticate_google_drive()
-FLASCHARD_FILE_ARCHIVE_FOLDER = "_Pleco"
-FLASCHARD_FILE_ARCHIVE_FOLDER_ID = get_items_by_name(
-    SERVICE, FLASCHARD_FILE_ARCHIVE_FOLDER, is_folder=True, is_root=True
-)[0]["id"]
+def move_files_to_folder(service, files, folder_id, batch_size=BATCH_SIZE):
+    """
+    Move many files to a folder using Drive batch requests.
 
+    The files' current parents are taken from their listing metadata, so each
+    move is a single files.update call, and up to batch_size of those share one
+    HTTP round trip.
 
-# main google drive functions
-def get_latest_flashcard_xml():
-    files = get_items_by_name(
-        SERVICE, FLASHCARD_FILE_NAME, is_folder=False, is_root=True
+    Args:
+        service: Drive v3 service
+        files (list): File metadata with "id" and "parents", e.g. from get_items_by_name
+        folder_id (str): ID of the destination folder
+        batch_size (int): Number of moves sent per batch request
+
+    Returns:
+        int: Number of files moved
+    """
+    moved = []
+
+    def on_response(request_id, _, exception):
+        if exception is not None:
+            print(f"An error occurred while moving file {request_id}: {exception}")
+        else:
+            moved.append(request_id)
+
+    for start in range(0, len(files), batch_size):
+        batch = service.new_batch_http_request(callback=on_response)
+        for file in files[start : start + batch_size]:
+            batch.add(
+                service.files().update(
+                    fileId=file["id"],
+                    addParents=folder_id,
+                    removeParents=",".join(file.get("parents", [])),
+                    fields="id, parents",
+                ),
+                request_id=file["id"],
+            )
+        with DRIVE_REQUEST_SECONDS.time(method="batch"):
+            batch.execute()
+    print(f"{len(moved)} of {len(files)} files moved to folder {folder_id}.")
+    return len(moved)
+
+
+def iter_drive_file(service, file_id, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """
+    Download a file's content in chunks, without holding all of it in memory.
+
+    Yields:
+        bytes: Consecutive pieces of the file, each at most chunk_size long
+    """
+    from googleapiclient.http import MediaIoBaseDownload
+
+    request = service.files().get_media(fileId=file_id)  # pylint: disable=E1101
+    buffer = io.BytesIO()
+    downloader = MediaIoBaseDownload(buffer, request, chunksize=chunk_size)
+    done = False
+    while not done:
+        with DRIVE_REQUEST_SECONDS.time(method="files.get_media"):
+            _, done = downloader.next_chunk(num_retries=3)
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        if chunk:
+            yield chunk
+
+
+def load_download_cache(cache_file=DRIVE_DOWNLOAD_CACHE_FILE):
+    """Metadata of the Drive file the local copy was downloaded from, if any."""
+    if os.path.exists(cache_file):
+        with open(cache_file, "r", encoding="utf-8") as file:
+            return json.load(file)
+    return {}
+
+
+def save_download_cache(metadata, cache_file=DRIVE_DOWNLOAD_CACHE_FILE):
+    """Atomically record the Drive file the local copy was downloaded from."""
+    tmp_path = cache_file + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(metadata, file)
+    os.replace(tmp_path, cache_file)
+
+
+def is_download_cached(
+    drive_file, local_path=LOCAL_FLASHCARD_FILE, cache_file=DRIVE_DOWNLOAD_CACHE_FILE
+):
+    """Whether local_path already holds this exact revision of the Drive file."""
+    cached = load_download_cache(cache_file)
+    return (
+        os.path.exists(local_path)
+        and cached.get("id") == drive_file["id"]
+        and cached.get("md5Checksum") == drive_file.get("md5Checksum")
+        and cached.get("modifiedTime") == drive_file.get("modifiedTime")
     )
-    if len(files) == 0:
-        print("No files found.")
-        return None
 
-    # Download the content of the target file
-    target_file = files[0]
-    request = SERVICE.files().get_media(  # pylint: disable=E1101
-        fileId=target_file["id"]
+
+def iter_local_file(local_path, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """Read a local file in chunks."""
+    with open(local_path, "rb") as file:
+        while chunk := file.read(chunk_size):
+            yield chunk
+
+
+def _download_to_cache(
+    service, drive_file, local_path, cache_file, chunk_size=DOWNLOAD_CHUNK_SIZE
+):
+    """Stream a Drive file to local_path, yielding each chunk as it arrives.
+
+    The local copy only replaces the previous one, and the cache is only
+    updated, once the whole file has been written.
+    """
+    tmp_path = local_path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as file:
+            for chunk in iter_drive_file(service, drive_file["id"], chunk_size):
+                file.write(chunk)
+                yield chunk
+    except BaseException:
+        # an interrupted or abandoned download must not pass for a complete one
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, local_path)
+    save_download_cache(
+        {
+            key: drive_file.get(key)
+            for key in ("id", "name", "md5Checksum", "modifiedTime", "size")
+        },
+        cache_file,
     )
-    file_content = request.execute()
-    file_text = file_content.decode("utf-8")
+
+
+def _print_modified_time(drive_file):
     modified_time = datetime.datetime.fromisoformat(
-        target_file["modifiedTime"].replace("Z", "+00:00")
+        drive_file["modifiedTime"].replace("Z", "+00:00")
     )
     local_time = modified_time.astimezone()
     print(
         "Latest flashcard xml last modified time:",
         local_time.strftime("%Y-%m-%d %H:%M:%S %Z%z"),
     )
-    return file_text
 
 
-def archive_flashcard_xmls(archive_latest=False):
-    """Archive all flashcard XML files except the latest one."""
+# main google drive functions
+def get_latest_flashcard_chunks(
+    service=None,
+    local_path=LOCAL_FLASHCARD_FILE,
+    cache_file=DRIVE_DOWNLOAD_CACHE_FILE,
+    chunk_size=DOWNLOAD_CHUNK_SIZE,
+):
+    """
+    Get the latest flashcard export as an iterator of byte chunks.
+
+    The export is only downloaded when its md5Checksum or modifiedTime differ
+    from those of the local copy, so a repeat run costs a single metadata
+    request. A download is streamed to disk and handed out chunk by chunk at
+    the same time, so it can be fed straight into iter_flashcard_xml.
+
+    Returns:
+        iterator: Chunks of the export, or None if there is no export on Drive
+    """
+    service = service or get_drive_client().service
     files = get_items_by_name(
-        SERVICE, FLASHCARD_FILE_NAME, is_folder=False, is_root=True
+        service, FLASHCARD_FILE_NAME, is_folder=False, is_root=True
     )
     if len(files) == 0:
         print("No files found.")
-        return
+        return None
 
-    # move irrelevant files to archive folder
-    for f in files[0 if archive_latest else 1 :]:
-        move_file_to_folder(SERVICE, f["id"], FLASCHARD_FILE_ARCHIVE_FOLDER_ID)
+    target_file = files[0]
+    _print_modified_time(target_file)
+    return get_flashcard_chunks(
+        service, target_file, local_path, cache_file, chunk_size
+    )
 
 
-def monitor_google_drive(target_folder_id, interval=60):
-    """Periodically check for new files, process them, and move them."""
-    service = authenticate_google_drive()
-    processed_files = load_processed_files()
+def get_flashcard_chunks(
+    service,
+    drive_file,
+    local_path=LOCAL_FLASHCARD_FILE,
+    cache_file=DRIVE_DOWNLOAD_CACHE_FILE,
+    chunk_size=DOWNLOAD_CHUNK_SIZE,
+):
+    """
+    Chunks of a flashcard export on Drive, from the local copy if it is current.
+
+    Args:
+        service: Drive v3 service
+        drive_file (dict): The export's metadata, with id, md5Checksum and
+            modifiedTime
+
+    Returns:
+        iterator: Chunks of the export
+    """
+    if is_download_cached(drive_file, local_path, cache_file):
+        print("Flashcard xml unchanged since last download, using", local_path)
+        return iter_local_file(local_path, chunk_size)
+    return _download_to_cache(service, drive_file, local_path, cache_file, chunk_size)
+
+
+def get_latest_flashcard_xml(service=None):
+    """Get the text of the latest flashcard export, downloading it only if changed."""
+    chunks = get_latest_flashcard_chunks(service)
+    if chunks is None:
+        return None
+    return b"".join(chunks).decode("utf-8")
 
-    while True:
-        print("Checking for new files named 'pleco_flashcards.xml'...")
-        files = list_files_by_name(service, "pleco_flashcards.xml")
 
-        for file in files:
-            if file["id"] not in processed_files:
-                # Process the file
-                process_file(file)
+def archive_flashcard_xmls(archive_latest=False):
+    """Archive all flashcard XML files except the latest one."""
+    drive = get_drive_client()
+    files = get_items_by_name(
+        drive.service, FLASHCARD_FILE_NAME, is_folder=False, is_root=True
+    )
+    if len(files) == 0:
+        print("No files found.")
+        return
+
+    # move irrelevant files to archive folder
+    old_files = files[0 if archive_latest else 1 :]
+    if old_files:
+        move_files_to_folder(drive.service, old_files, drive.archive_folder_id)
+
+
+def monitor_google_drive(
+    target_folder_id, interval=60, service=None, max_polls=None, args=None
+):
+    """
+    Watch Drive for new flashcard exports, process them, and move them.
+
+    New exports are picked up from the Drive changes feed. The feed is polled
+    every few seconds while exports are arriving, backing off to once every
+    `interval` seconds while Drive is idle. An export whose processing fails is
+    left in place and not recorded as processed, so the next start retries it.
+
+    Args:
+        target_folder_id (str): Folder processed exports are moved to
+        args (argparse.Namespace): Formatting options, as returned by
+            flashcard_fmt.parse_args (default: its defaults)
+    """
+    service = service or get_drive_client().service
+    processed_files = ProcessedFileJournal()
+
+    def handle(file):
+        if file["id"] in processed_files:
+            return
+        # Process the file
+        try:
+            process_file(service, file, args)
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            print(f"Failed to process file {file['name']} (ID: {file['id']}): {e}")
+            return
+
+        # Move the file to the specified folder
+        move_file_to_folder(
+            service, file["id"], target_folder_id, parents=file.get("parents")
+        )
 
-                # Move the file to the specified folder
-                move_file_to_folder(service, file["id"], target_folder_id)
+        # Mark the file as processed (a single append to the journal)
+        processed_files.add(file["id"])
 
-                # Mark the file as processed and save to memory
-                processed_files.add(file["id"])
-                save_processed_files(processed_files)
+    watcher = DriveChangesWatcher(
+        service, handle, min_interval=min(5, interval), max_interval=interval
+    )
+    with processed_files:
+        if watcher.page_token is None:
+            # First run: start following the feed, then catch up on existing exports
+            watcher.poll()
+            watcher.dispatch(list_files_by_name(service, FLASHCARD_FILE_NAME))
 
-        # Wait for the specified interval before checking again
-        time.sleep(interval)
+        print(f"Watching Google Drive for new files named '{FLASHCARD_FILE_NAME}'...")
+        watcher.run(max_polls)
 
 
 def list_files_by_name(service, file_name):
     """List files with a specific name from Google Drive."""
+    from googleapiclient.errors import HttpError
+
     try:
-        results = (
-            service.files()
-            .list(
-                q=f"name = '{file_name}'",
-                fields="nextPageToken, files(id, name, mimeType, modifiedTime, parents)",
-                orderBy="modifiedTime desc",
-            )
-            .execute()
-        )
-        return results.get("files", [])
+        return list_all_files(service, f"name = '{file_name}'")
     except HttpError as error:
         print(f"An error occurred: {error}")
         return []
 
 
-def process_file(file):
-    """Placeholder function to process a file."""
-    print(f"Processing file: {file['name']} (ID: {file['id']})")
-
-
-def load_processed_files():
-    """Load the list of processed file IDs from a local memory file."""
-    if os.path.exists(MEMORY_FILE):
-        with open(MEMORY_FILE, "r", encoding="utf-8") as file:
-            return set(json.load(file))
-    return set()
+def process_file(service, file, args=None):
+    """
+    Run the formatting pipeline on a flashcard export found on Drive.
 
+    Args:
+        service: Drive v3 service
+        file (dict): The export's metadata, as reported by the changes feed
+        args (argparse.Namespace): Formatting options (default: flashcard_fmt's)
+    """
+    # flashcard_fmt imports this module
+    from src import flashcard_fmt
 
-def save_processed_files(processed_files):
-    """Save the list of processed file IDs to a local memory file."""
-    with open(MEMORY_FILE, "w", encoding="utf-8") as file:
-        json.dump(list(processed_files), file)
+    print(f"Processing file: {file['name']} (ID: {file['id']})")
+    flashcard_fmt.run(
+        args or flashcard_fmt.parse_args([]),
+        xml_chunks=get_flashcard_chunks(service, file),
+    )
@@ -1,34 +1,11 @@
 """Utilities for HTML manipulation and processing."""
 
-from bs4 import BeautifulSoup
+from src.utils.html_normalizer import normalize_html
 
 
 def reorder_nested_spans(html_text):
     """Reorder nested span elements to ensure correct styling application."""
-    # Parse the HTML text
-    soup = BeautifulSoup(f"<root>{html_text}</root>", "html.parser")
-
-    # Find all span elements
-    spans = soup.find_all("span")
-
-    for span in spans:
-        style = span.get("style", "")
-        if "font-weight" in style:
-            nested_span = span.find("span")
-            if nested_span is not None:
-                nested_style = nested_span.get("style", "")
-                if "color" in nested_style:
-                    # Swap the styles
-                    span["style"], nested_span["style"] = (
-                        nested_span["style"],
-                        span["style"],
-                    )
-
-        if ";" in spans[0].attrs:
-            del spans[0].attrs[";"]
-
-    # Convert the soup back to a string
-    return str(soup).replace("<root>", "").replace("</root>", "")
+    return normalize_html(html_text, reorder_spans=True)
 
 
 # # Example usage
@@ -0,0 +1,374 @@
+"""Streaming HTML normalizer for flashcard backs, built on the stdlib HTMLParser.
+
+The rewrites here used to be done on a full BeautifulSoup tree. This module
+tokenizes the HTML into a flat list of start/end/text events instead, applies
+the tag swaps on that list and serializes it back, following the same
+tree-building and output rules as BeautifulSoup's html.parser builder so the
+normalized HTML is identical.
+"""
+
+import re
+from html.entities import html5
+from html.parser import HTMLParser
+
+# Tags BeautifulSoup treats as void (serialized as <tag/> when they have no contents)
+VOID_TAGS = frozenset(
+    [
+        "area",
+        "base",
+        "br",
+        "col",
+        "embed",
+        "hr",
+        "img",
+        "input",
+        "keygen",
+        "link",
+        "menuitem",
+        "meta",
+        "param",
+        "source",
+        "track",
+        "wbr",
+        "basefont",
+        "bgsound",
+        "command",
+        "frame",
+        "image",
+        "isindex",
+        "nextid",
+        "spacer",
+    ]
+)
+PRESERVE_WHITESPACE_TAGS = frozenset(["pre", "textarea"])
+RAW_TEXT_TAGS = frozenset(["script", "style"])
+# Attributes holding whitespace separated lists, re-joined with single spaces
+LIST_ATTRIBUTES = {
+    "*": frozenset(["class", "accesskey", "dropzone"]),
+    "a": frozenset(["rel", "rev"]),
+    "link": frozenset(["rel", "rev"]),
+    "td": frozenset(["headers"]),
+    "th": frozenset(["headers"]),
+    "form": frozenset(["accept-charset"]),
+    "object": frozenset(["archive"]),
+    "area": frozenset(["rel"]),
+    "icon": frozenset(["sizes"]),
+    "iframe": frozenset(["sandbox"]),
+    "output": frozenset(["for"]),
+}
+# Elements whose contents HTMLParser does not tokenize as markup
+RAW_CONTENT_TAGS = frozenset(
+    ["script", "style", "textarea", "title", "xmp", "iframe", "noembed", "noframes"]
+    + ["noscript", "plaintext"]
+)
+ASCII_SPACES = "\x20\x0a\x09\x0c\x0d"
+BLUE_EXAMPLE_COLOR = "color:#0078C3"
+
+START, END, TEXT, RAW = "start", "end", "text", "raw"
+
+# Strict tokenizer for the markup Anki and fmt_entry actually produce: plain text
+# without entities, and tags whose attribute values are double quoted without
+# entities. Anything else falls back to HTMLParser.
+SIMPLE_TOKEN_PATTERN = re.compile(
+    r"([^<&]+)"
+    r"|<([a-zA-Z][a-zA-Z0-9]*)"
+    r'((?:(?:\s+|(?<="))[a-zA-Z;][-\w:.;]*(?:="[^"&<>]*")?)*)\s*(/?)>'
+    r"|</([a-zA-Z][a-zA-Z0-9]*)\s*>"
+)
+SIMPLE_ATTR_PATTERN = re.compile(r'([a-zA-Z;][-\w:.;]*)(?:="([^"]*)")?')
+
+
+def _escape(text):
+    """Escape the characters BeautifulSoup's minimal formatter escapes."""
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _quote_attribute(value):
+    """Quote an attribute value the way BeautifulSoup does."""
+    value = _escape(value)
+    if '"' not in value:
+        return f'"{value}"'
+    if "'" not in value:
+        return f"'{value}'"
+    return '"' + value.replace('"', "&quot;") + '"'
+
+
+class _EventBuilder(HTMLParser):
+    """
+    Turns HTML into a flat list of events with matched start/end tags.
+
+    Events are lists so later passes can mutate them in place:
+        [START, name, attrs, index of matching END]
+        [END, name]
+        [TEXT, escaped text]
+        [RAW, serialized comment/declaration]
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.events = []
+        self.stack = []  # indices of open START events
+        self.already_closed_void = []
+        self.pending_text = []
+
+    # tree building
+
+    def _flush_text(self):
+        if not self.pending_text:
+            return
+        text = "".join(self.pending_text)
+        self.pending_text = []
+        open_names = [self.events[i][1] for i in self.stack]
+        if not PRESERVE_WHITESPACE_TAGS.intersection(open_names) and not text.strip(
+            ASCII_SPACES
+        ):
+            text = "\n" if "\n" in text else " "
+        if not (open_names and open_names[-1] in RAW_TEXT_TAGS):
+            text = _escape(text)
+        self.events.append([TEXT, text])
+
+    def _push(self, name, attrs):
+        self._flush_text()
+        attr_dict = {}
+        tag_list_attrs = LIST_ATTRIBUTES.get(name, frozenset())
+        for key, value in attrs:
+            value = "" if value is None else value
+            if key in LIST_ATTRIBUTES["*"] or key in tag_list_attrs:
+                value = " ".join(value.split())
+            attr_dict[key] = value
+        self.stack.append(len(self.events))
+        self.events.append([START, name, attr_dict, None])
+
+    def _pop_to(self, name):
+        """Close every open tag up to and including the most recent `name`."""
+        self._flush_text()
+        if not any(self.events[i][1] == name for i in self.stack):
+            return
+        while self.stack:
+            start = self.stack.pop()
+            self.events[start][3] = len(self.events)
+            self.events.append([END, self.events[start][1]])
+            if self.events[start][1] == name:
+                break
+
+    def feed_simple(self, html_text):
+        """
+        Build events with the strict tokenizer.
+
+        Returns:
+            bool: False if the text needs the full HTMLParser tokenizer
+        """
+        pos, end = 0, len(html_text)
+        while pos < end:
+            match = SIMPLE_TOKEN_PATTERN.match(html_text, pos)
+            if match is None:
+                return False
+            text, start_name, attrs, self_closing, end_name = match.groups()
+            if text is not None:
+                self.pending_text.append(text)
+            elif start_name is not None:
+                start_name = start_name.lower()
+                if start_name in RAW_CONTENT_TAGS:
+                    return False
+                attrs = [
+                    (key.lower(), value)
+                    for key, value in SIMPLE_ATTR_PATTERN.findall(attrs)
+                ]
+                if self_closing:
+                    self.handle_startendtag(start_name, attrs)
+                else:
+                    self.handle_starttag(start_name, attrs)
+            else:
+                self.handle_endtag(end_name.lower())
+            pos = match.end()
+        return True
+
+    def close(self):
+        super().close()
+        self._flush_text()
+        while self.stack:
+            self._pop_to(self.events[self.stack[-1]][1])
+
+    # HTMLParser callbacks
+
+    def handle_starttag(self, tag, attrs):
+        self._push(tag, attrs)
+        if tag in VOID_TAGS:
+            self._pop_to(tag)
+            self.already_closed_void.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self._push(tag, attrs)
+        self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self.already_closed_void:
+            self.already_closed_void.remove(tag)
+        else:
+            self._pop_to(tag)
+
+    def handle_data(self, data):
+        self.pending_text.append(data)
+
+    def handle_charref(self, name):
+        if name[0] in "xX":
+            code = int(name.lstrip("xX"), 16)
+        else:
+            code = int(name)
+        data = None
+        if code < 256:
+            try:
+                data = bytes([code]).decode("windows-1252")
+            except UnicodeDecodeError:
+                pass
+        if not data:
+            try:
+                data = chr(code)
+            except (ValueError, OverflowError):
+                pass
+        self.pending_text.append(data or "\N{REPLACEMENT CHARACTER}")
+
+    def handle_entityref(self, name):
+        self.pending_text.append(html5.get(name + ";", "&" + name))
+
+    def _raw(self, text):
+        self._flush_text()
+        self.events.append([RAW, text])
+
+    def handle_comment(self, data):
+        self._raw(f"<!--{data}-->")
+
+    def handle_decl(self, decl):
+        self._raw(f"<!DOCTYPE {decl[len('DOCTYPE '):]}>\n")
+
+    def unknown_decl(self, data):
+        if data.upper().startswith("CDATA["):
+            self._raw(f"<![CDATA[{data[len('CDATA['):]}]]>")
+        else:
+            self._raw(f"<?{data}?>")
+
+    def handle_pi(self, data):
+        self._raw(f"<?{data}>")
+
+
+def tokenize(html_text):
+    """Parse HTML into the flat event list used by the rewrites."""
+    builder = _EventBuilder()
+    if not builder.feed_simple(html_text):
+        builder = _EventBuilder()
+        builder.feed(html_text)
+    builder.close()
+    return builder.events
+
+
+def _first_descendant_span(events, i):
+    """Index of the first span start event inside the element starting at i, or None."""
+    for j in range(i + 1, events[i][3]):
+        if events[j][0] == START and events[j][1] == "span":
+            return j
+    return None
+
+
+def _swap_nested_span_styles(events):
+    """Swap styles of font-weight spans with a coloured first descendant span."""
+    first_span = None
+    for i, event in enumerate(events):
+        if event[0] != START or event[1] != "span":
+            continue
+        if first_span is None:
+            first_span = event
+        if "font-weight" in event[2].get("style", ""):
+            j = _first_descendant_span(events, i)
+            if j is not None and "color" in events[j][2].get("style", ""):
+                nested_attrs = events[j][2]
+                event[2]["style"], nested_attrs["style"] = (
+                    nested_attrs["style"],
+                    event[2]["style"],
+                )
+    if first_span is not None:
+        first_span[2].pop(";", None)
+
+
+def _bold_inside_color(events, lo, hi):
+    """
+    Yield events in [lo, hi) with <b><span color>x</span></b> turned into
+    <span color><b>x</b></span>.
+
+    Anything else inside such a <b> is dropped, matching the tree rewrite.
+    """
+    i = lo
+    while i < hi:
+        event = events[i]
+        if event[0] == START and event[1] == "b":
+            color_span = None
+            for j in range(i + 1, event[3]):
+                if (
+                    events[j][0] == START
+                    and events[j][1] == "span"
+                    and BLUE_EXAMPLE_COLOR in events[j][2].get("style", "")
+                ):
+                    color_span = j
+                    break
+            if color_span is not None:
+                yield [START, "span", {"style": events[color_span][2]["style"]}, None]
+                yield [START, "b", {}, None]
+                yield from _bold_inside_color(
+                    events, color_span + 1, events[color_span][3]
+                )
+                yield [END, "b"]
+                yield [END, "span"]
+                i = event[3] + 1
+                continue
+        yield event
+        i += 1
+
+
+def serialize(events):
+    """Serialize an event list back into HTML."""
+    out = []
+    pending_void = None
+    for event in events:
+        kind = event[0]
+        if pending_void is not None:
+            # a void tag followed directly by its end tag has no contents
+            if kind == END:
+                out.append(pending_void + "/>")
+                pending_void = None
+                continue
+            out.append(pending_void + ">")
+            pending_void = None
+        if kind == START:
+            tag = "<" + event[1]
+            for key, value in sorted(event[2].items()):
+                tag += f" {key}={_quote_attribute(value)}"
+            if event[1] in VOID_TAGS:
+                pending_void = tag
+            else:
+                out.append(tag + ">")
+        elif kind == END:
+            out.append(f"</{event[1]}>")
+        else:
+            out.append(event[1])
+    if pending_void is not None:
+        out.append(pending_void + "/>")
+    return "".join(out)
+
+
+def normalize_html(html_text, reorder_bold=False, reorder_spans=False):
+    """
+    Normalize flashcard HTML in a single tokenize/rewrite/serialize pass.
+
+    Args:
+        html_text (str): The HTML text to process
+        reorder_bold (bool): Move <b> inside coloured example-sentence spans
+        reorder_spans (bool): Swap font-weight span styles with a nested colour span
+
+    Returns:
+        str: The normalized HTML text
+    """
+    events = tokenize(html_text)
+    if reorder_spans:
+        _swap_nested_span_styles(events)
+    if reorder_bold:
+        events = _bold_inside_color(events, 0, len(events))
+    return serialize(events)
@@ -0,0 +1,85 @@
+"""Persisted record of processed Pleco cards, used to only reprocess cards that changed."""
+
+import json
+import os
+
+INGEST_STATE_FILE = "ingest_state.json"
+
+
+def card_key(entry):
+    """Identify a Pleco card by its headword and dictionary entry ID."""
+    return f"{entry['traditional']}|{entry.get('dictid')}:{entry.get('entryid')}"
+
+
+def legacy_card_key(entry):
+    """
+    Key the same card had when imported from a legacy flashcard_entries.json.
+
+    Those rows carry no entry ID, so they can only be matched on headword and
+    dictionary.
+    """
+    return card_key({**entry, "entryid": None})
+
+
+def load_ingest_state(file_path=INGEST_STATE_FILE):
+    """Load the processed card state, mapping card keys to their Pleco timestamps."""
+    if os.path.exists(file_path):
+        with open(file_path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    return {}
+
+
+def save_ingest_state(state, file_path=INGEST_STATE_FILE):
+    """Save the processed card state, replacing the file atomically."""
+    tmp_path = file_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(state, file, ensure_ascii=False)
+    os.replace(tmp_path, file_path)
+
+
+def diff_ingest_state(entries, state):
+    """
+    Split freshly ingested entries into the ones that need processing.
+
+    A card needs processing if it has never been processed or its Pleco
+    modification time differs from the one recorded when it was. Cards recorded
+    before entry IDs were part of the key are matched on their legacy key.
+
+    Args:
+        entries (list): Entries from the latest Pleco export
+        state (dict): Processed card state from load_ingest_state
+
+    Returns:
+        tuple: (list of new or modified entries, number of unchanged entries,
+            list of keys of processed cards missing from the export)
+    """
+    changed = []
+    unchanged = 0
+    seen = set()
+    for entry in entries:
+        key = card_key(entry)
+        if key not in state and legacy_card_key(entry) in state:
+            key = legacy_card_key(entry)
+        seen.add(key)
+        previous = state.get(key)
+        if previous is None or previous["modified"] != entry.get("modified"):
+            changed.append(entry)
+        else:
+            unchanged += 1
+    deleted = [key for key in state if key not in seen]
+    return changed, unchanged, deleted
+
+
+def update_ingest_state(state, processed_entries, deleted_keys=()):
+    """Record processed entries and forget deleted cards, in place."""
+    for entry in processed_entries:
+        # the entry is now recorded under its full key
+        if entry.get("entryid") is not None:
+            state.pop(legacy_card_key(entry), None)
+        state[card_key(entry)] = {
+            "created": entry.get("created"),
+            "modified": entry.get("modified"),
+        }
+    for key in deleted_keys:
+        state.pop(key, None)
+    return state
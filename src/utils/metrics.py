@@ -0,0 +1,332 @@
+"""Counters and histograms for the formatting pipeline, in the Prometheus text format.
+
+Every stage reports into the process-wide REGISTRY through the metrics defined
+at the bottom of this module. The format server exposes it on GET /metrics, and
+batch runs can dump a snapshot with flashcard_fmt.py --metrics-file.
+
+Worker processes keep their own registry: drain() hands over what a worker
+recorded and merge() adds it to the parent's, so counts made in pools are not lost.
+A forked child starts with an empty REGISTRY and fresh locks, since a lock
+inherited from the parent may have been held by another thread at the fork.
+"""
+
+import bisect
+import contextlib
+import json
+import math
+import os
+import threading
+import time
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return (
+        "{"
+        + ",".join(f'{name}="{_escape(_format_value(v))}"' for name, v in labels)
+        + "}"
+    )
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonically increasing count, optionally split by labels.
+
+    Args:
+        name (str): Metric name, ending in _total by convention
+        documentation (str): One-line description shown as # HELP
+        label_names (tuple): Names of the labels every sample carries
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Forget every recorded value, starting over with a fresh lock."""
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(
+                f"{self.name} takes labels {self.label_names}, got {tuple(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def inc(self, amount=1, **labels):
+        """Add amount to the count for the given labels."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        """Current count for the given labels."""
+        key = self._key(labels)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def samples(self):
+        """(name, labels, value) for every exported time series."""
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield self.name, tuple(zip(self.label_names, key)), value
+
+    def drain(self):
+        """Return the counts recorded so far and reset them."""
+        with self._lock:
+            values, self._values = self._values, {}
+        return [[list(key), value] for key, value in values.items()]
+
+    def merge(self, drained):
+        """Add counts returned by another process's drain()."""
+        with self._lock:
+            for key, value in drained:
+                key = tuple(key)
+                self._values[key] = self._values.get(key, 0) + value
+
+
+class Histogram(Counter):
+    """Distribution of observed values (e.g. durations in seconds) over fixed buckets.
+
+    Args:
+        name (str): Metric name, e.g. ending in _seconds
+        documentation (str): One-line description shown as # HELP
+        label_names (tuple): Names of the labels every sample carries
+        buckets (tuple): Increasing upper bounds of the buckets
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        """Record one observation."""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """Observe the wall time spent in the with block, in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def value(self, **labels):
+        """Number of observations and their sum for the given labels."""
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0], 0.0))
+            return sum(counts), total
+
+    def samples(self):
+        with self._lock:
+            values = sorted(
+                (key, (list(counts), total))
+                for key, (counts, total) in self._values.items()
+            )
+        for key, (counts, total) in values:
+            labels = tuple(zip(self.label_names, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield self.name + "_bucket", labels + (("le", bound),), cumulative
+            yield self.name + "_sum", labels, total
+            yield self.name + "_count", labels, cumulative
+
+    def drain(self):
+        with self._lock:
+            values, self._values = self._values, {}
+        return [[list(key), counts, total] for key, (counts, total) in values.items()]
+
+    def merge(self, drained):
+        with self._lock:
+            for key, counts, total in drained:
+                key = tuple(key)
+                current, current_total = self._values.get(
+                    key, ([0] * len(self.buckets), 0.0)
+                )
+                self._values[key] = (
+                    [a + b for a, b in zip(current, counts)],
+                    current_total + total,
+                )
+
+
+class MetricsRegistry:
+    """Named collection of metrics, rendered together."""
+
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """
+        Forget everything recorded so far, replacing every lock.
+
+        Runs in forked children without taking any lock, as one inherited from
+        the parent may never be released.
+        """
+        self._lock = threading.Lock()
+        for metric in list(self.metrics.values()):
+            metric.reset()
+
+    def _register(self, metric_class, name, *args, **kwargs):
+        with self._lock:
+            if name not in self.metrics:
+                self.metrics[name] = metric_class(name, *args, **kwargs)
+            metric = self.metrics[name]
+        if not isinstance(metric, metric_class):
+            raise ValueError(f"{name} is already registered as a {metric.kind}")
+        return metric
+
+    def counter(self, name, documentation, label_names=()):
+        """Get or create a counter."""
+        return self._register(Counter, name, documentation, label_names)
+
+    def histogram(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        """Get or create a histogram."""
+        return self._register(Histogram, name, documentation, label_names, buckets)
+
+    def render(self):
+        """
+        All metrics in the Prometheus text exposition format (version 0.0.4).
+
+        Returns:
+            str: The exposition, as served on /metrics
+        """
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """
+        All metrics as plain data, e.g. for a JSON dump at the end of a batch run.
+
+        Returns:
+            dict: Metric name to {"type", "help", "samples"}, where each sample
+                holds the series name, labels and value
+        """
+        return {
+            metric.name: {
+                "type": metric.kind,
+                "help": metric.documentation,
+                "samples": [
+                    {
+                        "name": name,
+                        "labels": {k: _format_value(v) for k, v in labels},
+                        "value": value,
+                    }
+                    for name, labels, value in metric.samples()
+                ],
+            }
+            for metric in self.metrics.values()
+        }
+
+    def save(self, file_path):
+        """
+        Atomically write the metrics to a file.
+
+        A .json path gets the snapshot() data; anything else gets the text
+        format, as read by Prometheus' node exporter textfile collector.
+        """
+        if file_path.endswith(".json"):
+            content = json.dumps(self.snapshot(), indent=2)
+        else:
+            content = self.render()
+        tmp_path = file_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(content)
+        os.replace(tmp_path, file_path)
+
+    def drain(self):
+        """Return and reset everything recorded so far, for merge() in another process."""
+        drained = {}
+        for name, metric in self.metrics.items():
+            values = metric.drain()
+            if values:
+                drained[name] = values
+        return drained
+
+    def merge(self, drained):
+        """Add the values returned by another process's drain()."""
+        for name, values in drained.items():
+            if name in self.metrics:
+                self.metrics[name].merge(values)
+
+
+REGISTRY = MetricsRegistry()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=REGISTRY.reset)
+
+CARDS_INGESTED = REGISTRY.counter(
+    "flashcard_cards_ingested_total", "Cards parsed from Pleco flashcard exports"
+)
+CARDS_FORMATTED = REGISTRY.counter(
+    "flashcard_cards_formatted_total",
+    "Cards run through fmt_entry, by outcome (formatted or error)",
+    ("status",),
+)
+EXAMPLE_ALIGNMENT_FAILURES = REGISTRY.counter(
+    "flashcard_example_alignment_failures_total",
+    "Example sentences whose pinyin could not be aligned with the Chinese",
+)
+GRADING_CACHE_LOOKUPS = REGISTRY.counter(
+    "flashcard_grading_cache_lookups_total",
+    "Lookups of normalized Anki backs in the grading cache, by result (hit or miss)",
+    ("result",),
+)
+ANKI_CONNECT_REQUEST_SECONDS = REGISTRY.histogram(
+    "anki_connect_request_seconds", "AnkiConnect request latency", ("action",)
+)
+DRIVE_REQUEST_SECONDS = REGISTRY.histogram(
+    "drive_request_seconds", "Google Drive API request latency", ("method",)
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "flashcard_stage_seconds", "Time spent in each pipeline stage", ("stage",)
+)
@@ -2,6 +2,7 @@
 
 import csv
 import functools
+import unicodedata
 from collections import defaultdict
 from enum import Enum
 
@@ -155,6 +156,53 @@ def create_trie_from_pinyin(pinyin_set):
     return trie
 
 
+@functools.lru_cache(maxsize=None)  # Infinite cache size
+def get_toneless_pinyin_trie():
+    """Trie of every toneless pinyin syllable in CEDICT (with ü written as u)."""
+    return create_trie_from_pinyin(
+        extract_toneless_pinyin(get_resource_path(CEDICT_FILENAME))
+    )
+
+
+def split_marked_pinyin(pinyin):
+    """
+    Split pinyin with tone marks into syllables, in the shape convert_pinyin returns.
+
+    Syllables are matched greedily against the CEDICT syllables. Spaces and
+    apostrophes stay attached to the syllable that follows them. Tone marks
+    typed as combining characters are composed first (NFC).
+
+    Args:
+        pinyin (str): Pinyin with tone marks, e.g. "yóuxì" or "Xī'ān"
+
+    Returns:
+        list: Syllables, e.g. ["yóu", "xì"] or ["Xī", "'ān"]
+    """
+    trie = get_toneless_pinyin_trie()
+    pinyin = unicodedata.normalize("NFC", pinyin)
+    # stripping the tone marks keeps every character in place
+    toneless = strip_tone_marks(pinyin).lower().replace("ü", "u")
+    syllables = []
+    separator = ""
+    i = 0
+    while i < len(pinyin):
+        if not toneless[i].isalpha():
+            separator += pinyin[i]
+            i += 1
+            continue
+        length = trie.get_longest_length(toneless, i)
+        if not length:
+            # not pinyin as CEDICT knows it: keep the whole run of letters
+            while i + length < len(pinyin) and toneless[i + length].isalpha():
+                length += 1
+        syllables.append(separator + pinyin[i : i + length])
+        separator = ""
+        i += length
+    if separator and syllables:
+        syllables[-1] += separator
+    return syllables
+
+
 def convert_pinyin(pinyin):
     """Convert numbered pinyin to pinyin with tone marks."""
     tone_marks = {
@@ -208,7 +256,7 @@ def parse_cedict_toneless_pinyins(filename="cedict_ts.u8"):
     """Parse cedict_ts.u8 and extract a dictionary mapping Chinese characters to toneless Pinyin."""
     char_to_pinyin = defaultdict(set)
 
-    with open(filename, "r", encoding="utf-8") as f:
+    with open(get_resource_path(filename), "r", encoding="utf-8") as f:
         for line in f:
             if line.startswith("#"):
                 continue  # Skip comment lines
@@ -242,7 +290,7 @@ def load_manual_pinyins(filename="manual_pinyins.csv"):
     """Parses manual_pinyins.csv to extract bidirectional variant mappings."""
     pinyins = {}
 
-    with open(filename, "r", encoding="utf-8") as csvfile:
+    with open(get_resource_path(filename), "r", encoding="utf-8") as csvfile:
         reader = csv.reader(csvfile)
 
         next(reader)  # Skip the header row
@@ -0,0 +1,109 @@
+"""Append-only record of the Drive files the monitor has already processed."""
+
+import json
+import os
+
+from src.constants import MEMORY_FILE
+
+PROCESSED_JOURNAL_FILE = "processed_files.journal"
+DEFAULT_COMPACT_EVERY = 1000
+
+
+class ProcessedFileJournal:
+    """Set of processed file IDs, persisted as a snapshot plus an append-only journal.
+
+    Marking a file as processed appends one line to the journal instead of
+    rewriting the whole set, so the cost per event stays constant however long
+    the history grows. Once the journal holds compact_every IDs it is folded
+    into the snapshot (processed_files.json, a JSON list as before) and emptied.
+    A line left half-written by a crash is ignored on the next load.
+
+    Args:
+        snapshot_path (str): JSON list of processed IDs, rewritten on compaction
+        journal_path (str): IDs processed since the last compaction, one per line
+        compact_every (int): Journal length that triggers a compaction
+    """
+
+    def __init__(
+        self,
+        snapshot_path=MEMORY_FILE,
+        journal_path=PROCESSED_JOURNAL_FILE,
+        compact_every=DEFAULT_COMPACT_EVERY,
+    ):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.compact_every = compact_every
+        self.file_ids = set()
+        self._journal_length = 0
+        self._journal = None
+        self._load()
+
+    def _load(self):
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, "r", encoding="utf-8") as file:
+                self.file_ids.update(json.load(file))
+        if os.path.exists(self.journal_path):
+            complete_size = 0
+            with open(self.journal_path, "rb") as file:
+                for line in file:
+                    # a line without its newline was cut short by a crash
+                    if not line.endswith(b"\n"):
+                        break
+                    complete_size += len(line)
+                    if line.strip():
+                        self.file_ids.add(line.strip().decode("utf-8"))
+                        self._journal_length += 1
+            if complete_size < os.path.getsize(self.journal_path):
+                # drop the torn line, so the next append starts on a fresh one
+                os.truncate(self.journal_path, complete_size)
+
+    def __contains__(self, file_id):
+        return file_id in self.file_ids
+
+    def __len__(self):
+        return len(self.file_ids)
+
+    def add(self, file_id):
+        """
+        Mark a file as processed, appending it to the journal.
+
+        Returns:
+            bool: False if the file was already marked
+        """
+        if file_id in self.file_ids:
+            return False
+        if self._journal is None:
+            self._journal = open(  # pylint: disable=consider-using-with
+                self.journal_path, "a", encoding="utf-8"
+            )
+        self._journal.write(file_id + "\n")
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        self.file_ids.add(file_id)
+        self._journal_length += 1
+        if self._journal_length >= self.compact_every:
+            self.compact()
+        return True
+
+    def compact(self):
+        """Write every processed ID to the snapshot and empty the journal."""
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(sorted(self.file_ids), file)
+        os.replace(tmp_path, self.snapshot_path)
+        # IDs still in the journal after a crash here are already in the snapshot
+        self.close()
+        open(self.journal_path, "w", encoding="utf-8").close()
+        self._journal_length = 0
+
+    def close(self):
+        """Close the journal file."""
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
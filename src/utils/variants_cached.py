@@ -7,13 +7,15 @@ import os
 
 import regex as re
 
+from src.utils.resource_utils import get_resource_path
+
 
 # Load CC-CEDICT (Only Traditional Variants) ###
 @functools.lru_cache(maxsize=None)  # Infinite cache size
 def load_cc_cedict(filename="cedict_ts.u8"):
     """Parses CC-CEDICT to extract traditional-only variant mappings."""
     variants = {}
-    with open(filename, encoding="utf-8") as f:
+    with open(get_resource_path(filename), encoding="utf-8") as f:
         for line in f:
             if line.startswith("#") or not line.strip():
                 continue
@@ -41,7 +43,7 @@ def load_moedict(filename="moedict.csv"):
     variants = {}
 
     # Open the moedict.csv file
-    with open(filename, "r", encoding="utf-8") as csvfile:
+    with open(get_resource_path(filename), "r", encoding="utf-8") as csvfile:
         reader = csv.DictReader(csvfile)
 
         # Iterate through each row in the CSV
@@ -71,6 +73,7 @@ def get_c_variants(folder_path="c"):
         folder_path (str): Path to the folder containing files.
     """
     variants = {}
+    folder_path = get_resource_path(folder_path)
 
     for file_name in os.listdir(folder_path):
         file_path = os.path.join(folder_path, file_name)
@@ -112,7 +115,7 @@ def get_c_variants(folder_path="c"):
 def load_unihan_variants(filename="Unihan_Variants.txt"):
     """Parses Unihan_Variants.txt for character-level variants (traditional-only)."""
     variants = {}
-    with open(filename, encoding="utf-8") as f:
+    with open(get_resource_path(filename), encoding="utf-8") as f:
         for line in f:
             if line.startswith("#") or not line.strip():
                 continue
@@ -146,7 +149,7 @@ def load_manual_variants(filename="manual_variants.csv"):
     """Parses manual_variants.csv to extract bidirectional variant mappings."""
     variants = {}
 
-    with open(filename, "r", encoding="utf-8") as csvfile:
+    with open(get_resource_path(filename), "r", encoding="utf-8") as csvfile:
         reader = csv.reader(csvfile)
 
         for row in reader:
@@ -171,11 +174,3 @@ def get_variants(word):
         .union(load_unihan_variants().get(word, set()))
         .union(load_manual_variants().get(word, set()))
     )
-
-
-load_cc_cedict()
-load_moedict()
-get_c_variants()
-load_unihan_variants()
-load_manual_variants()
-""
@@ -0,0 +1,31 @@
+"""Shared fixtures."""
+
+import pytest
+
+from src.flashcard_formatting import batch_format
+
+
+def _skip_warm_up():
+    pass
+
+
+def _fake_fmt_entry(entry, compact=False):  # pylint: disable=unused-argument
+    if not entry.get("definition"):
+        raise ValueError("no definition")
+    return f"<div>{entry['definition']}</div>"
+
+
+@pytest.fixture(name="fake_formatting")
+def fixture_fake_formatting(monkeypatch):
+    """Format entries without loading any dictionaries, in workers too."""
+    monkeypatch.setattr(batch_format, "warm_dictionaries", _skip_warm_up)
+    monkeypatch.setattr(batch_format, "fmt_entry", _fake_fmt_entry)
+
+
+@pytest.fixture(name="entries")
+def fixture_entries():
+    """Entries for the fake formatter; every fifth one fails to format."""
+    return [
+        {"traditional": f"字{i}", "definition": f"def {i}" if i % 5 else ""}
+        for i in range(12)
+    ]
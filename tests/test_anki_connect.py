@@ -0,0 +1,51 @@
+"""Tests for the batching AnkiConnect client, against the fake AnkiConnect."""
+
+import asyncio
+
+import pytest
+
+from src.utils.anki_connect import AnkiConnectClient
+from src.utils.anki_connect_async import AsyncAnkiConnectClient
+from src.utils.fake_anki_connect import FakeAnkiConnect
+
+
+class NullBatchAnkiConnect(FakeAnkiConnect):
+    """Fake answering cardsInfo with a null result once it holds more than two cards."""
+
+    def handle(self, action, params):
+        if action == "cardsInfo" and max(params["cards"]) > sorted(self.cards)[1]:
+            return None
+        return super().handle(action, params)
+
+
+@pytest.fixture(name="server")
+def fixture_server():
+    server = NullBatchAnkiConnect().start_in_thread()
+    for front in ("遊戲", "遊", "戲", "玩"):
+        server.add_note(front, f"<div>{front}</div>")
+    yield server
+    server.stop_thread()
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_batches_are_joined_in_order(server, max_workers):
+    client = AnkiConnectClient(server.url, batch_size=1, max_workers=max_workers)
+    card_ids = sorted(server.cards)[:2]
+    cards = client.cards_info(card_ids)
+    assert [card["cardId"] for card in cards] == card_ids
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_null_batch_result_raises_connection_error(server, max_workers):
+    client = AnkiConnectClient(server.url, batch_size=2, max_workers=max_workers)
+    with pytest.raises(ConnectionError, match="cardsInfo"):
+        client.cards_info(sorted(server.cards))
+
+
+def test_null_batch_result_raises_connection_error_async(server):
+    async def run():
+        async with AsyncAnkiConnectClient(server.url, batch_size=2) as client:
+            await client.cards_info(sorted(server.cards))
+
+    with pytest.raises(ConnectionError, match="cardsInfo"):
+        asyncio.run(run())
@@ -0,0 +1,140 @@
+"""Tests for the asyncio AnkiConnect client against the in-process fake."""
+
+import asyncio
+
+import pytest
+
+from src.utils.anki_connect_async import (
+    AsyncAnkiConnectClient,
+    get_anki_deck_cards_async,
+)
+from src.utils.fake_anki_connect import FakeAnkiConnect
+
+
+async def _fetch_repeatedly(server, times):
+    async with AsyncAnkiConnectClient(server.url) as client:
+        return [
+            len(await get_anki_deck_cards_async("Pleco Import", client))
+            for _ in range(times)
+        ]
+
+
+def _run_against(times=1, **server_options):
+    async def run():
+        async with FakeAnkiConnect(**server_options) as server:
+            server.add_note("遊戲", "<div>game</div>", "yóuxì")
+            server.add_note("遊", "<div>to swim</div>", "yóu")
+            counts = await _fetch_repeatedly(server, times)
+            return counts, server.requests
+
+    return asyncio.run(run())
+
+
+def test_keep_alive_connections_are_reused():
+    counts, requests = _run_against(times=3)
+    assert counts == [2, 2, 2]
+    assert requests == 6
+
+
+def test_connections_closed_after_each_response():
+    # AnkiConnect closes the socket after answering without saying so
+    counts, requests = _run_against(times=5, keep_alive=False)
+    assert counts == [2] * 5
+    assert requests == 10
+
+
+def test_chunked_responses():
+    counts, _ = _run_against(times=2, chunked=True)
+    assert counts == [2, 2]
+
+
+def test_chunked_responses_without_keep_alive():
+    counts, _ = _run_against(times=2, chunked=True, keep_alive=False)
+    assert counts == [2, 2]
+
+
+async def _serve_raw(response):
+    async def answer(reader, writer):
+        await reader.readline()
+        writer.write(response)
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(answer, "127.0.0.1", 0)
+    host, port = server.sockets[0].getsockname()[:2]
+    return server, f"http://{host}:{port}"
+
+
+@pytest.mark.parametrize(
+    "response",
+    [
+        b"",
+        b"garbage\r\n\r\n",
+        b"HTTP/1.1 OK\r\n\r\n",
+        b"HTTP/1.1 200 OK\r\nno header separator\r\n\r\n",
+        b"HTTP/1.1 200 OK\r\nContent-Length: many\r\n\r\n",
+        b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\nzz\r\n",
+    ],
+)
+def test_malformed_responses_raise_connection_error(response):
+    async def run():
+        server, url = await _serve_raw(response)
+        try:
+            async with AsyncAnkiConnectClient(url, timeout=5) as client:
+                await client.invoke("version")
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(run())
+
+
+def test_body_delimited_by_closing_the_connection():
+    async def run():
+        server, url = await _serve_raw(
+            b'HTTP/1.0 200 OK\r\n\r\n{"result": 6, "error": null}'
+        )
+        try:
+            async with AsyncAnkiConnectClient(url, timeout=5) as client:
+                return [await client.invoke("version") for _ in range(2)]
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    assert asyncio.run(run()) == [6, 6]
+
+
+@pytest.mark.parametrize(
+    "body", [b"not json", b'{"result": 6', b"\xff\xfe", b"<html>Bad Gateway</html>"]
+)
+def test_non_json_body_raises_connection_error(body):
+    async def run():
+        server, url = await _serve_raw(
+            b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body)
+        )
+        try:
+            async with AsyncAnkiConnectClient(url, timeout=5) as client:
+                await client.invoke("version")
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    with pytest.raises(ConnectionError, match="version"):
+        asyncio.run(run())
+
+
+def test_requests_in_flight_are_bounded():
+    async def run():
+        # the server would take them all at once; the client must not send them
+        async with FakeAnkiConnect(latency=0.02, max_concurrency=100) as server:
+            async with AsyncAnkiConnectClient(server.url, max_concurrency=3) as client:
+                results = await asyncio.gather(
+                    *(client.invoke("version") for _ in range(20))
+                )
+            return results, server.max_in_flight, server.requests
+
+    results, max_in_flight, requests = asyncio.run(run())
+    assert results == [6] * 20
+    assert requests == 20
+    assert max_in_flight == 3
@@ -0,0 +1,71 @@
+"""Tests for the delta-synced Anki deck snapshot, against the fake AnkiConnect."""
+
+import pytest
+
+from src.utils.anki_connect import AnkiConnectClient
+from src.utils.anki_snapshot import AnkiSnapshot
+from src.utils.fake_anki_connect import FakeAnkiConnect
+
+
+@pytest.fixture(name="server")
+def fixture_server():
+    server = FakeAnkiConnect().start_in_thread()
+    yield server
+    server.stop_thread()
+
+
+def _age_collection(server):
+    """Date every note back, as if the deck was last edited long ago."""
+    for note in server.notes.values():
+        note["mod"] = 1_000_000
+
+
+def test_only_changed_cards_are_fetched_again(server, tmp_path):
+    first = server.add_note("遊戲", "<div>game</div>")
+    server.add_note("遊", "<div>to swim</div>")
+    _age_collection(server)
+    client = AnkiConnectClient(server.url)
+
+    snapshot = AnkiSnapshot(file_path=str(tmp_path / "snapshot.json"))
+    assert snapshot.refresh(client) == {"fetched": 2, "unchanged": 0, "deleted": 0}
+    snapshot.save()
+
+    snapshot = AnkiSnapshot(file_path=str(tmp_path / "snapshot.json"))
+    assert snapshot.refresh(client) == {"fetched": 0, "unchanged": 2, "deleted": 0}
+
+    server.notes[first]["fields"]["Back"]["value"] = "<div>play</div>"
+    server.notes[first]["mod"] = 2_000_000
+    assert snapshot.refresh(client)["fetched"] == 1
+    assert snapshot.cards_by_front()["遊戲"]["answer"] == "<div>play</div>"
+
+
+def test_note_edited_during_the_fetch_is_fetched_again(server):
+    note = server.add_note("遊戲", "<div>game</div>")
+    _age_collection(server)
+
+    class EditingClient(AnkiConnectClient):
+        """Client during whose cardsInfo request the note is edited in Anki."""
+
+        def cards_info(self, card_ids):
+            cards = super().cards_info(card_ids)
+            server.handle(
+                "updateNoteFields",
+                {"note": {"id": note, "fields": {"Back": "<div>play</div>"}}},
+            )
+            return cards
+
+    snapshot = AnkiSnapshot(file_path=None)
+    snapshot.refresh(EditingClient(server.url))
+    assert snapshot.cards_by_front()["遊戲"]["answer"] == "<div>game</div>"
+
+    assert snapshot.refresh(AnkiConnectClient(server.url))["fetched"] == 1
+    assert snapshot.cards_by_front()["遊戲"]["answer"] == "<div>play</div>"
+
+
+def test_snapshot_without_a_file_is_kept_in_memory(server, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    server.add_note("遊戲", "<div>game</div>")
+    snapshot = AnkiSnapshot(file_path=None)
+    assert snapshot.refresh(AnkiConnectClient(server.url))["fetched"] == 1
+    snapshot.save()
+    assert not list(tmp_path.iterdir())
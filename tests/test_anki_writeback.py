@@ -0,0 +1,91 @@
+"""Tests for planning and sending write-backs of rendered backs to Anki."""
+
+import json
+
+import pytest
+
+from src.utils.anki_writeback import has_user_markup, plan_writeback, write_back
+
+PLECO_ENTRY = '<plecoentry c="00000000" d="50414345" e="01d76100" x="-1"/>'
+RENDERED = (
+    '<div align="left"><p><span style="color:#0078C3;"><b>遊戲</b></span> game'
+    "</p>\n</div>"
+)
+
+
+def _cards(back):
+    return {"遊戲": {"note": 1, "fields": {"Back": {"value": back}}}}
+
+
+def _plan(anki_back, rendered=RENDERED):
+    entries = [{"traditional": "遊戲", "formatted_back": rendered}]
+    return plan_writeback(entries, _cards(anki_back))
+
+
+def test_backs_equal_after_normalization_are_not_rewritten():
+    # as stored by Anki: bold outside the color span, a non-breaking space and
+    # the element Pleco appends
+    anki_back = (
+        '<div align="left"><p><b><span style="color:#0078C3;">遊戲</span></b>'
+        "\xa0game</p>\n</div>" + PLECO_ENTRY
+    )
+    assert not _plan(anki_back)
+
+
+def test_changed_back_keeps_the_pleco_entry():
+    [update] = _plan('<div align="left"><p>old</p>\n</div>' + PLECO_ENTRY)
+    assert update["note"] == 1
+    assert update["back"] == RENDERED + PLECO_ENTRY
+
+
+@pytest.mark.parametrize(
+    "anki_back",
+    [
+        '<div align="left"><p>old See <a href="#">遊</a></p></div>',
+        '<div align="left"><p>old</p></div><plecoentry>my note</plecoentry>',
+        '<plecoentry c="0"/><div align="left"><p>old</p></div>',
+    ],
+)
+def test_hand_written_markup_is_left_alone(anki_back):
+    assert has_user_markup(anki_back)
+    assert not _plan(anki_back)
+
+
+def test_pleco_entry_alone_is_not_user_markup():
+    assert not has_user_markup("<div><p>see the sea</p></div>" + PLECO_ENTRY)
+
+
+class FailingClient:
+    """Client whose multi calls fail from the given call on."""
+
+    def __init__(self, fail_from):
+        self.fail_from = fail_from
+        self.calls = []
+
+    def multi(self, actions):
+        self.calls.append(actions)
+        if len(self.calls) >= self.fail_from:
+            raise ConnectionError("Failed to connect to AnkiConnect for multi.")
+        return [None] * len(actions)
+
+
+def test_failed_batch_saves_the_notes_already_written(tmp_path):
+    updates = [
+        {"note": note, "traditional": str(note), "back": "<div></div>"}
+        for note in range(5)
+    ]
+    report_path = tmp_path / "writeback_report.json"
+    with pytest.raises(ConnectionError):
+        write_back(
+            updates,
+            client=FailingClient(fail_from=2),
+            batch_size=2,
+            min_interval=0,
+            report_path=str(report_path),
+        )
+
+    report = json.loads(report_path.read_text(encoding="utf-8"))
+    assert report["written_notes"] == [0, 1]
+    assert report["failed_notes"] == [2, 3]
+    assert report["updated"] == 2
+    assert "error" in report
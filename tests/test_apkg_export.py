@@ -0,0 +1,77 @@
+"""Tests for the .apkg export, read back through the local collection reader."""
+
+import sqlite3
+import zipfile
+
+import pytest
+
+from src.utils.anki_collection import read_deck_cards
+from src.utils.apkg_export import (
+    DEFAULT_DECK_NAME,
+    MODEL_FIELDS,
+    MODEL_NAME,
+    export_apkg,
+    note_guid,
+)
+
+
+def _entry(traditional, entryid, back, pinyin):
+    return {
+        "traditional": traditional,
+        "simplified": traditional,
+        "pinyin": pinyin,
+        "definition": "",
+        "dictid": "PACE",
+        "entryid": entryid,
+        "formatted_back": back,
+    }
+
+
+ENTRIES = [
+    _entry("遊戲", "1", '<div style="color: red">game</div>', ["yóu", "xì"]),
+    _entry("遊", "2", "<b>to swim</b>\n<i>to travel</i>", ["yóu"]),
+    _entry("戲", "3", "play; drama", ["xì"]),
+]
+
+
+def _export(tmp_path, entries, **kwargs):
+    package_path = tmp_path / "deck.apkg"
+    count = export_apkg(entries, str(package_path), **kwargs)
+    with zipfile.ZipFile(package_path) as package:
+        assert sorted(package.namelist()) == ["collection.anki2", "media"]
+        package.extract("collection.anki2", tmp_path)
+    return count, str(tmp_path / "collection.anki2")
+
+
+def test_fields_round_trip_through_read_deck_cards(tmp_path):
+    count, collection_path = _export(tmp_path, ENTRIES)
+    assert count == len(ENTRIES)
+
+    cards = read_deck_cards(collection_path, DEFAULT_DECK_NAME)
+    assert len(cards) == len(ENTRIES)
+    for card, entry in zip(cards, ENTRIES):
+        assert card["deckName"] == DEFAULT_DECK_NAME
+        assert card["modelName"] == MODEL_NAME
+        assert list(card["fields"]) == MODEL_FIELDS
+        assert {name: field["value"] for name, field in card["fields"].items()} == {
+            "Front": entry["traditional"],
+            "Back": entry["formatted_back"],
+            "pinyin": " ".join(entry["pinyin"]),
+        }
+
+
+def test_duplicate_cards_are_exported_once_with_stable_guids(tmp_path):
+    count, collection_path = _export(tmp_path, ENTRIES + [dict(ENTRIES[0])])
+    assert count == len(ENTRIES)
+
+    with sqlite3.connect(collection_path) as connection:
+        guids = [row[0] for row in connection.execute("SELECT guid FROM notes")]
+    assert sorted(guids) == sorted(note_guid(entry) for entry in ENTRIES)
+
+
+def test_custom_deck_name_and_unknown_deck(tmp_path):
+    _, collection_path = _export(tmp_path, ENTRIES, deck_name="Chinese::Pleco")
+
+    assert len(read_deck_cards(collection_path, "Chinese")) == len(ENTRIES)
+    with pytest.raises(ValueError):
+        read_deck_cards(collection_path, DEFAULT_DECK_NAME)
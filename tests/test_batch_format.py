@@ -0,0 +1,51 @@
+"""Tests for batch formatting across worker processes."""
+
+import gc
+import multiprocessing
+import sys
+
+import pytest
+
+from src.flashcard_formatting import batch_format
+
+forked_only = pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="workers are only forked on Linux"
+)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+@pytest.mark.usefixtures("fake_formatting")
+def test_format_entries_keeps_order_and_reports_errors(entries, jobs):
+    backs, errors = batch_format.format_entries(entries, jobs=jobs)
+    assert backs[1] == "<div>def 1</div>"
+    assert backs[0] is None and backs[5] is None and backs[10] is None
+    assert [error["index"] for error in errors] == [0, 5, 10]
+    assert errors[0]["error"] == "ValueError: no definition"
+
+
+@forked_only
+@pytest.mark.usefixtures("fake_formatting")
+def test_worker_pool_forks_every_worker_before_returning():
+    before = len(multiprocessing.active_children())
+    with batch_format.format_worker_pool(3):
+        assert len(multiprocessing.active_children()) == before + 3
+        assert gc.get_freeze_count() == 0
+
+
+@forked_only
+@pytest.mark.usefixtures("fake_formatting")
+def test_iter_format_entries_forks_before_reading_entries(entries):
+    workers_at_first_read = []
+
+    def read_entries():
+        workers_at_first_read.append(len(multiprocessing.active_children()))
+        yield from entries[:4]
+
+    results = list(batch_format.iter_format_entries(read_entries(), jobs=2))
+    assert workers_at_first_read[0] >= 2
+    assert [back for _, back, _ in results] == [
+        None,
+        "<div>def 1</div>",
+        "<div>def 2</div>",
+        "<div>def 3</div>",
+    ]
@@ -0,0 +1,50 @@
+"""Compact card HTML must keep no inline styles and only use classes the stylesheet defines."""
+
+import json
+
+import pytest
+import regex as re
+
+from src.flashcard_formatting.card_styles import compact_card_html, get_card_stylesheet
+from src.flashcard_formatting.format_entry import fmt_entry
+from src.utils.resource_utils import get_resource_path
+
+SAMPLE_SIZE = 60
+
+
+@pytest.fixture(name="formatted_backs", scope="module")
+def fixture_formatted_backs():
+    """Backs rendered by fmt_entry for the first sample entries, with inline styles."""
+    with open(
+        get_resource_path("flashcard_entries.json"), "r", encoding="utf-8"
+    ) as file:
+        entries = json.load(file)[:SAMPLE_SIZE]
+    return [(entry, fmt_entry(entry)) for entry in entries]
+
+
+def _stylesheet_classes():
+    return set(re.findall(r"\.([\w-]+)\s*\{", get_card_stylesheet()))
+
+
+def test_compact_backs_use_only_stylesheet_classes(formatted_backs):
+    defined = _stylesheet_classes()
+    used = set()
+    for _, formatted_back in formatted_backs:
+        compact = compact_card_html(formatted_back)
+        assert "style=" not in compact
+        for classes in re.findall(r'class="([^"]*)"', compact):
+            used.update(classes.split())
+    assert used <= defined
+    # the sample covers every tone, labels, headwords and examples
+    assert {"hw", "lbl", "zh", "ex", "t1", "t2", "t3", "t4"} <= used
+
+
+def test_compact_rendering_matches_compacting_afterwards(formatted_backs):
+    for entry, formatted_back in formatted_backs[:10]:
+        assert fmt_entry(entry, compact=True) == compact_card_html(formatted_back)
+
+
+def test_compacting_is_idempotent(formatted_backs):
+    for _, formatted_back in formatted_backs:
+        compact = compact_card_html(formatted_back)
+        assert compact_card_html(compact) == compact
@@ -0,0 +1,83 @@
+"""Tests for the Drive changes watcher, against the in-memory Drive service."""
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from src.utils.drive_watcher import DriveChangesWatcher
+from src.utils.fake_drive import FakeDriveService, FakeRequest
+from src.utils.google_drive_utils import move_file_to_folder
+
+EXPORT_NAME = "pleco_flashcards.xml"
+
+
+class FlakyDriveService(FakeDriveService):
+    """Drive service whose next changes.list calls raise the given errors."""
+
+    def __init__(self):
+        super().__init__()
+        self.failures = []
+
+    def changes(self):
+        resource = super().changes()
+        if self.failures:
+            error = self.failures.pop(0)
+
+            def fail():
+                raise error
+
+            resource.list = lambda **_: FakeRequest(fail)
+        return resource
+
+
+def _watcher(service, tmp_path, handled, archive):
+    def on_file(file):
+        handled.append(file["id"])
+        move_file_to_folder(service, file["id"], archive, parents=file["parents"])
+
+    sleeps = []
+    watcher = DriveChangesWatcher(
+        service,
+        on_file,
+        file_name=EXPORT_NAME,
+        state_file=str(tmp_path / "state.json"),
+        min_interval=1,
+        max_interval=8,
+        sleep=sleeps.append,
+    )
+    watcher.poll()
+    return watcher, sleeps
+
+
+def test_moving_a_handled_file_does_not_reset_the_backoff(tmp_path):
+    service = FlakyDriveService()
+    archive = service.create_folder("_Pleco")
+    handled = []
+    watcher, sleeps = _watcher(service, tmp_path, handled, archive)
+
+    first = service.create_file(EXPORT_NAME, b"<plecoflash/>")
+    assert watcher.run(max_polls=5) == 1
+    assert handled == [first]
+    assert service.files_by_id[first]["parents"] == [archive]
+    assert sleeps == [1, 2, 4, 8]
+
+    # a new upload of the same file is reported again
+    service.set_content(first, b"<plecoflash>new</plecoflash>")
+    assert watcher.run(max_polls=1) == 1
+    assert handled == [first, first]
+
+
+def test_failed_polls_are_logged_and_backed_off(tmp_path, capsys):
+    service = FlakyDriveService()
+    archive = service.create_folder("_Pleco")
+    handled = []
+    watcher, sleeps = _watcher(service, tmp_path, handled, archive)
+
+    export = service.create_file(EXPORT_NAME, b"<plecoflash/>")
+    service.failures = [
+        HttpError(httplib2.Response({"status": 503}), b"backend error"),
+        TimeoutError("timed out"),
+    ]
+    assert watcher.run(max_polls=3) == 1
+    assert handled == [export]
+    assert sleeps == [2, 4]
+    assert capsys.readouterr().out.count("An error occurred") == 2
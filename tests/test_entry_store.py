@@ -0,0 +1,77 @@
+"""Tests for the SQLite entry store."""
+
+import json
+
+from src.utils.entry_store import RENDER_ERROR, RENDER_FORMATTED, EntryStore
+from src.utils.ingest_state import card_key, legacy_card_key
+
+
+def _entry(traditional, entryid, definition="game"):
+    return {
+        "traditional": traditional,
+        "simplified": traditional,
+        "definition": definition,
+        "dictid": "PACE",
+        "entryid": entryid,
+    }
+
+
+def test_upsert_only_counts_changed_rows(tmp_path):
+    with EntryStore(str(tmp_path / "entries.sqlite3")) as store:
+        assert store.upsert([_entry("遊戲", "1"), _entry("遊", "2")]) == 2
+        assert store.upsert([_entry("遊戲", "1"), _entry("遊", "2")]) == 0
+        assert store.upsert([_entry("遊戲", "1", "play")]) == 1
+        assert store.get(card_key(_entry("遊戲", "1")))["definition"] == "play"
+
+
+def test_export_entries_take_over_legacy_rows(tmp_path):
+    legacy = [
+        {k: v for k, v in _entry(word, None).items() if k != "entryid"}
+        for word in ("遊戲", "遊", "戲")
+    ]
+    legacy_path = tmp_path / "flashcard_entries.json"
+    legacy_path.write_text(json.dumps(legacy, ensure_ascii=False), encoding="utf-8")
+
+    with EntryStore(str(tmp_path / "entries.sqlite3")) as store:
+        assert store.import_json(str(legacy_path)) == 3
+        assert store.keys() == [legacy_card_key(entry) for entry in legacy]
+
+        exported = [_entry("遊戲", "1", "play"), _entry("戲", "3")]
+        store.upsert(exported, RENDER_FORMATTED)
+
+        # matched rows keep their position under their new key
+        assert store.keys() == [
+            card_key(exported[0]),
+            legacy_card_key(legacy[1]),
+            card_key(exported[1]),
+        ]
+        assert store.get(card_key(exported[0]))["definition"] == "play"
+
+        store.export_json(str(legacy_path))
+    exported_json = json.loads(legacy_path.read_text(encoding="utf-8"))
+    assert [entry["traditional"] for entry in exported_json] == ["遊戲", "遊", "戲"]
+
+
+def test_export_keeps_failed_entries_with_their_error(tmp_path):
+    failed = dict(_entry("遊", "2"), formatted_back="<div>old</div>")
+    failed["render_error"] = "ValueError: no pinyin"
+    with EntryStore(str(tmp_path / "entries.sqlite3")) as store:
+        store.upsert([_entry("遊戲", "1")], RENDER_FORMATTED)
+        store.upsert([failed], RENDER_ERROR)
+        assert store.find_by_render_status(RENDER_ERROR) == [failed]
+        store.export_json(str(tmp_path / "flashcard_entries.json"))
+
+    exported = json.loads(
+        (tmp_path / "flashcard_entries.json").read_text(encoding="utf-8")
+    )
+    assert [entry.get("render_error") for entry in exported] == [
+        None,
+        "ValueError: no pinyin",
+    ]
+    assert exported[1]["formatted_back"] == "<div>old</div>"
+
+
+def test_upsert_accepts_a_generator(tmp_path):
+    with EntryStore(str(tmp_path / "entries.sqlite3")) as store:
+        assert store.upsert(entry for entry in [_entry("遊戲", "1")]) == 1
+        assert len(store) == 1
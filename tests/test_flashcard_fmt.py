@@ -0,0 +1,59 @@
+"""Tests for the command line entry point's input fetching."""
+
+import argparse
+
+from src import flashcard_fmt
+
+
+def _args(stream=False):
+    return argparse.Namespace(stream=stream, anki_collection=None)
+
+
+def test_no_export_skips_the_other_fetches(monkeypatch):
+    started = []
+    monkeypatch.setattr(flashcard_fmt, "get_latest_flashcard_chunks", lambda: None)
+    monkeypatch.setattr(
+        flashcard_fmt, "warm_dictionaries", lambda: started.append("warm")
+    )
+    monkeypatch.setattr(
+        flashcard_fmt, "get_anki_cards_dict", lambda **_: started.append("anki")
+    )
+    assert flashcard_fmt.fetch_inputs(_args()) == (None, None)
+    assert not started
+
+
+def test_export_is_fetched_with_the_anki_deck(monkeypatch):
+    monkeypatch.setattr(
+        flashcard_fmt, "get_latest_flashcard_chunks", lambda: iter([b"<a>", b"</a>"])
+    )
+    monkeypatch.setattr(flashcard_fmt, "warm_dictionaries", lambda: None)
+    monkeypatch.setattr(flashcard_fmt, "get_anki_cards_dict", lambda **_: {"遊": {}})
+
+    chunks, anki_cards = flashcard_fmt.fetch_inputs(_args())
+    assert chunks == [b"<a></a>"]
+    assert anki_cards == {"遊": {}}
+
+    chunks, _ = flashcard_fmt.fetch_inputs(_args(stream=True))
+    assert list(chunks) == [b"<a>", b"</a>"]
+
+
+def test_path_options_are_resolved_before_changing_into_resources(
+    monkeypatch, tmp_path
+):
+    (tmp_path / "resources").mkdir()
+    monkeypatch.chdir(tmp_path)
+    runs = []
+    monkeypatch.setattr(flashcard_fmt, "run", runs.append)
+    monkeypatch.setattr(flashcard_fmt, "save_card_stylesheet", lambda path: None)
+
+    flashcard_fmt.main(
+        ["--anki-collection", "collection.anki2", "--apkg", "out/deck.apkg"]
+        + ["--stylesheet", "cards.css", "--export-json", "flashcard_entries.json"]
+    )
+    [args] = runs
+    assert args.anki_collection == str(tmp_path / "collection.anki2")
+    assert args.apkg == str(tmp_path / "out" / "deck.apkg")
+    assert args.stylesheet == str(tmp_path / "cards.css")
+    assert args.metrics_file is None
+    # the legacy JSON file stays next to the other resources
+    assert args.export_json == "flashcard_entries.json"
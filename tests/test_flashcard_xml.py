@@ -0,0 +1,72 @@
+"""Streaming and whole-document parsing of Pleco flashcard exports must agree."""
+
+import pytest
+
+from src.flashcard_formatting.flashcard_xml import (
+    iter_flashcard_xml,
+    process_flashcard_xml,
+)
+
+EXPORT = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<plecoflash formatversion="2" created="1735693200"><categories></categories>'
+    "<cards>"
+    '<card language="chinese" created="1735513394" modified="1735513394"><entry>'
+    '<headword charset="sc">游戏</headword><headword charset="tc">遊戲</headword>'
+    '<pron type="hypy" tones="numbers">you2xi4</pron>'
+    "<defn>noun recreation; game 做遊戲 Zuò yóuxì play games</defn></entry>"
+    '<dictref dictid="PACE" entryid="35050240"/></card>'
+    '<card language="chinese" created="1735514285"><entry>'
+    '<headword charset="sc">革新</headword><headword charset="tc">革新</headword>'
+    '<pron type="hypy" tones="numbers">ge2xin1</pron></entry>'
+    '<dictref dictid="PACE"/></card>'
+    '<card language="chinese" created="1735514300" modified="1735514400"><entry>'
+    '<headword charset="sc">女儿</headword><headword charset="tc">女兒</headword>'
+    '<pron type="hypy" tones="numbers">nu:3er2</pron>'
+    "<defn>daughter 她有兩個女兒。 Tā yǒu liǎng gè nǚ'ér.</defn></entry>"
+    '<dictref dictid="CC" entryid="42"/></card>'
+    "</cards></plecoflash>"
+).encode("utf-8")
+
+
+def _chunks(data, size):
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 5, 64, len(EXPORT)])
+def test_streamed_chunks_match_the_whole_document(size):
+    chunks = _chunks(EXPORT, size)
+    if size < len(EXPORT):
+        # some chunk ends inside a multi-byte UTF-8 character
+        assert any(not _decodes(chunk) for chunk in chunks)
+
+    streamed = list(iter_flashcard_xml(chunks))
+    entries, problematic = process_flashcard_xml(EXPORT)
+    assert [entry for entry in streamed if entry["definition"]] == entries
+    assert [entry for entry in streamed if not entry["definition"]] == problematic
+    assert [entry["traditional"] for entry in streamed] == ["遊戲", "革新", "女兒"]
+
+
+def test_whole_document_fields():
+    entries, problematic = process_flashcard_xml(EXPORT.decode("utf-8"))
+    assert entries[0] == {
+        "simplified": "游戏",
+        "traditional": "遊戲",
+        "pinyin": ["yóu", "xì"],
+        "definition": "noun recreation; game 做遊戲 Zuò yóuxì play games",
+        "dictid": "PACE",
+        "entryid": "35050240",
+        "created": 1735513394,
+        "modified": 1735513394,
+    }
+    assert [entry["traditional"] for entry in problematic] == ["革新"]
+    assert problematic[0]["entryid"] is None
+    assert problematic[0]["modified"] is None
+
+
+def _decodes(chunk):
+    try:
+        chunk.decode("utf-8")
+    except UnicodeDecodeError:
+        return False
+    return True
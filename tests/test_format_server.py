@@ -0,0 +1,133 @@
+"""Tests for the formatting server, on an ephemeral port with the fake formatter."""
+
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from src import format_server
+from src.format_server import MAX_BATCH_SIZE, create_server, prepare_entry
+
+
+@pytest.fixture(name="server_url")
+def fixture_server_url(monkeypatch, fake_formatting):  # pylint: disable=W0613
+    """URL of a running server with two workers and room for 4 pending entries."""
+    monkeypatch.setattr(format_server, "warm_dictionaries", lambda: None)
+    server = create_server(port=0, jobs=2, max_pending=4)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    yield f"http://{host}:{port}"
+    server.shutdown()
+    server.server_close()
+    server.pool.shutdown()
+
+
+def _post(url, payload):
+    request = urllib.request.Request(
+        url + "/format", data=json.dumps(payload).encode("utf-8")
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status, response.headers, json.load(response)
+    except urllib.error.HTTPError as error:
+        with error:
+            return error.code, error.headers, json.load(error)
+
+
+def test_batch_holds_results_and_per_entry_errors(server_url):
+    status, _, body = _post(
+        server_url,
+        {
+            "entries": [
+                {"traditional": "遊戲", "pinyin": "you2xi4", "definition": "game"},
+                {"pinyin": "you2"},
+                {"traditional": "戲", "pinyin": "xì"},
+            ]
+        },
+    )
+    assert status == 200
+    assert body["results"][0] == {"formatted_back": "<div>game</div>"}
+    assert "traditional" in body["results"][1]["error"]
+    assert body["results"][2] == {"error": "ValueError: no definition"}
+    assert (body["formatted"], body["errors"]) == (1, 2)
+
+
+def test_single_entry(server_url):
+    entry = {"traditional": "遊戲", "definition": "game"}
+    assert _post(server_url, entry)[::2] == (200, {"formatted_back": "<div>game</div>"})
+    assert _post(server_url, {"traditional": "遊戲"})[::2] == (
+        422,
+        {"error": "ValueError: no definition"},
+    )
+
+
+def test_oversized_batch_is_rejected(server_url):
+    entries = [{"traditional": "遊", "definition": "swim"}] * (MAX_BATCH_SIZE + 1)
+    status, _, body = _post(server_url, entries)
+    assert status == 413
+    assert str(MAX_BATCH_SIZE) in body["error"]
+
+
+def test_full_queue_is_refused_with_retry_after(server_url):
+    entries = [{"traditional": "遊", "definition": "swim"}] * 5
+    status, headers, body = _post(server_url, entries)
+    assert status == 503
+    assert headers["Retry-After"] == str(format_server.RETRY_AFTER_SECONDS)
+    assert "limit is 4" in body["error"]
+
+    # the refused entries are not left counted as pending
+    status, _, body = _post(server_url, entries[:4])
+    assert (status, body["formatted"]) == (200, 4)
+
+
+def test_concurrent_requests_beyond_the_queue_are_refused(server_url, monkeypatch):
+    pool_format = format_server.FormatWorkerPool.format
+    admitted = threading.Event()
+    release = threading.Event()
+
+    def held_format(self, entries, compact=False):
+        # keep the first request's entries pending until the second one is answered
+        with self._lock:  # pylint: disable=protected-access
+            self.pending += len(entries)
+        admitted.set()
+        release.wait(30)
+        with self._lock:  # pylint: disable=protected-access
+            self.pending -= len(entries)
+        return pool_format(self, entries, compact)
+
+    monkeypatch.setattr(format_server.FormatWorkerPool, "format", held_format)
+    entries = [{"traditional": "遊", "definition": "swim"}] * 3
+    first = []
+    thread = threading.Thread(target=lambda: first.append(_post(server_url, entries)))
+    thread.start()
+    assert admitted.wait(30)
+    monkeypatch.setattr(format_server.FormatWorkerPool, "format", pool_format)
+
+    assert _post(server_url, entries)[0] == 503
+    release.set()
+    thread.join(30)
+    assert first[0][0] == 200
+
+
+def test_numbered_and_marked_pinyin_are_prepared_alike():
+    numbered = prepare_entry({"traditional": "遊戲", "pinyin": "you2xi4"})
+    marked = prepare_entry({"traditional": "遊戲", "pinyin": "yóuxì"})
+    assert (
+        numbered
+        == marked
+        == {
+            "traditional": "遊戲",
+            "simplified": "遊戲",
+            "pinyin": ["yóu", "xì"],
+            "definition": "",
+        }
+    )
+    syllables = ["yóu", "xì"]
+    assert prepare_entry({"traditional": "遊戲", "pinyin": syllables})["pinyin"] == (
+        syllables
+    )
+    with pytest.raises(ValueError):
+        prepare_entry({"pinyin": "you2xi4"})
@@ -0,0 +1,244 @@
+"""Tests for the Google Drive helpers, against the in-memory Drive service."""
+
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from src import flashcard_fmt
+from src.utils import google_drive_utils
+from src.utils.fake_drive import FakeDriveService
+from src.utils.processed_journal import ProcessedFileJournal
+
+EXPORT_NAME = "pleco_flashcards.xml"
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _monitor(service, archive, max_polls=1):
+    google_drive_utils.monitor_google_drive(
+        archive, interval=0, service=service, max_polls=max_polls
+    )
+
+
+def test_monitor_processes_new_exports_then_archives_them(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    processed = []
+    monkeypatch.setattr(
+        flashcard_fmt,
+        "run",
+        lambda args, xml_chunks: processed.append(b"".join(xml_chunks)),
+    )
+    service = FakeDriveService()
+    archive = service.create_folder("_Pleco")
+    old = service.create_file(EXPORT_NAME, b"<plecoflash>old</plecoflash>")
+
+    # the first run catches up on the export that is already there
+    _monitor(service, archive)
+    assert processed == [b"<plecoflash>old</plecoflash>"]
+    assert service.files_by_id[old]["parents"] == [archive]
+
+    new = service.create_file(EXPORT_NAME, b"<plecoflash>new</plecoflash>")
+    _monitor(service, archive)
+    assert processed[1:] == [b"<plecoflash>new</plecoflash>"]
+    assert service.files_by_id[new]["parents"] == [archive]
+    with ProcessedFileJournal() as journal:
+        assert old in journal and new in journal
+
+
+def test_monitor_leaves_exports_that_fail_to_process(monkeypatch, tmp_path, capsys):
+    monkeypatch.chdir(tmp_path)
+
+    def fail(args, xml_chunks):
+        raise ValueError("not well-formed")
+
+    monkeypatch.setattr(flashcard_fmt, "run", fail)
+    service = FakeDriveService()
+    archive = service.create_folder("_Pleco")
+    export = service.create_file(EXPORT_NAME, b"<plecoflash")
+
+    _monitor(service, archive)
+    assert "not well-formed" in capsys.readouterr().out
+    assert service.files_by_id[export]["parents"] == ["root"]
+    with ProcessedFileJournal() as journal:
+        assert export not in journal
+
+
+def _export_chunks(service, tmp_path, chunk_size=4):
+    return google_drive_utils.get_latest_flashcard_chunks(
+        service,
+        local_path=str(tmp_path / "pleco_flashcards.xml"),
+        cache_file=str(tmp_path / "cache.json"),
+        chunk_size=chunk_size,
+    )
+
+
+def _downloads(service):
+    return service.calls.count("files.get_media")
+
+
+def test_unchanged_export_is_read_from_the_local_copy(tmp_path):
+    service = FakeDriveService()
+    content = b"<plecoflash>\xe9\x81\x8a</plecoflash>"
+    service.create_file(EXPORT_NAME, content)
+
+    chunks = list(_export_chunks(service, tmp_path))
+    assert b"".join(chunks) == content
+    assert all(len(chunk) <= 4 for chunk in chunks)
+    downloads = _downloads(service)
+    assert downloads > 0
+
+    assert b"".join(_export_chunks(service, tmp_path)) == content
+    assert _downloads(service) == downloads
+
+
+def test_changed_export_is_downloaded_again(tmp_path):
+    service = FakeDriveService()
+    export = service.create_file(EXPORT_NAME, b"<plecoflash>old</plecoflash>")
+    list(_export_chunks(service, tmp_path))
+    downloads = _downloads(service)
+
+    service.set_content(export, b"<plecoflash>new</plecoflash>")
+    assert b"".join(_export_chunks(service, tmp_path)) == (
+        b"<plecoflash>new</plecoflash>"
+    )
+    assert _downloads(service) > downloads
+    cache = google_drive_utils.load_download_cache(str(tmp_path / "cache.json"))
+    assert cache["md5Checksum"] == service.files_by_id[export]["md5Checksum"]
+
+
+def test_interrupted_download_leaves_the_cache_untouched(tmp_path, monkeypatch):
+    service = FakeDriveService()
+    export = service.create_file(EXPORT_NAME, b"<plecoflash>old</plecoflash>")
+    list(_export_chunks(service, tmp_path))
+    service.set_content(export, b"<plecoflash>new</plecoflash>")
+
+    # a consumer giving up after the first chunk
+    chunks = _export_chunks(service, tmp_path)
+    next(chunks)
+    chunks.close()
+
+    # and a connection dropping halfway through
+    iter_drive_file = google_drive_utils.iter_drive_file
+
+    def dropping_download(*args):
+        downloaded = iter_drive_file(*args)
+        yield next(downloaded)
+        raise ConnectionResetError("connection reset by peer")
+
+    monkeypatch.setattr(google_drive_utils, "iter_drive_file", dropping_download)
+    chunks = _export_chunks(service, tmp_path)
+    assert next(chunks) == b"<ple"
+    with pytest.raises(ConnectionResetError):
+        list(chunks)
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "cache.json",
+        "pleco_flashcards.xml",
+    ]
+    assert (tmp_path / "pleco_flashcards.xml").read_bytes() == (
+        b"<plecoflash>old</plecoflash>"
+    )
+    cache = google_drive_utils.load_download_cache(str(tmp_path / "cache.json"))
+    assert cache["md5Checksum"] != service.files_by_id[export]["md5Checksum"]
+
+
+class BatchRecordingDriveService(FakeDriveService):
+    """Drive service recording the number of calls in every executed batch."""
+
+    def __init__(self):
+        super().__init__()
+        self.batch_sizes = []
+
+    def new_batch_http_request(self, callback=None):
+        batch = super().new_batch_http_request(callback)
+        execute = batch.execute
+
+        def recording_execute():
+            self.batch_sizes.append(len(batch._requests))  # pylint: disable=W0212
+            execute()
+
+        batch.execute = recording_execute
+        return batch
+
+
+def test_moves_are_batched_without_fetching_parents(capsys):
+    service = BatchRecordingDriveService()
+    archive = service.create_folder("_Pleco")
+    for i in range(250):
+        service.create_file(EXPORT_NAME, f"<plecoflash>{i}</plecoflash>".encode())
+    files = google_drive_utils.list_files_by_name(service, EXPORT_NAME)
+    service.calls.clear()
+
+    assert google_drive_utils.move_files_to_folder(service, files, archive) == 250
+    assert "250 of 250 files moved" in capsys.readouterr().out
+    assert service.batch_sizes == [100, 100, 50]
+    assert "files.get" not in service.calls
+    assert service.calls.count("files.update") == 250
+    assert all(
+        service.files_by_id[file["id"]]["parents"] == [archive] for file in files
+    )
+
+
+def test_every_page_of_a_listing_is_collected(monkeypatch):
+    monkeypatch.setattr(google_drive_utils, "LIST_PAGE_SIZE", 2)
+    service = FakeDriveService()
+    created = {
+        service.create_file(EXPORT_NAME, f"<plecoflash>{i}</plecoflash>".encode())
+        for i in range(5)
+    }
+    service.create_file("other.xml", b"<other/>")
+
+    files = google_drive_utils.list_files_by_name(service, EXPORT_NAME)
+    assert {file["id"] for file in files} == created
+    assert service.calls.count("files.list") == 3
+    # newest first, across pages
+    times = [file["modifiedTime"] for file in files]
+    assert times == sorted(times, reverse=True)
+
+
+def test_google_client_is_imported_on_first_use():
+    code = textwrap.dedent("""
+        import sys
+
+        from src import flashcard_fmt
+        from src.utils.fake_drive import FakeDriveService
+        from src.utils.google_drive_utils import DriveClient, get_items_by_name
+
+        def loaded():
+            return sorted(name for name in sys.modules if name.startswith("google"))
+
+        DriveClient()
+        assert not loaded(), loaded()
+        get_items_by_name(FakeDriveService(), "pleco_flashcards.xml")
+        assert "googleapiclient.errors" in loaded(), loaded()
+        """)
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=ROOT_DIR)
+
+
+def test_folder_ids_come_from_the_cache_file(monkeypatch, tmp_path):
+    service = FakeDriveService()
+    monkeypatch.setattr(
+        google_drive_utils, "authenticate_google_drive", lambda: service
+    )
+    archive = service.create_folder("_Pleco")
+    inbox = service.create_folder("Inbox")
+    cache_file = tmp_path / "drive_folders.json"
+    cache_file.write_text(json.dumps({"_Pleco": archive}), encoding="utf-8")
+
+    client = google_drive_utils.DriveClient(str(cache_file))
+    assert client.archive_folder_id == archive
+    assert not service.calls
+
+    # an unknown folder is looked up once and added to the cache file
+    assert client.folder_id("Inbox") == inbox
+    assert client.folder_id("Inbox") == inbox
+    assert service.calls == ["files.list"]
+    assert json.loads(cache_file.read_text(encoding="utf-8")) == {
+        "_Pleco": archive,
+        "Inbox": inbox,
+    }
+    with pytest.raises(FileNotFoundError):
+        client.folder_id("Missing")
@@ -0,0 +1,72 @@
+"""Tests for the grading engine."""
+
+import random
+
+import pytest
+
+from src.flashcard_formatting.grading import (
+    GradingCache,
+    first_diff_offset,
+    grade_back,
+)
+
+
+def _first_diff_offset_by_loop(expected, result):
+    if expected == result:
+        return None
+    for i, (a, b) in enumerate(zip(expected, result)):
+        if a != b:
+            return i
+    return min(len(expected), len(result))
+
+
+@pytest.mark.parametrize(
+    "expected, result, offset",
+    [
+        ("", "", None),
+        ("abc", "abc", None),
+        ("abc", "abd", 2),
+        ("xbc", "abc", 0),
+        ("abc", "abcdef", 3),
+        ("abcdef", "abc", 3),
+        ("", "a", 0),
+        ("遊戲<b>", "遊戲<i>", 3),
+    ],
+)
+def test_first_diff_offset(expected, result, offset):
+    assert first_diff_offset(expected, result) == offset
+
+
+def test_first_diff_offset_matches_a_character_loop():
+    rng = random.Random(0)
+    for _ in range(2000):
+        expected = "".join(rng.choice("ab") for _ in range(rng.randrange(12)))
+        result = "".join(rng.choice("ab") for _ in range(rng.randrange(12)))
+        assert first_diff_offset(expected, result) == _first_diff_offset_by_loop(
+            expected, result
+        )
+
+
+def test_grade_back():
+    assert grade_back("<p>game</p>", "<p>game</p>") == ("correct", None)
+    assert grade_back("<p>(a) game</p>", "<p>a game</p>") == ("correct", None)
+    assert grade_back("<p>game</p>", "<p>gone</p>") == ("wrong", 4)
+    assert grade_back("<p>game</p>", "<p>game</p>!") == ("length_diff", 11)
+
+
+def test_grading_cache_is_keyed_on_the_back_and_drops_unused_entries(tmp_path):
+    path = str(tmp_path / "grading_cache.json")
+    cache = GradingCache(path)
+    cache.put({"formatted_back": "<p>game</p>"}, "game")
+    cache.put({"formatted_back": "<p>swim</p>"}, "swim")
+    cache.save()
+
+    cache = GradingCache(path)
+    # the same back on a card reviewed since: a hit
+    assert cache.get({"formatted_back": "<p>game</p>", "mod": 2}) == "game"
+    assert cache.get({"formatted_back": "<p>edited</p>"}) is None
+    cache.save()
+
+    assert GradingCache(path).backs == {
+        GradingCache.key({"formatted_back": "<p>game</p>"}): "game"
+    }
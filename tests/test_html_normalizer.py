@@ -0,0 +1,101 @@
+"""The streaming HTML normalizer must produce exactly what the BeautifulSoup code it replaced did."""
+
+import json
+
+import pytest
+
+from src.utils.html_normalizer import normalize_html
+from src.utils.resource_utils import get_resource_path
+
+bs4 = pytest.importorskip("bs4")
+
+CASES = [
+    "",
+    "plain text",
+    '<div align="left"><p><span style="font-size:32px";>艘</span><br>\n</div>',
+    '<b><span style="color:#0078C3;">遊戲</span></b> game',
+    '<b>x <span style="color:#0078C3;">遊</span> y</b>',
+    '<span style="font-weight:600;"><span style="color:#FF0000;">Text</span></span>',
+    '<span style="font-weight:600;">a<span style="color:#FF0000;">b</span>'
+    '<span style="color:#00FF00;">c</span></span>',
+    "<p>unclosed <b>bold<p>next",
+    "stray </span> end tag</div>",
+    "<br><br/><img src=x>&nbsp;&amp;&lt;&#39;&#x4e00;&unknown;",
+    '<a class="  x   y " rel="a  b" href="?a=1&b=2">link</a>',
+    "<!-- comment --><![CDATA[data]]><?pi?>",
+    "<pre>\n  keep   spaces\n</pre><textarea> a </textarea>",
+    "<script>if (a < b) {}</script><style>p > b {}</style>",
+    '<plecoentry c="00000000" d="50414345" e="01d76100" x="-1"/>',
+    "<P ALIGN=left>Upper case</P>",
+    "<span title='single \"quoted\"'>q</span>",
+]
+
+
+def _bs4_round_trip(html_text):
+    soup = bs4.BeautifulSoup(f"<root>{html_text}</root>", "html.parser")
+    return str(soup).replace("<root>", "").replace("</root>", "")
+
+
+def _bs4_reorder_bold_and_color_spans(html_text):
+    """BeautifulSoup implementation of reorder_bold_and_color_spans, as replaced."""
+    soup = bs4.BeautifulSoup(f"<root>{html_text}</root>", "html.parser")
+    for bold_tag in soup.find_all("b"):
+        color_span = bold_tag.find("span", style=lambda s: s and "color:#0078C3" in s)
+        if color_span:
+            new_span = soup.new_tag("span")
+            new_span["style"] = color_span["style"]
+            new_bold = soup.new_tag("b")
+            new_bold.extend(color_span.contents)
+            new_span.append(new_bold)
+            bold_tag.replace_with(new_span)
+    return str(soup).replace("<root>", "").replace("</root>", "")
+
+
+def _bs4_reorder_nested_spans(html_text):
+    """BeautifulSoup implementation of reorder_nested_spans, as replaced."""
+    soup = bs4.BeautifulSoup(f"<root>{html_text}</root>", "html.parser")
+    spans = soup.find_all("span")
+    for span in spans:
+        style = span.get("style", "")
+        if "font-weight" in style:
+            nested_span = span.find("span")
+            if nested_span is not None:
+                nested_style = nested_span.get("style", "")
+                if "color" in nested_style:
+                    span["style"], nested_span["style"] = (
+                        nested_span["style"],
+                        span["style"],
+                    )
+        if ";" in spans[0].attrs:
+            del spans[0].attrs[";"]
+    return str(soup).replace("<root>", "").replace("</root>", "")
+
+
+def _anki_backs():
+    with open(
+        get_resource_path("flashcard_entries.json"), "r", encoding="utf-8"
+    ) as file:
+        return [entry["formatted_back"] for entry in json.load(file)]
+
+
+@pytest.mark.parametrize("html_text", CASES)
+def test_cases_match_beautifulsoup(html_text):
+    assert normalize_html(html_text) == _bs4_round_trip(html_text)
+    assert normalize_html(
+        html_text, reorder_bold=True
+    ) == _bs4_reorder_bold_and_color_spans(html_text)
+    assert normalize_html(html_text, reorder_spans=True) == _bs4_reorder_nested_spans(
+        html_text
+    )
+
+
+def test_anki_backs_match_beautifulsoup():
+    backs = _anki_backs()
+    assert backs
+    for back in backs:
+        assert normalize_html(back, reorder_bold=True) == (
+            _bs4_reorder_bold_and_color_spans(back)
+        )
+        assert normalize_html(back, reorder_spans=True) == _bs4_reorder_nested_spans(
+            back
+        )
@@ -0,0 +1,53 @@
+"""Tests for the processed card state used by incremental runs."""
+
+from src.utils.ingest_state import (
+    card_key,
+    diff_ingest_state,
+    legacy_card_key,
+    load_ingest_state,
+    save_ingest_state,
+    update_ingest_state,
+)
+
+
+def _entry(traditional, entryid, modified):
+    return {
+        "traditional": traditional,
+        "dictid": "PACE",
+        "entryid": entryid,
+        "created": 1735513394,
+        "modified": modified,
+    }
+
+
+def test_cards_are_classified_against_the_last_run():
+    state = update_ingest_state(
+        {}, [_entry("遊戲", "1", 100), _entry("遊", "2", 100), _entry("戲", "3", 100)]
+    )
+    entries = [_entry("遊戲", "1", 100), _entry("遊", "2", 200), _entry("新", "4", 100)]
+
+    changed, unchanged, deleted = diff_ingest_state(entries, state)
+    assert [entry["traditional"] for entry in changed] == ["遊", "新"]
+    assert unchanged == 1
+    assert deleted == [card_key(_entry("戲", "3", 100))]
+
+    update_ingest_state(state, changed, deleted)
+    assert diff_ingest_state(entries, state) == ([], 3, [])
+
+
+def test_state_keyed_without_entry_ids_is_matched(tmp_path):
+    state_path = str(tmp_path / "ingest_state.json")
+    legacy = [_entry("遊戲", None, 100), _entry("遊", None, 100)]
+    save_ingest_state(update_ingest_state({}, legacy), state_path)
+    state = load_ingest_state(state_path)
+    assert set(state) == {legacy_card_key(entry) for entry in legacy}
+
+    entries = [_entry("遊戲", "1", 100), _entry("遊", "2", 200)]
+    changed, unchanged, deleted = diff_ingest_state(entries, state)
+    assert [entry["traditional"] for entry in changed] == ["遊"]
+    assert (unchanged, deleted) == (1, [])
+
+    # processed cards move to their full key; the unchanged one keeps matching
+    update_ingest_state(state, changed, deleted)
+    assert set(state) == {legacy_card_key(entries[0]), card_key(entries[1])}
+    assert diff_ingest_state(entries, state) == ([], 2, [])
@@ -0,0 +1,87 @@
+"""Tests for the metrics registry, including counts made in worker processes."""
+
+import os
+import time
+
+import pytest
+
+from src.flashcard_formatting import batch_format
+from src.utils.metrics import (
+    CARDS_FORMATTED,
+    CARDS_INGESTED,
+    REGISTRY,
+    STAGE_SECONDS,
+    MetricsRegistry,
+)
+
+
+def test_render_counter_and_histogram():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests", ("code",))
+    latency = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+    requests.inc(code=200)
+    requests.inc(2, code=200)
+    latency.observe(0.5)
+
+    assert requests.value(code=200) == 3
+    assert latency.value() == (1, 0.5)
+    lines = registry.render().splitlines()
+    assert 'requests_total{code="200"} 3' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 0' in lines
+    assert 'latency_seconds_bucket{le="1.0"} 1' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 1' in lines
+    assert "latency_seconds_count 1" in lines
+
+
+def test_drain_and_merge():
+    worker, parent = MetricsRegistry(), MetricsRegistry()
+    for registry in (worker, parent):
+        registry.counter("cards_total", "Cards", ("status",))
+        registry.histogram("seconds", "Time")
+    worker.metrics["cards_total"].inc(status="ok")
+    worker.metrics["seconds"].observe(0.2)
+
+    parent.merge(worker.drain())
+    parent.merge(worker.drain())
+
+    assert parent.metrics["cards_total"].value(status="ok") == 1
+    assert parent.metrics["seconds"].value() == (1, 0.2)
+    assert worker.metrics["cards_total"].value(status="ok") == 0
+
+
+@pytest.mark.parametrize("jobs", [1, 3])
+@pytest.mark.usefixtures("fake_formatting")
+def test_counts_from_pool_workers_are_merged_once(entries, jobs):
+    CARDS_FORMATTED.inc(status="formatted")  # must not be counted again by workers
+    formatted = CARDS_FORMATTED.value(status="formatted")
+    failed = CARDS_FORMATTED.value(status="error")
+    timed = STAGE_SECONDS.value(stage="format_entry")[0]
+
+    batch_format.format_entries(entries, jobs=jobs)
+    list(batch_format.iter_format_entries(entries, jobs=jobs))
+
+    assert CARDS_FORMATTED.value(status="formatted") == formatted + 2 * 9
+    assert CARDS_FORMATTED.value(status="error") == failed + 2 * 3
+    assert STAGE_SECONDS.value(stage="format_entry")[0] == timed + 2 * 12
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_forked_child_does_not_inherit_held_locks_or_counts():
+    CARDS_INGESTED.inc()
+    # another thread holding the lock during the fork would never release it
+    # in the child
+    with CARDS_INGESTED._lock:  # pylint: disable=protected-access
+        pid = os.fork()
+        if pid == 0:
+            CARDS_INGESTED.inc()
+            REGISTRY.drain()
+            os._exit(0 if CARDS_INGESTED.value() == 0 else 1)
+
+    deadline = time.monotonic() + 10
+    while (result := os.waitpid(pid, os.WNOHANG)) == (0, 0):
+        if time.monotonic() > deadline:
+            os.kill(pid, 9)
+            os.waitpid(pid, 0)
+            pytest.fail("forked child deadlocked on an inherited metrics lock")
+        time.sleep(0.01)
+    assert os.waitstatus_to_exitcode(result[1]) == 0
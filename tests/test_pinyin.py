@@ -0,0 +1,25 @@
+"""Tests for splitting pinyin into syllables."""
+
+import unicodedata
+
+import pytest
+
+from src.utils.pinyin import split_marked_pinyin
+
+
+@pytest.mark.parametrize(
+    "pinyin, syllables",
+    [
+        ("yóuxì", ["yóu", "xì"]),
+        ("Xī'ān", ["Xī", "'ān"]),
+        ("nǚ rén", ["nǚ", " rén"]),
+    ],
+)
+def test_split_marked_pinyin(pinyin, syllables):
+    assert split_marked_pinyin(pinyin) == syllables
+
+
+def test_combining_tone_marks_are_composed():
+    decomposed = unicodedata.normalize("NFD", "yóuxì")
+    assert decomposed != "yóuxì"
+    assert split_marked_pinyin(decomposed) == ["yóu", "xì"]
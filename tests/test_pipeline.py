@@ -0,0 +1,36 @@
+"""Tests for the streaming pipeline stages."""
+
+import pytest
+
+from src.flashcard_formatting.pipeline import buffered, iter_graded_entries
+
+
+def test_buffered_keeps_order_and_reraises_errors():
+    def produce():
+        yield from range(5)
+        raise ValueError("broken export")
+
+    items = []
+    with pytest.raises(ValueError, match="broken export"):
+        for item in buffered(produce(), maxsize=2):
+            items.append(item)
+    assert items == list(range(5))
+
+
+def test_failed_entries_keep_their_anki_back():
+    summary = {"total": 0, "correct": 0, "wrong": 0, "length_diff": 0}
+    summary.update({"error": 0, "missing": 0})
+    results = [
+        ({"traditional": "遊戲", "formatted_back": "<div>old</div>"}, None, "boom"),
+        ({"traditional": "遊"}, "<div>new</div>", None),
+    ]
+
+    failed, formatted = iter_graded_entries(results, summary)
+
+    assert failed == {
+        "traditional": "遊戲",
+        "formatted_back": "<div>old</div>",
+        "render_error": "boom",
+    }
+    assert formatted == {"traditional": "遊", "formatted_back": "<div>new</div>"}
+    assert summary["error"] == 1 and summary["missing"] == 1
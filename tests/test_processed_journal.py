@@ -0,0 +1,52 @@
+"""Tests for the processed Drive file journal."""
+
+import json
+
+from src.utils.processed_journal import ProcessedFileJournal
+
+
+def _journal(tmp_path, compact_every=1000):
+    return ProcessedFileJournal(
+        str(tmp_path / "processed_files.json"),
+        str(tmp_path / "processed_files.journal"),
+        compact_every,
+    )
+
+
+def test_ids_survive_a_reload(tmp_path):
+    with _journal(tmp_path) as journal:
+        assert journal.add("a")
+        assert journal.add("b")
+        assert not journal.add("a")
+
+    with _journal(tmp_path) as journal:
+        assert "a" in journal and "b" in journal
+        assert len(journal) == 2
+
+
+def test_torn_last_line_is_dropped(tmp_path):
+    journal_path = tmp_path / "processed_files.journal"
+    journal_path.write_bytes(b"a\nb\nhalf-writ")
+
+    with _journal(tmp_path) as journal:
+        assert journal.file_ids == {"a", "b"}
+        # the torn line is cut off, so the next ID starts on a line of its own
+        assert journal_path.read_bytes() == b"a\nb\n"
+        journal.add("c")
+    assert journal_path.read_bytes() == b"a\nb\nc\n"
+
+    with _journal(tmp_path) as journal:
+        assert journal.file_ids == {"a", "b", "c"}
+
+
+def test_compaction_folds_the_journal_into_the_snapshot(tmp_path):
+    with _journal(tmp_path, compact_every=2) as journal:
+        journal.add("a")
+        journal.add("b")
+        journal.add("c")
+
+    snapshot = json.loads((tmp_path / "processed_files.json").read_text())
+    assert snapshot == ["a", "b"]
+    assert (tmp_path / "processed_files.journal").read_text() == "c\n"
+    with _journal(tmp_path) as journal:
+        assert journal.file_ids == {"a", "b", "c"}